@@ -1,10 +1,11 @@
+import os
+import atexit
 import streamlit as st
 import pandas as pd
 from datetime import datetime
-from config.database import CassandraConnection
-from models.book import BookRepository
-from models.user import UserRepository
-from models.borrow import BorrowRepository
+from config.services import LibraryServices
+from models.cache import LRUCache
+from models.instrumentation import serve_metrics
 
 # --- CONFIGURATION DE LA PAGE ---
 st.set_page_config(page_title="Library Dashboard Cassandra", layout="wide")
@@ -12,11 +13,45 @@ st.set_page_config(page_title="Library Dashboard Cassandra", layout="wide")
 @st.cache_resource
 def get_repos():
     """Initialisation unique des connexions pour Streamlit"""
-    db = CassandraConnection()
-    session = db.connect()
-    return BookRepository(session), UserRepository(session), BorrowRepository(session)
+    # Caches partagés par toutes les sessions Streamlit du processus
+    services = LibraryServices(book_cache=LRUCache(maxsize=10000, ttl=60),
+                               user_cache=LRUCache(maxsize=10000, ttl=300))
+    # Toutes les vues servent : requêtes préparées d'avance, en une vague parallèle
+    # (compteurs envoyés par lots, retours attribués aux réservataires, latences mesurées)
+    services.warm_up()
+    # À l'arrêt : compteurs en attente envoyés, ajouts sauvegardés dans l'instantané de recherche
+    atexit.register(services.close)
+    # LIBRARY_METRICS_PORT expose /metrics (Prometheus)
+    if os.environ.get('LIBRARY_METRICS_PORT'):
+        serve_metrics(services.query_metrics, int(os.environ['LIBRARY_METRICS_PORT']))
+    return (services.book_repo, services.user_repo, services.borrow_repo,
+            services.query_metrics, services.counters, services.reservation_repo)
 
-book_repo, user_repo, borrow_repo = get_repos()
+book_repo, user_repo, borrow_repo, metrics, counters, reservation_repo = get_repos()
+
+def paged_table(key, fetch, page_size=50):
+    """Affiche une page de résultats ; seuls page_size lignes sont lues par interaction.
+
+    Les curseurs des pages déjà visitées sont conservés dans st.session_state
+    pour permettre le retour en arrière sans relire le début de la table.
+    """
+    cursors = st.session_state.setdefault(f"{key}_cursors", [None])
+    # Page lue en colonnes (models.columnar) : pandas reçoit des colonnes déjà typées
+    page = fetch(page_size, cursors[-1], columnar=True)
+    if page.rows:
+        st.dataframe(page.rows.to_frame(), use_container_width=True)
+    else:
+        st.info("Aucune donnée à afficher.")
+
+    col_prev, col_next, col_info = st.columns([1, 1, 4])
+    if col_prev.button("◀ Précédent", key=f"{key}_prev", disabled=len(cursors) == 1):
+        cursors.pop()
+        st.rerun()
+    if col_next.button("Suivant ▶", key=f"{key}_next", disabled=page.cursor is None):
+        cursors.append(page.cursor)
+        st.rerun()
+    col_info.caption(f"Page {len(cursors)} · {len(page.rows)} lignes")
+    return page
 
 st.title("📚 Dashboard de la Bibliothèque Numérique")
 
@@ -26,6 +61,7 @@ menu = st.sidebar.radio("Sélectionnez une vue :", [
     "Gestion des Emprunts & Retours", 
     "Catalogue Complet", 
     "Livres par Catégorie",
+    "Recherche de Livres",
     "Gestion des Membres",
     "Recherche par Email",
     "Historique des Emprunts",
@@ -36,7 +72,7 @@ menu = st.sidebar.radio("Sélectionnez une vue :", [
 # --- 1. GESTION DES EMPRUNTS & RETOURS ---
 if menu == "Gestion des Emprunts & Retours":
     st.header("🔖 Opérations en temps réel")
-    tab1, tab2 = st.tabs(["Emprunter un livre", "Retourner un livre"])
+    tab1, tab2, tab3 = st.tabs(["Emprunter un livre", "Retourner un livre", "Réserver un livre"])
     
     with tab1:
         with st.form("borrow_form"):
@@ -58,80 +94,167 @@ if menu == "Gestion des Emprunts & Retours":
                                 st.success(f"✅ Succès ! '{book.title}' emprunté par {nom_complet}.")
                                 st.balloons()
                         else:
-                            st.warning("⚠️ Stock insuffisant pour ce livre.")
+                            st.warning("⚠️ Stock insuffisant pour ce livre : réservez-le dans l'onglet « Réserver un livre ».")
                     else:
                         st.error("❌ Utilisateur ou Livre introuvable en base de données.")
                 except Exception as e:
                     st.error(f"Erreur technique : {e}")
 
     with tab2:
-        st.info("Note : La date exacte est disponible dans l'onglet 'Historique'.")
-        with st.form("return_form"):
-            u_id_r = st.text_input("ID Utilisateur (UUID)")
-            isbn_r = st.text_input("ISBN du livre")
-            date_r = st.text_input("Date d'emprunt (Format: YYYY-MM-DD HH:MM:SS)")
-            
-            if st.form_submit_button("Valider le retour"):
+        u_id_r = st.text_input("ID Utilisateur (UUID)", key="return_user")
+        if u_id_r:
+            # Emprunts en cours lus dans active_loans : ni date à recopier, ni historique à parcourir
+            loans = borrow_repo.get_active_loans(u_id_r)
+            if loans:
+                labels = {f"{loan.book_title} ({loan.isbn}) — emprunté le {loan.borrow_date:%d/%m/%Y %H:%M}": loan
+                          for loan in loans}
+                with st.form("return_form"):
+                    choice = st.selectbox("Livre à retourner", list(labels))
+                    if st.form_submit_button("Valider le retour"):
+                        loan = labels[choice]
+                        if borrow_repo.return_book(u_id_r, loan.isbn, loan.borrow_date):
+                            st.success("✅ Livre retourné ! Le stock a été mis à jour dans books_by_id.")
+                        else:
+                            st.error("Échec de l'opération.")
+            else:
+                st.info("Aucun emprunt en cours pour ce membre.")
+
+    with tab3:
+        with st.form("reserve_form"):
+            u_id_res = st.text_input("ID Utilisateur (UUID)", key="reserve_user")
+            isbn_res = st.text_input("ISBN du livre", key="reserve_isbn")
+            if st.form_submit_button("Réserver"):
                 try:
-                    # Le retour met à jour le statut et réincrémente le stock
-                    if borrow_repo.return_book(u_id_r, isbn_r, date_r):
-                        st.success("✅ Livre retourné ! Le stock a été mis à jour dans books_by_id.")
+                    book = book_repo.get_book_by_isbn(isbn_res)
+                    user = user_repo.get_user(u_id_res)
+                    if not book or not user:
+                        st.error("❌ Utilisateur ou Livre introuvable en base de données.")
+                    elif book.available_copies > 0:
+                        st.info("Ce livre est disponible : il peut être emprunté directement.")
+                    elif reservation_repo.reserve(u_id_res, f"{user.first_name} {user.last_name}", isbn_res):
+                        rank = reservation_repo.position(u_id_res, isbn_res)
+                        st.success(f"✅ Réservation enregistrée : position {rank} dans la file.")
                     else:
-                        st.error("Échec de l'opération. Vérifiez l'ID et la date.")
+                        st.error("❌ Réservation impossible (déjà en file ?)")
                 except Exception as e:
-                    st.error(f"Erreur de format de date : {e}")
+                    st.error(f"Erreur technique : {e}")
+        isbn_queue = st.text_input("Consulter la file d'attente d'un ISBN", key="queue_isbn")
+        if isbn_queue:
+            queue = reservation_repo.get_queue(isbn_queue)
+            if queue:
+                st.dataframe(pd.DataFrame([{"Rang": rank, "Membre": r.user_name, "Réservé le": r.reservation_date}
+                                           for rank, r in enumerate(queue, 1)]), use_container_width=True)
+            else:
+                st.info("Aucune réservation en attente pour ce livre.")
 
 # --- 2. CATALOGUE COMPLET ---
 elif menu == "Catalogue Complet":
     st.header("📖 Catalogue Global")
-    # Résout l'AttributeError sur get_all_books
-    books = book_repo.get_all_books()
-    if books:
-        st.dataframe(pd.DataFrame(list(books)), use_container_width=True)
+    paged_table("catalogue", book_repo.get_books_page)
 
 # --- 3. LIVRES PAR CATÉGORIE ---
 elif menu == "Livres par Catégorie":
     st.header("📂 Consultation par Catégorie")
     cat = st.selectbox("Sélectionnez une catégorie", ["Science Fiction", "Droit", "Médecine", "Informatique"])
-    rows = book_repo.get_books_by_category(cat)
+    rows = book_repo.get_books_by_category(cat, columnar=True)
     if rows:
-        st.dataframe(pd.DataFrame(list(rows)), use_container_width=True)
+        st.dataframe(rows.to_frame(), use_container_width=True)
+
+# --- 3 bis. RECHERCHE PLEIN TEXTE ---
+elif menu == "Recherche de Livres":
+    st.header("🔎 Recherche par Titre ou Auteur")
+    query = st.text_input("Titre, auteur ou début de mot (ex : « metamorph kafka »)")
+    if query:
+        hits = book_repo.search(query, limit=50)
+        if hits:
+            st.dataframe(pd.DataFrame(hits, columns=list(hits[0]._fields)), use_container_width=True)
+        else:
+            st.info("Aucun livre trouvé.")
+        index_stats = book_repo.search_index.stats() if book_repo.search_index else None
+        if index_stats:
+            st.caption(f"Index : {index_stats['books']} livres, {index_stats['terms']} mots "
+                       f"(construit le {index_stats['built_at']})")
 
 # --- 4. GESTION DES MEMBRES ---
 elif menu == "Gestion des Membres":
     st.header("👤 Liste des Membres")
-    # Résout l'AttributeError sur get_all_users
-    users = user_repo.get_all_users()
-    if users:
-        st.dataframe(pd.DataFrame(list(users)), use_container_width=True)
+    paged_table("members", user_repo.get_users_page)
 
 # --- 5. RECHERCHE PAR EMAIL ---
 elif menu == "Recherche par Email":
     st.header("🔍 Recherche Membre par Email")
     st.info("Cette vue utilise la table users_by_email indexée pour une recherche rapide.")
     email = st.text_input("Email de l'utilisateur")
-    # Implémentez ici l'appel à user_repo.get_user_by_email(email)
+    if email:
+        user = user_repo.get_user_by_email(email)
+        if user:
+            st.success(f"✅ {user.first_name} {user.last_name}")
+            st.table(pd.DataFrame([{
+                "ID": str(user.user_id), "Email": user.email,
+                "Inscription": user.registration_date,
+            }]))
+        else:
+            st.warning("Aucun membre avec cet email.")
 
 # --- 6. HISTORIQUE DES EMPRUNTS ---
 elif menu == "Historique des Emprunts":
     st.header("⏳ Historique d'activité")
     u_id_search = st.text_input("Saisissez l'UUID du membre")
     if u_id_search:
-        # Résout l'AttributeError sur get_user_borrows
-        history = borrow_repo.get_user_borrows(u_id_search)
-        if history:
-            st.dataframe(pd.DataFrame(list(history)), use_container_width=True)
-        else:
-            st.info("Aucun emprunt enregistré pour cet utilisateur.")
+        # Un jeu de curseurs par membre : changer d'UUID repart de la première page
+        paged_table(f"history_{u_id_search}",
+                    lambda size, cursor, columnar: borrow_repo.get_user_borrows_page(
+                        u_id_search, size, cursor, columnar))
 
 # --- 7. SUIVI PAR LIVRE ---
 elif menu == "Suivi par Livre":
     st.header("📊 Historique des lecteurs")
     isbn_track = st.text_input("Saisissez l'ISBN")
-    # Cette vue interroge la table borrows_by_book
+    col_from, col_to, col_limit = st.columns(3)
+    today = datetime.now().date()
+    since = col_from.date_input("Depuis le", value=today.replace(year=today.year - 1))
+    until = col_to.date_input("Jusqu'au", value=today)
+    limit = col_limit.number_input("Nombre max de lignes", min_value=10, max_value=1000, value=100, step=10)
+
+    if isbn_track:
+        # Lecture de borrows_by_book_monthly : un bucket par mois, lus en parallèle
+        rows = borrow_repo.get_book_borrows(
+            isbn_track,
+            since=datetime.combine(since, datetime.min.time()),
+            until=datetime.combine(until, datetime.max.time()),
+            limit=int(limit))
+        if rows:
+            st.dataframe(pd.DataFrame(rows), use_container_width=True)
+            st.caption(f"{len(rows)} emprunts, du plus récent au plus ancien")
+        else:
+            st.info("Aucun emprunt sur cette période.")
 
 # --- 8. STATISTIQUES ---
 elif menu == "Statistiques":
     st.header("📈 Statistiques du Système")
-    st.metric("Total Emprunts", "1,254")
-    st.info("Les données incluent les entrées générées par le Benchmark pour test de charge.")
\ No newline at end of file
+    values = counters.read()
+    cols = st.columns(5)
+    cols[0].metric("Total Emprunts", f"{values['total_borrows']:,}")
+    cols[1].metric("Emprunts Actifs", f"{values['active_loans']:,}")
+    cols[2].metric("Retours", f"{values['total_returns']:,}")
+    cols[3].metric("Membres Inscrits", f"{values['total_users']:,}")
+    cols[4].metric("Livres Ajoutés", f"{values['total_books']:,}")
+    st.info("Les données incluent les entrées générées par le Benchmark pour test de charge.")
+
+    st.subheader("Caches applicatifs")
+    cache_stats = {"Livres": book_repo.cache.stats(), "Membres": user_repo.cache.stats()}
+    st.dataframe(pd.DataFrame(cache_stats).T, use_container_width=True)
+
+    if book_repo.flight is not None:
+        flight = book_repo.flight.stats()
+        st.caption(f"Lectures identiques regroupées sur une requête en vol : {flight['collapsed']:,} "
+                   f"sur {flight['requests']:,} ({flight['collapse_ratio']:.1%})")
+
+    st.subheader("Requêtes CQL")
+    snapshot = metrics.snapshot()
+    if snapshot['statements']:
+        st.dataframe(pd.DataFrame(snapshot['statements']).set_index('statement'), use_container_width=True)
+        st.caption("Par nœud coordinateur (un nœud lent ou en erreur ressort ici)")
+        st.dataframe(pd.DataFrame(snapshot['hosts']).set_index('host'), use_container_width=True)
+    else:
+        st.info("Aucune requête mesurée depuis le démarrage.")
\ No newline at end of file
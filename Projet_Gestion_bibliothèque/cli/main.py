@@ -1,5 +1,6 @@
 import sys
 import os
+import time
 from datetime import datetime
 
 # Configuration du chemin pour trouver les modules locaux
@@ -9,18 +10,18 @@ sys.path.append(BASE_DIR)
 import click
 from uuid import UUID
 from tabulate import tabulate
-from config.database import CassandraConnection
-from models.book import BookRepository, Book
-from models.user import UserRepository
-from models.borrow import BorrowRepository
+from config.services import LibraryServices
+from models.book import Book
+from models.borrow import BulkResult
+from models.loader import read_records, invalid_record
+from models.search import SearchIndex, snapshot_path
+from models.reconcile import Reconciler, load_watermark, save_watermark
+from models.export import TableExporter, EXPORTS, FORMATS
+from models.instrumentation import fetch_exposition, summarize_exposition
 
-# Initialisation de la connexion et des repositories
-db = CassandraConnection()
-session = db.connect()
-
-book_repo = BookRepository(session)
-user_repo = UserRepository(session)
-borrow_repo = BorrowRepository(session)
+# Connexion et repositories créés à la première commande qui en a besoin :
+# --help ou une faute de frappe ne contactent pas le cluster
+services = LibraryServices()
 
 @click.group()
 def cli():
@@ -49,7 +50,13 @@ def add(isbn, title, author, category, publisher, year, copies):
         publisher=publisher, publication_year=year,
         total_copies=copies, available_copies=copies
     )
-    if book_repo.add_book(book):
+    path = snapshot_path()
+    if path and services.book_repo.search_index is None:
+        # L'instantané de l'index de recherche suit l'ajout (pas de reconstruction)
+        services.book_repo.search_index = SearchIndex.load(path)
+    if services.book_repo.add_book(book):
+        if services.book_repo.search_index is not None:
+            services.book_repo.search_index.flush()
         click.echo(click.style(f"✅ Livre ajouté dans toutes les vues : {title}", fg='green'))
     else:
         click.echo(click.style("❌ Échec de l'ajout", fg='red'))
@@ -58,7 +65,7 @@ def add(isbn, title, author, category, publisher, year, copies):
 @click.option('--isbn', prompt='ISBN')
 def search(isbn):
     """Rechercher par ISBN (books_by_id)"""
-    book = book_repo.get_book_by_isbn(isbn)
+    book = services.book_repo.get_book_by_isbn(isbn)
     if book:
         data = [
             ["ISBN", book.isbn], ["Titre", book.title],
@@ -69,11 +76,37 @@ def search(isbn):
     else:
         click.echo(click.style("❌ Livre introuvable", fg='red'))
 
+@books.command(name="find")
+@click.option('--query', prompt='Recherche', help='Mots du titre ou de l\'auteur (préfixes acceptés)')
+@click.option('--limit', type=int, default=20)
+@click.option('--rebuild', is_flag=True, help="Reconstruire l'index depuis books_by_id")
+def find_books(query, limit, rebuild):
+    """Recherche plein texte par titre / auteur (index en mémoire)"""
+    if rebuild:
+        services.book_repo.search_index = SearchIndex.open(services.session, snapshot_path(), max_age=0)
+    hits = services.book_repo.search(query, limit)
+    if hits:
+        data = [[h.isbn, h.title, h.author, h.score] for h in hits]
+        click.echo("\n" + tabulate(data, headers=['ISBN', 'Titre', 'Auteur', 'Score'], tablefmt="grid"))
+    else:
+        click.echo(click.style("Aucun livre trouvé", fg='yellow'))
+
+@books.command()
+@click.option('--author', prompt='Auteur')
+def by_author(author):
+    """Livres d'un auteur (books_by_author)"""
+    rows = list(services.book_repo.get_books_by_author(author))
+    if rows:
+        data = [[r.isbn, r.title] for r in rows]
+        click.echo("\n" + tabulate(data, headers=['ISBN', 'Titre'], tablefmt="grid"))
+    else:
+        click.echo(click.style("Aucun livre pour cet auteur", fg='yellow'))
+
 @books.command()
 @click.option('--category', prompt='Catégorie')
 def list_by_category(category):
     """Lister par catégorie (books_by_category)"""
-    rows = book_repo.get_books_by_category(category)
+    rows = services.book_repo.get_books_by_category(category)
     results = list(rows)
     if results:
         data = [[r.isbn, r.title, r.author, r.available_copies] for r in results]
@@ -95,16 +128,32 @@ def users():
 @click.option('--last-name', prompt='Nom')
 def register(email, first_name, last_name):
     """Inscrire un utilisateur"""
-    user_id = user_repo.create_user(email, first_name, last_name)
+    user_id = services.user_repo.create_user(email, first_name, last_name)
     if user_id:
         click.echo(click.style(f"✅ Utilisateur créé : {user_id}", fg='green'))
+    else:
+        click.echo(click.style("❌ Inscription refusée (email déjà utilisé ?)", fg='red'))
+
+@users.command(name="find")
+@click.option('--email', prompt='Email')
+def find_user(email):
+    """Retrouver un membre par son email (users_by_email)"""
+    user = services.user_repo.get_user_by_email(email)
+    if user:
+        data = [
+            ["ID", user.user_id], ["Nom", f"{user.first_name} {user.last_name}"],
+            ["Email", user.email], ["Date Inscription", user.registration_date]
+        ]
+        click.echo("\n" + tabulate(data, tablefmt="grid"))
+    else:
+        click.echo(click.style("❌ Aucun membre avec cet email", fg='red'))
 
 @users.command()
 @click.option('--user-id', prompt='User ID')
 def profile(user_id):
     """Voir le profil utilisateur"""
     try:
-        user = user_repo.get_user(UUID(user_id))
+        user = services.user_repo.get_user(UUID(user_id))
         if user:
             data = [
                 ["ID", user.user_id], ["Nom", f"{user.first_name} {user.last_name}"],
@@ -131,8 +180,8 @@ def borrow(user_id, isbn):
     """Emprunter un livre (Utilise borrow_book)"""
     try:
         u_id = UUID(user_id)
-        user = user_repo.get_user(u_id)
-        book = book_repo.get_book_by_isbn(isbn)
+        user = services.user_repo.get_user(u_id)
+        book = services.book_repo.get_book_by_isbn(isbn)
 
         if not user or not book:
             click.echo(click.style("❌ Utilisateur ou livre inexistant", fg='red'))
@@ -140,40 +189,51 @@ def borrow(user_id, isbn):
 
         user_name = f"{user.first_name} {user.last_name}"
         
-        if borrow_repo.borrow_book(u_id, user_name, isbn, book.title):
+        if services.borrow_repo.borrow_book(u_id, user_name, isbn, book.title):
             click.echo(click.style(f"✅ Emprunt réussi : {book.title}", fg='green'))
         else:
             click.echo(click.style("❌ Erreur lors de l'emprunt", fg='red'))
+            if book.available_copies == 0:
+                click.echo(f"Titre épuisé : reservations add --user-id {u_id} --isbn {isbn}")
     except ValueError:
         click.echo(click.style("❌ Format UUID invalide", fg='red'))
 
 @borrows.command(name="return")
 @click.option('--user-id', prompt='User ID')
 @click.option('--isbn', prompt='ISBN')
-@click.option('--date', prompt='Date emprunt (YYYY-MM-DD HH:MM:SS.mmmmmm)')
+@click.option('--date', default=None, help="Date d'emprunt, pour choisir entre deux exemplaires du même titre")
 def return_book_cmd(user_id, isbn, date):
-    """Retourner un livre (Utilise return_book)"""
+    """Retourner un livre (emprunt en cours retrouvé par membre + ISBN)"""
     try:
         u_id = UUID(user_id)
-        # Gestion du format de date précis de Cassandra pour la Primary Key
-        try:
-            b_date = datetime.strptime(date, '%Y-%m-%d %H:%M:%S.%f')
-        except ValueError:
-            b_date = datetime.strptime(date, '%Y-%m-%d %H:%M:%S')
-
-        if borrow_repo.return_book(u_id, isbn, b_date):
+        b_date = datetime.fromisoformat(date) if date else None
+        if services.borrow_repo.return_book(u_id, isbn, b_date):
             click.echo(click.style("✅ Livre retourné avec succès", fg='green'))
         else:
-            click.echo(click.style("❌ Échec du retour", fg='red'))
+            click.echo(click.style("❌ Échec du retour (aucun emprunt en cours ?)", fg='red'))
     except Exception as e:
         click.echo(click.style(f"❌ Erreur : {e}", fg='red'))
 
+@borrows.command()
+@click.option('--user-id', prompt='User ID')
+def active(user_id):
+    """Emprunts en cours d'un membre (active_loans)"""
+    try:
+        loans = services.borrow_repo.get_active_loans(UUID(user_id))
+        if loans:
+            data = [[l.isbn, l.book_title, l.borrow_date] for l in loans]
+            click.echo("\n" + tabulate(data, headers=['ISBN', 'Titre', 'Date'], tablefmt="grid"))
+        else:
+            click.echo(click.style("Aucun emprunt en cours", fg='yellow'))
+    except ValueError:
+        click.echo(click.style("❌ Format UUID invalide", fg='red'))
+
 @borrows.command()
 @click.option('--user-id', prompt='User ID')
 def history(user_id):
     """Consulter l'historique des emprunts"""
     try:
-        rows = borrow_repo.get_user_borrows(UUID(user_id))
+        rows = services.borrow_repo.get_user_borrows(UUID(user_id))
         borrows_list = list(rows)
         if borrows_list:
             data = [[r.isbn, r.book_title, r.borrow_date, r.status] for r in borrows_list]
@@ -184,8 +244,200 @@ def history(user_id):
     except ValueError:
         click.echo(click.style("❌ Format UUID invalide", fg='red'))
 
+@borrows.command(name="import")
+@click.argument('path')
+@click.option('--action', type=click.Choice(['borrow', 'return']), default='borrow',
+              help="Action par défaut si le fichier n'a pas de colonne 'action'")
+def import_borrows(path, action):
+    """Importer un lot d'emprunts / retours (CSV ou JSONL : action, user_id, isbn, borrow_date)"""
+    to_borrow, to_return, invalid = [], [], []
+    for record in read_records(path):
+        reason = invalid_record(record)
+        if reason is not None:
+            invalid.append(BulkResult(None, None, None, False, f"Entrée invalide : {reason}"))
+            continue
+        item = (record.get('user_id'), record.get('isbn'), record.get('borrow_date') or None)
+        if (record.get('action') or action) == 'return':
+            to_return.append(item)
+        else:
+            to_borrow.append(item)
+
+    report = services.borrow_repo.borrow_many(to_borrow) + services.borrow_repo.return_many(to_return) + invalid
+    failures = [r for r in report if not r.ok]
+    click.echo(click.style(f"✅ {len(report) - len(failures)} opérations enregistrées", fg='green'))
+    if failures:
+        data = [[r.user_id, r.isbn, r.borrow_date, r.error] for r in failures]
+        headers = ['User ID', 'ISBN', 'Date', 'Erreur']
+        click.echo(click.style(f"❌ {len(failures)} en échec", fg='red'))
+        click.echo("\n" + tabulate(data, headers=headers, tablefmt="grid"))
+
+# ================== RÉSERVATIONS ==================
+
+@cli.group()
+def reservations():
+    """File d'attente des titres épuisés"""
+    pass
+
+@reservations.command(name="add")
+@click.option('--user-id', prompt='User ID')
+@click.option('--isbn', prompt='ISBN')
+def add_reservation(user_id, isbn):
+    """Réserver un titre (le prochain exemplaire rendu sera prêté au membre)"""
+    try:
+        u_id = UUID(user_id)
+        user = services.user_repo.get_user(u_id)
+        book = services.book_repo.get_book_by_isbn(isbn)
+        if not user or not book:
+            click.echo(click.style("❌ Utilisateur ou livre inexistant", fg='red'))
+            return
+        if book.available_copies > 0:
+            # Comme l'interface web : pas de file d'attente pour un titre en rayon
+            click.echo(click.style(f"Ce livre est disponible ({book.available_copies} exemplaire(s)) : "
+                                   f"il peut être emprunté directement", fg='yellow'))
+            return
+        if services.reservation_repo.reserve(u_id, f"{user.first_name} {user.last_name}", isbn):
+            rank = services.reservation_repo.position(u_id, isbn)
+            click.echo(click.style(f"✅ Réservation enregistrée (position {rank})", fg='green'))
+        else:
+            click.echo(click.style("❌ Réservation impossible (déjà en file ?)", fg='red'))
+    except ValueError:
+        click.echo(click.style("❌ Format UUID invalide", fg='red'))
+
+@reservations.command(name="cancel")
+@click.option('--user-id', prompt='User ID')
+@click.option('--isbn', prompt='ISBN')
+def cancel_reservation(user_id, isbn):
+    """Annuler une réservation"""
+    try:
+        if services.reservation_repo.cancel(UUID(user_id), isbn):
+            click.echo(click.style("✅ Réservation annulée", fg='green'))
+        else:
+            click.echo(click.style("Aucune réservation pour ce titre", fg='yellow'))
+    except ValueError:
+        click.echo(click.style("❌ Format UUID invalide", fg='red'))
+
+@reservations.command()
+@click.option('--user-id', prompt='User ID')
+@click.option('--isbn', prompt='ISBN')
+def position(user_id, isbn):
+    """Rang d'un membre dans la file d'un titre"""
+    try:
+        rank = services.reservation_repo.position(UUID(user_id), isbn)
+        if rank is None:
+            click.echo(click.style("Aucune réservation pour ce titre", fg='yellow'))
+        else:
+            click.echo(f"Position dans la file : {rank}")
+    except ValueError:
+        click.echo(click.style("❌ Format UUID invalide", fg='red'))
+
+@reservations.command()
+@click.option('--isbn', prompt='ISBN')
+@click.option('--limit', type=int, default=50)
+def queue(isbn, limit):
+    """File d'attente d'un titre, dans l'ordre de service"""
+    rows = services.reservation_repo.get_queue(isbn, limit)
+    if rows:
+        data = [[rank, r.user_name, r.user_id, r.reservation_date] for rank, r in enumerate(rows, 1)]
+        click.echo("\n" + tabulate(data, headers=['Rang', 'Membre', 'User ID', 'Réservé le'], tablefmt="grid"))
+    else:
+        click.echo(click.style("Aucune réservation en attente", fg='yellow'))
+
+# ================== SUPERVISION ==================
+
+@cli.command()
+@click.option('--url', default=lambda: f"http://localhost:{os.environ.get('LIBRARY_METRICS_PORT', '9108')}/metrics",
+              show_default="http://localhost:$LIBRARY_METRICS_PORT/metrics",
+              help="Endpoint /metrics de l'application (LIBRARY_METRICS_PORT=9108 streamlit run app_web.py)")
+@click.option('--format', 'fmt', type=click.Choice(['table', 'prometheus']), default='table')
+def metrics(url, fmt):
+    """Latences et erreurs par requête CQL et par nœud coordinateur de l'application en cours"""
+    try:
+        text = fetch_exposition(url)
+    except Exception as e:
+        click.echo(click.style(f"❌ Métriques indisponibles sur {url} : {e}", fg='red'))
+        click.echo("   Lancer l'application avec LIBRARY_METRICS_PORT pour publier /metrics")
+        sys.exit(1)
+
+    if fmt == 'prometheus':
+        click.echo(text, nl=False)
+        return
+    summary = summarize_exposition(text)
+    if not summary['statements']:
+        click.echo(click.style("Aucune requête mesurée depuis le démarrage de l'application", fg='yellow'))
+    for key, title in (('statements', 'Requête'), ('hosts', 'Coordinateur')):
+        rows = summary[key]
+        if rows:
+            headers = [title] + list(rows[0])[1:]
+            click.echo("\n" + tabulate([list(r.values()) for r in rows], headers=headers, tablefmt="grid"))
+    if summary['statements']:
+        click.echo("Percentiles : borne haute du bucket exporté qui les contient")
+    reads = summary['reads']
+    if reads.get('requests'):
+        click.echo(f"\nLectures regroupées : {reads['collapsed']} sur {reads['requests']} "
+                   f"({reads['collapsed'] / reads['requests']:.1%}), {reads['executed']} envoyées au cluster")
+
+@cli.command()
+@click.option('--repair', is_flag=True, help="Réécrire les lignes en écart (sinon rapport seulement)")
+@click.option('--since', default=None, help="Contrôler les livres modifiés depuis cette date (ISO)")
+@click.option('--incremental', is_flag=True, help="Reprendre depuis la dernière réconciliation terminée (--state)")
+@click.option('--state', default=lambda: os.environ.get('LIBRARY_RECONCILE_STATE', 'reconcile_state.json'),
+              show_default='reconcile_state.json', help="Fichier mémorisant la dernière réconciliation terminée")
+@click.option('--report', 'report_path', default=None, help="Rapport de dérive JSONL (un écart par ligne)")
+@click.option('--rate', type=float, default=200, help="Réparations par seconde au plus (0 = illimité)")
+@click.option('--batch-size', type=int, default=200, help="Livres comparés par lot")
+@click.option('--every', type=int, default=None, help="Relancer toutes les N secondes (mode incrémental)")
+def reconcile(repair, since, incremental, state, report_path, rate, batch_size, every):
+    """Contrôle books_by_category / books_by_author par rapport à books_by_id"""
+    reconciler = Reconciler(services.session, batch_size=batch_size, write_rate=rate or None)
+    services.query_metrics.register(reconciler)
+    while True:
+        start = datetime.fromisoformat(since) if since else (load_watermark(state) if incremental or every else None)
+        report = reconciler.run(repair=repair, since=start, report_path=report_path)
+        scope = f"depuis {start:%Y-%m-%d %H:%M:%S}" if start else "catalogue complet"
+        click.echo(f"\n{report.checked} livres contrôlés sur {report.scanned} ({scope}) "
+                   f"en {report.elapsed:.1f}s : {report.drifts} écarts, {report.repaired} réparés")
+        if report.by_table:
+            data = [key.split('.') + [count] for key, count in sorted(report.by_table.items())]
+            click.echo(tabulate(data, headers=['Table', 'Écart', 'Livres'], tablefmt="grid"))
+        # Tant qu'un écart reste à corriger, la prochaine passe incrémentale doit le revoir
+        resolved = report.drifts == 0 or (repair and report.failed == 0 and report.repaired == report.drifts)
+        if resolved:
+            save_watermark(state, report.started_at)
+        if every is None:
+            if not resolved:
+                sys.exit(1)
+            return
+        time.sleep(every)
+
+@cli.command()
+@click.argument('export', type=click.Choice(list(EXPORTS)))
+@click.argument('path')
+@click.option('--format', 'fmt', type=click.Choice(FORMATS), default=None,
+              help="Format de sortie (par défaut : extension de PATH, sinon csv ; parquet requiert pyarrow)")
+@click.option('--chunk-size', type=int, default=10000, help="Lignes écrites et validées par lot")
+@click.option('--checkpoint', 'checkpoint_path', default=None, help="Point de reprise (défaut : PATH.checkpoint)")
+@click.option('--restart', is_flag=True, help="Ignorer le point de reprise et tout réexporter")
+@click.option('--rate', type=float, default=None, help="Lignes lues par seconde au plus")
+@click.option('--splits', type=int, default=None, help="Nombre de plages de tokens")
+@click.option('--concurrency', type=int, default=6, help="Plages lues en parallèle")
+def export(export, path, fmt, chunk_size, checkpoint_path, restart, rate, splits, concurrency):
+    """Export en flux d'une table (livres, membres, emprunts) en CSV, JSONL ou Parquet"""
+    exporter = TableExporter(services.session, export, path, fmt=fmt, chunk_size=chunk_size,
+                             checkpoint_path=checkpoint_path, splits=splits, concurrency=concurrency,
+                             rate=rate)
+    try:
+        report = exporter.run(restart=restart)
+    except RuntimeError as e:
+        click.echo(f"❌ {e}")
+        sys.exit(1)
+    speed = report.rows / report.elapsed if report.elapsed else 0
+    resumed = " (reprise)" if report.resumed else ""
+    click.echo(f"\n✅ {report.rows:,} lignes exportées dans {path}{resumed} en {report.elapsed:.1f}s "
+               f"({speed:,.0f} lignes/s)")
+
 if __name__ == '__main__':
     try:
         cli()
     finally:
-        db.close()
\ No newline at end of file
+        # Envoie les compteurs en attente avant de fermer la session (si ouverte)
+        services.close()
\ No newline at end of file
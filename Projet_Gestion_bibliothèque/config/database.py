@@ -1,28 +1,57 @@
-from cassandra.cluster import Cluster
+from cassandra import ConsistencyLevel
+from cassandra.cluster import Cluster, ExecutionProfile, EXEC_PROFILE_DEFAULT
 from cassandra.auth import PlainTextAuthProvider
+from cassandra.policies import (TokenAwarePolicy, DCAwareRoundRobinPolicy,
+                                ExponentialReconnectionPolicy)
 from loguru import logger
+from config.settings import CassandraSettings
 
 class CassandraConnection:
     """Gestionnaire de connexion Cassandra"""
 
-    def __init__(self, hosts=['127.0.0.1'], port=9042, keyspace='library_system'):
-        self.hosts = hosts
-        self.port = port
-        self.keyspace = keyspace
+    def __init__(self, hosts=None, port=None, keyspace=None, settings=None):
+        # Paramètres : arguments explicites > variables CASSANDRA_* / .env > défauts
+        self.settings = settings or CassandraSettings.from_env()
+        self.hosts = hosts or self.settings.hosts
+        self.port = port or self.settings.port
+        self.keyspace = keyspace or self.settings.keyspace
         self.cluster = None
         self.session = None
 
+    def build_cluster(self):
+        """Construit le Cluster (sans se connecter) à partir des paramètres"""
+        s = self.settings
+        # Token-aware : le driver calcule le token de la clé de partition des
+        # requêtes préparées et envoie directement à une réplique du DC local
+        profile = ExecutionProfile(
+            load_balancing_policy=TokenAwarePolicy(DCAwareRoundRobinPolicy(local_dc=s.local_dc),
+                                                   shuffle_replicas=True),
+            request_timeout=s.request_timeout,
+            consistency_level=ConsistencyLevel.name_to_value[s.consistency],
+        )
+        options = {
+            'contact_points': self.hosts,
+            'port': self.port,
+            'execution_profiles': {EXEC_PROFILE_DEFAULT: profile},
+            'compression': s.driver_compression(),
+            'reconnection_policy': ExponentialReconnectionPolicy(s.reconnect_base_delay, s.reconnect_max_delay),
+            'connect_timeout': s.connect_timeout,
+            'executor_threads': s.executor_threads,
+        }
+        if s.protocol_version:
+            options['protocol_version'] = s.protocol_version
+        if s.username:
+            options['auth_provider'] = PlainTextAuthProvider(username=s.username, password=s.password)
+        return Cluster(**options)
+
     def connect(self):
         """Établir la connexion"""
         try:
-            self.cluster = Cluster(
-                contact_points=self.hosts,
-                port=self.port
-            )
+            self.cluster = self.build_cluster()
             self.session = self.cluster.connect()
-            self.session.default_timeout = 60
-            logger.success(f"✅ Connecté à Cassandra: {self.hosts}")
-            
+            logger.success(f"✅ Connecté à Cassandra: {self.settings.describe()} "
+                           f"- protocole négocié v{self.cluster.protocol_version}, "
+                           f"{len(self.cluster.metadata.all_hosts())} nœuds")
 
             # Utiliser le keyspace
             self.session.set_keyspace(self.keyspace)
@@ -50,4 +79,4 @@ if __name__ == "__main__":
     for row in rows:
         logger.info(f"Cassandra version: {row.release_version}")
 
-    db.close()
\ No newline at end of file
+    db.close()
@@ -0,0 +1,1285 @@
+"""Session Cassandra en mémoire (tests hors-ligne et micro-benchmarks).
+
+`MemorySession` reproduit la partie de l'API du driver utilisée par les
+repositories : prepare, execute, execute_async, BatchStatement, pagination
+(fetch_size / paging_state), transactions légères (IF ...), compteurs,
+TTL, WRITETIME et token(). Les tables sont lues depuis schema/schema.cql :
+clés de partition, colonnes de clustering et ordre de tri sont respectés.
+
+Les objets renvoyés sont ceux du driver (PreparedStatement, BoundStatement,
+ResultSet) : les repositories fonctionnent sans aucune modification.
+Un délai artificiel (`latency`) permet de simuler l'aller-retour réseau.
+"""
+import os
+import re
+import time
+import heapq
+import bisect
+import random
+import hashlib
+import threading
+from datetime import datetime, timezone
+from uuid import UUID
+
+from cassandra import InvalidRequest
+from cassandra import cqltypes
+from cassandra.murmur3 import murmur3
+from cassandra.protocol import ColumnMetadata, SyntaxException
+from cassandra.query import (
+    BatchStatement, BoundStatement, PreparedStatement, SimpleStatement,
+    named_tuple_factory, FETCH_SIZE_UNSET, UNSET_VALUE
+)
+from cassandra.encoder import Encoder
+from cassandra.cluster import ResultSet, ExecutionProfile
+from loguru import logger
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_SCHEMA = os.path.join(BASE_DIR, 'schema', 'schema.cql')
+PROTOCOL_VERSION = 4
+
+# ================== TYPES ==================
+
+def cql_type(name):
+    """Type du driver (cqltypes) pour un nom CQL simple ('text', 'uuid', ...)"""
+    name = name.strip().lower()
+    if name.startswith(('list<', 'set<')):
+        inner = cql_type(name[name.index('<') + 1:-1])
+        container = cqltypes.ListType if name.startswith('list') else cqltypes.SetType
+        return container.apply_parameters([inner])
+    try:
+        return cqltypes._cqltypes[name]
+    except KeyError:
+        raise InvalidRequest(f"Type CQL non supporté : {name}")
+
+def _sort_key(ctype, value):
+    """Clé de tri conforme à Cassandra (timeuuid trié par date)"""
+    if ctype is cqltypes.TimeUUIDType and isinstance(value, UUID):
+        return (value.time, value.bytes)
+    return value
+
+def _coerce_literal(ctype, value):
+    """Convertit un littéral CQL (ou un paramètre %s) vers le type de la colonne"""
+    if value is None:
+        return None
+    if ctype in (cqltypes.UUIDType, cqltypes.TimeUUIDType) and isinstance(value, str):
+        return UUID(value)
+    if ctype is cqltypes.DateType:
+        if isinstance(value, (int, float)):
+            return datetime.fromtimestamp(value / 1000.0, tz=timezone.utc).replace(tzinfo=None)
+        if isinstance(value, str):
+            parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+            if parsed.tzinfo:
+                parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+            return parsed
+    return value
+
+# ================== SCHÉMA ==================
+
+class TableSchema:
+    """Description d'une table : colonnes, clé primaire et ordre de clustering"""
+
+    def __init__(self, name, columns, partition_key, clustering, order):
+        self.name = name
+        self.columns = columns              # {nom: type driver}, ordre de déclaration
+        self.partition_key = partition_key  # [colonnes]
+        self.clustering = clustering        # [colonnes]
+        self.order = order                  # {colonne de clustering: 'ASC' | 'DESC'}
+        self.regular = sorted(c for c in columns if c not in partition_key and c not in clustering)
+
+    def star_columns(self):
+        """Ordre des colonnes d'un SELECT * (clé de partition, clustering, puis alphabétique)"""
+        return self.partition_key + self.clustering + self.regular
+
+    def is_counter_table(self):
+        return any(t is cqltypes.CounterColumnType for t in self.columns.values())
+
+def _split_top_level(text):
+    parts, depth, current = [], 0, []
+    for ch in text:
+        if ch in '(<':
+            depth += 1
+        elif ch in ')>':
+            depth -= 1
+        if ch == ',' and depth == 0:
+            parts.append(''.join(current).strip())
+            current = []
+        else:
+            current.append(ch)
+    if ''.join(current).strip():
+        parts.append(''.join(current).strip())
+    return parts
+
+def strip_comments(cql):
+    return re.sub(r'--[^\n]*|//[^\n]*', '', cql)
+
+_CREATE_TABLE = re.compile(r'CREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?(?:\w+\.)?(\w+)\s*\(', re.I)
+
+def parse_create_table(statement):
+    """Analyse un CREATE TABLE ; retourne un TableSchema ou None"""
+    statement = statement.strip().rstrip(';').strip()
+    match = _CREATE_TABLE.match(statement)
+    if not match:
+        return None
+    # Corps entre parenthèses équilibrées, puis options (WITH ...)
+    depth, end = 1, match.end()
+    while depth:
+        depth += {'(': 1, ')': -1}.get(statement[end], 0)
+        end += 1
+    name, body, options = match.group(1).lower(), statement[match.end():end - 1], statement[end:]
+
+    columns, partition_key, clustering = {}, [], []
+    for item in _split_top_level(body):
+        pk = re.match(r'PRIMARY\s+KEY\s*\((.*)\)$', item, re.I | re.S)
+        if pk:
+            keys = _split_top_level(pk.group(1))
+            first = keys[0]
+            if first.startswith('('):
+                partition_key = [k.strip().lower() for k in first.strip('()').split(',')]
+            else:
+                partition_key = [first.lower()]
+            clustering = [k.strip().lower() for k in keys[1:]]
+            continue
+        tokens = item.split(None, 1)
+        col, rest = tokens[0].lower(), tokens[1]
+        if re.search(r'\bPRIMARY\s+KEY\b', rest, re.I):
+            partition_key = [col]
+            rest = re.sub(r'\bPRIMARY\s+KEY\b', '', rest, flags=re.I)
+        rest = re.sub(r'\bSTATIC\b', '', rest, flags=re.I)
+        columns[col] = cql_type(rest)
+
+    order = {c: 'ASC' for c in clustering}
+    clustering_order = re.search(r'CLUSTERING\s+ORDER\s+BY\s*\(([^)]*)\)', options, re.I)
+    if clustering_order:
+        for item in clustering_order.group(1).split(','):
+            col, direction = item.split()
+            order[col.lower()] = direction.upper()
+    return TableSchema(name, columns, partition_key, clustering, order)
+
+def load_schema(path=DEFAULT_SCHEMA):
+    with open(path, 'r', encoding='utf-8') as f:
+        cql = strip_comments(f.read())
+    tables = {}
+    for statement in cql.split(';'):
+        table = parse_create_table(statement)
+        if table:
+            tables[table.name] = table
+    return tables
+
+# ================== ANALYSE DES REQUÊTES ==================
+
+_TOKEN_RE = re.compile(r"""
+    (?P<space>\s+)
+  | (?P<string>'(?:[^']|'')*')
+  | (?P<uuid>[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12})
+  | (?P<number>\d+(?:\.\d+)?)
+  | (?P<quoted>"(?:[^"]|"")*")
+  | (?P<name>[A-Za-z_][A-Za-z0-9_]*)
+  | (?P<marker>\?|%s)
+  | (?P<op><=|>=|!=|[=<>(),*+\-;.\[\]{}:])
+""", re.X)
+
+class Marker:
+    """Paramètre lié (? ou %s)"""
+    __slots__ = ('index',)
+
+    def __init__(self, index):
+        self.index = index
+
+class Literal:
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+class Term:
+    """Membre gauche d'une condition : colonne ou token(clé de partition)"""
+    __slots__ = ('column', 'is_token')
+
+    def __init__(self, column, is_token=False):
+        self.column = column
+        self.is_token = is_token
+
+class Statement:
+    """Requête analysée (kind = select | insert | update | delete | ddl)"""
+
+    def __init__(self, kind, table=None):
+        self.kind = kind
+        self.table = table
+        self.markers = []          # ColumnMetadata par paramètre
+        self.columns = []          # select : [(expr, nom)] ; insert : colonnes
+        self.values = []           # insert : Marker / Literal
+        self.where = []            # [(Term, op, operande)]
+        self.assignments = []      # update : [(colonne, '=' | '+' | '-', operande)]
+        self.conditions = []       # IF col op valeur
+        self.if_exists = False
+        self.if_not_exists = False
+        self.limit = None
+        self.ttl = None
+        self.timestamp = None
+        self.order_desc = None
+        self.allow_filtering = False
+        self.ddl = None
+
+    @property
+    def is_lwt(self):
+        return bool(self.if_exists or self.if_not_exists or self.conditions)
+
+class _Parser:
+    """Analyseur descendant du sous-ensemble de CQL utilisé par l'application"""
+
+    def __init__(self, query, tables, keyspace):
+        self.query = query
+        self.tables = tables
+        self.keyspace = keyspace
+        self.tokens = []
+        for m in _TOKEN_RE.finditer(query):
+            if m.lastgroup != 'space':
+                self.tokens.append((m.lastgroup, m.group()))
+        consumed = sum(len(m.group()) for m in _TOKEN_RE.finditer(query))
+        if consumed != len(query):
+            raise SyntaxException(message=f"Caractère inattendu dans : {query}")
+        self.pos = 0
+        self.marker_count = 0
+
+    # ----- utilitaires -----
+
+    def peek(self, offset=0):
+        index = self.pos + offset
+        return self.tokens[index] if index < len(self.tokens) else (None, None)
+
+    def next(self):
+        token = self.peek()
+        if token[0] is None:
+            raise SyntaxException(message=f"Fin de requête inattendue : {self.query}")
+        self.pos += 1
+        return token
+
+    def at(self, *words):
+        for i, word in enumerate(words):
+            kind, value = self.peek(i)
+            if value is None or value.upper() != word:
+                return False
+        return True
+
+    def accept(self, *words):
+        if self.at(*words):
+            self.pos += len(words)
+            return True
+        return False
+
+    def expect(self, *words):
+        if not self.accept(*words):
+            raise SyntaxException(message=f"'{' '.join(words)}' attendu près de {self.peek()[1]!r} : {self.query}")
+
+    def identifier(self):
+        kind, value = self.next()
+        if kind == 'quoted':
+            return value[1:-1].replace('""', '"')
+        if kind != 'name':
+            raise SyntaxException(message=f"Identifiant attendu, trouvé {value!r} : {self.query}")
+        return value.lower()
+
+    def table_name(self):
+        name = self.identifier()
+        if self.accept('.'):
+            name = self.identifier()
+        if name not in self.tables:
+            raise InvalidRequest(f"unconfigured table {name}")
+        return self.tables[name]
+
+    def operand(self, statement, table, column, ctype=None):
+        """Lit un paramètre ou un littéral et enregistre son type"""
+        ctype = ctype or (table.columns[column] if column in table.columns else None)
+        kind, value = self.peek()
+        if kind == 'marker':
+            self.next()
+            marker = Marker(self.marker_count)
+            self.marker_count += 1
+            statement.markers.append(ColumnMetadata(self.keyspace, table.name, column, ctype))
+            return marker
+        if value == '(':
+            # Liste de valeurs : IN (?, ?, 'x')
+            self.next()
+            items = []
+            while not self.accept(')'):
+                items.append(self.operand(statement, table, column, ctype))
+                self.accept(',')
+            return items
+        return Literal(_coerce_literal(ctype, self.literal()))
+
+    def literal(self):
+        kind, value = self.next()
+        if kind == 'string':
+            return value[1:-1].replace("''", "'")
+        if kind == 'number':
+            return float(value) if '.' in value else int(value)
+        if kind == 'uuid':
+            return UUID(value)
+        if value == '-':
+            number = self.literal()
+            return -number
+        if kind == 'name' and value.lower() in ('true', 'false'):
+            return value.lower() == 'true'
+        if kind == 'name' and value.lower() == 'null':
+            return None
+        raise SyntaxException(message=f"Littéral attendu, trouvé {value!r} : {self.query}")
+
+    # ----- requêtes -----
+
+    def parse(self):
+        kind, word = self.peek()
+        word = (word or '').upper()
+        if word == 'SELECT':
+            statement = self.select()
+        elif word == 'INSERT':
+            statement = self.insert()
+        elif word == 'UPDATE':
+            statement = self.update()
+        elif word == 'DELETE':
+            statement = self.delete()
+        elif word in ('CREATE', 'DROP', 'USE', 'TRUNCATE', 'ALTER'):
+            return self.ddl()
+        else:
+            raise SyntaxException(message=f"Requête non supportée : {self.query}")
+        self.accept(';')
+        if self.peek()[0] is not None:
+            raise SyntaxException(message=f"Texte inattendu après la requête : {self.peek()[1]!r}")
+        return statement
+
+    def ddl(self):
+        statement = Statement('ddl')
+        statement.ddl = self.query.strip().rstrip(';')
+        self.pos = len(self.tokens)
+        return statement
+
+    def select(self):
+        self.expect('SELECT')
+        self.accept('DISTINCT')
+        selectors = []
+        while True:
+            selectors.append(self.selector())
+            if not self.accept(','):
+                break
+        self.expect('FROM')
+        table = self.table_name()
+        statement = Statement('select', table)
+        for expr, alias in selectors:
+            if expr[0] in ('column', 'writetime', 'ttl') and expr[1] not in table.columns:
+                raise InvalidRequest(f"Undefined column name {expr[1]} in table {table.name}")
+        statement.columns = selectors
+        if self.accept('WHERE'):
+            self.where(statement, table)
+        if self.accept('ORDER', 'BY'):
+            self.identifier()
+            statement.order_desc = self.accept('DESC')
+            if not statement.order_desc:
+                self.accept('ASC')
+        if self.accept('LIMIT'):
+            statement.limit = self.operand(statement, table, '[limit]', cqltypes.Int32Type)
+        statement.allow_filtering = self.accept('ALLOW', 'FILTERING')
+        return statement
+
+    def selector(self):
+        kind, value = self.peek()
+        if value == '*':
+            self.next()
+            return ('star', None), None
+        upper = (value or '').upper()
+        if upper in ('COUNT', 'WRITETIME', 'TTL', 'TOKEN') and self.peek(1)[1] == '(':
+            self.next()
+            self.expect('(')
+            if upper == 'COUNT':
+                self.next()  # * ou 1
+                expr = ('count', None)
+                name = 'count'
+            else:
+                column = self.identifier()
+                expr = (upper.lower(), column)
+                name = f"{upper.lower()}({column})"
+            self.expect(')')
+        else:
+            column = self.identifier()
+            expr, name = ('column', column), column
+        if self.accept('AS'):
+            name = self.identifier()
+        return expr, name
+
+    def where(self, statement, table):
+        while True:
+            if self.accept('TOKEN'):
+                self.expect('(')
+                while not self.accept(')'):
+                    self.identifier()
+                    self.accept(',')
+                term = Term(None, is_token=True)
+                column, ctype = 'partition key token', cqltypes.LongType
+            else:
+                column = self.identifier()
+                if column not in table.columns:
+                    raise InvalidRequest(f"Undefined column name {column} in table {table.name}")
+                term = Term(column)
+                ctype = table.columns[column]
+            kind, op = self.next()
+            op = op.upper()
+            if op == 'IN':
+                if self.peek()[0] == 'marker':
+                    ctype = cqltypes.ListType.apply_parameters([ctype])
+            elif op not in ('=', '<', '>', '<=', '>='):
+                raise SyntaxException(message=f"Opérateur non supporté : {op}")
+            statement.where.append((term, op, self.operand(statement, table, column, ctype)))
+            if not self.accept('AND'):
+                break
+
+    def using(self, statement, table):
+        if self.accept('USING'):
+            while True:
+                if self.accept('TTL'):
+                    statement.ttl = self.operand(statement, table, '[ttl]', cqltypes.Int32Type)
+                elif self.accept('TIMESTAMP'):
+                    statement.timestamp = self.operand(statement, table, '[timestamp]', cqltypes.LongType)
+                if not self.accept('AND'):
+                    break
+
+    def insert(self):
+        self.expect('INSERT', 'INTO')
+        table = self.table_name()
+        statement = Statement('insert', table)
+        self.expect('(')
+        while not self.accept(')'):
+            column = self.identifier()
+            if column not in table.columns:
+                raise InvalidRequest(f"Undefined column name {column} in table {table.name}")
+            statement.columns.append(column)
+            self.accept(',')
+        self.expect('VALUES')
+        self.expect('(')
+        for column in statement.columns:
+            statement.values.append(self.operand(statement, table, column))
+            self.accept(',')
+        self.expect(')')
+        statement.if_not_exists = self.accept('IF', 'NOT', 'EXISTS')
+        self.using(statement, table)
+        return statement
+
+    def update(self):
+        self.expect('UPDATE')
+        table = self.table_name()
+        statement = Statement('update', table)
+        self.using(statement, table)
+        self.expect('SET')
+        while True:
+            column = self.identifier()
+            self.expect('=')
+            kind, value = self.peek()
+            if kind == 'name' and value.lower() == column and self.peek(1)[1] in ('+', '-'):
+                self.next()
+                op = self.next()[1]
+                statement.assignments.append((column, op, self.operand(statement, table, column)))
+            else:
+                statement.assignments.append((column, '=', self.operand(statement, table, column)))
+            if not self.accept(','):
+                break
+        self.expect('WHERE')
+        self.where(statement, table)
+        self.conditional(statement, table)
+        return statement
+
+    def delete(self):
+        self.expect('DELETE')
+        statement = Statement('delete')
+        columns = []
+        while not self.at('FROM'):
+            columns.append(self.identifier())
+            self.accept(',')
+        self.expect('FROM')
+        table = self.table_name()
+        statement.table = table
+        statement.columns = columns
+        self.expect('WHERE')
+        self.where(statement, table)
+        self.conditional(statement, table)
+        return statement
+
+    def conditional(self, statement, table):
+        if not self.accept('IF'):
+            return
+        if self.accept('EXISTS'):
+            statement.if_exists = True
+            return
+        while True:
+            column = self.identifier()
+            kind, op = self.next()
+            statement.conditions.append((column, op, self.operand(statement, table, column)))
+            if not self.accept('AND'):
+                break
+
+# ================== STOCKAGE ==================
+
+class _Row:
+    """Ligne stockée : valeurs, horodatages d'écriture et expirations (TTL)"""
+    __slots__ = ('values', 'writetime', 'expires', 'marker')
+
+    def __init__(self):
+        self.values = {}
+        self.writetime = {}
+        self.expires = {}
+        self.marker = False
+
+    def live_values(self, now):
+        if not self.expires:
+            return self.values
+        return {c: v for c, v in self.values.items()
+                if c not in self.expires or self.expires[c] > now}
+
+def _token(table, pk):
+    """Token Murmur3 de la clé de partition (même calcul que Cassandra)"""
+    parts = [table.columns[c].serialize(v, PROTOCOL_VERSION) for c, v in zip(table.partition_key, pk)]
+    if len(parts) == 1:
+        key = parts[0]
+    else:
+        key = b''.join(len(p).to_bytes(2, 'big') + p + b'\x00' for p in parts)
+    return murmur3(key)
+
+# ================== FUTURES ==================
+
+class MemoryResponseFuture:
+    """Équivalent de ResponseFuture : callbacks, pagination et result()"""
+
+    _continuous_paging_session = None
+
+    def __init__(self, session, query, values, paging_state, fetch_size, row_factory):
+        self.session = session
+        self.query = query
+        self.row_factory = row_factory
+        self.coordinator_host = session.host
+        self.attempted_hosts = [session.host]
+        self.has_more_pages = False
+        self._values = values
+        self._fetch_size = fetch_size
+        self._paging_state = paging_state
+        self._col_names = None
+        self._col_types = None
+        self._final_result = None
+        self._final_exception = None
+        self._event = threading.Event()
+        self._callbacks = []
+        self._errbacks = []
+        self._lock = threading.Lock()
+        self.warnings = None
+        self.custom_payload = None
+
+    def _run(self):
+        try:
+            names, types, rows, next_state = self.session._execute_now(
+                self.query, self._values, self._paging_state, self._fetch_size)
+            self._col_names, self._col_types = names, types
+            self._paging_state = next_state
+            self.has_more_pages = next_state is not None
+            result = self.row_factory(names, rows) if names else []
+            self._set_result(result)
+        except Exception as exc:
+            self._set_exception(exc)
+
+    def _set_result(self, result):
+        with self._lock:
+            self._final_result = result
+            self._event.set()
+            callbacks = list(self._callbacks)
+        for fn, args, kwargs in callbacks:
+            fn(result, *args, **kwargs)
+
+    def _set_exception(self, exc):
+        with self._lock:
+            self._final_exception = exc
+            self._event.set()
+            errbacks = list(self._errbacks)
+        for fn, args, kwargs in errbacks:
+            fn(exc, *args, **kwargs)
+
+    def start_fetching_next_page(self):
+        if not self.has_more_pages:
+            raise RuntimeError("Aucune page suivante")
+        self._event.clear()
+        self._final_result = None
+        self.session._schedule(self)
+
+    def result(self):
+        self._event.wait()
+        if self._final_exception is not None:
+            raise self._final_exception
+        return ResultSet(self, self._final_result)
+
+    def add_callback(self, fn, *args, **kwargs):
+        with self._lock:
+            done = self._event.is_set() and self._final_exception is None
+            if not done:
+                self._callbacks.append((fn, args, kwargs))
+        if done:
+            fn(self._final_result, *args, **kwargs)
+        return self
+
+    def add_errback(self, fn, *args, **kwargs):
+        with self._lock:
+            failed = self._event.is_set() and self._final_exception is not None
+            if not failed:
+                self._errbacks.append((fn, args, kwargs))
+        if failed:
+            fn(self._final_exception, *args, **kwargs)
+        return self
+
+    def add_callbacks(self, callback, errback, callback_args=(), callback_kwargs=None,
+                      errback_args=(), errback_kwargs=None):
+        self.add_callback(callback, *callback_args, **(callback_kwargs or {}))
+        self.add_errback(errback, *errback_args, **(errback_kwargs or {}))
+
+    def clear_callbacks(self):
+        with self._lock:
+            self._callbacks = []
+            self._errbacks = []
+
+    def get_query_trace(self, max_wait=None):
+        return None
+
+class _LatencyScheduler(threading.Thread):
+    """Termine les requêtes après le délai simulé (comme la boucle réseau du driver)"""
+
+    def __init__(self):
+        super().__init__(name="memory-session-latency", daemon=True)
+        self._heap = []
+        self._cond = threading.Condition()
+        self._seq = 0
+
+    def submit(self, delay, future):
+        with self._cond:
+            self._seq += 1
+            heapq.heappush(self._heap, (time.perf_counter() + delay, self._seq, future))
+            self._cond.notify()
+
+    def run(self):
+        while True:
+            with self._cond:
+                while not self._heap:
+                    self._cond.wait()
+                due, _, future = self._heap[0]
+                wait = due - time.perf_counter()
+                if wait > 0:
+                    self._cond.wait(wait)
+                    continue
+                heapq.heappop(self._heap)
+            future._run()
+
+# ================== SESSION ==================
+
+class _MemoryMetadata:
+    token_map = None
+
+    def __init__(self, session):
+        self._session = session
+
+    @property
+    def keyspaces(self):
+        return {}
+
+class MemoryCluster:
+    """Cluster factice exposé via session.cluster (métadonnées minimales)"""
+
+    def __init__(self, session):
+        self.metadata = _MemoryMetadata(session)
+        self.contact_points = [session.host]
+
+    def shutdown(self):
+        pass
+
+class MemorySession:
+    """Session en mémoire compatible avec l'usage qu'en font les repositories.
+
+    latency : délai simulé par requête (secondes) ; jitter : variation
+    aléatoire ajoutée (secondes). Les requêtes execute_async se terminent en
+    parallèle, comme sur un vrai cluster.
+    """
+
+    host = 'memory'
+
+    def __init__(self, schema_path=DEFAULT_SCHEMA, keyspace='library_system', latency=0.0, jitter=0.0):
+        self.keyspace = keyspace
+        self.latency = latency
+        self.jitter = jitter
+        self.default_timeout = 10.0
+        self.default_fetch_size = 5000
+        self.row_factory = named_tuple_factory
+        self.execution_profiles = {}
+        self.encoder = Encoder()
+        self.cluster = MemoryCluster(self)
+        self._tables = load_schema(schema_path) if schema_path else {}
+        self._data = {name: {} for name in self._tables}
+        # Anneau trié [(token, pk)] par table, reconstruit quand une partition apparaît ou disparaît
+        self._rings = {}
+        self._prepared = {}
+        self._lock = threading.RLock()
+        self._last_timestamp = 0
+        self._scheduler = None
+        self._request_init_listeners = []
+
+    # ----- API du driver -----
+
+    def set_keyspace(self, keyspace):
+        self.keyspace = keyspace
+
+    def prepare(self, query, custom_payload=None, keyspace=None):
+        # Une préparation est un aller-retour synchrone vers le cluster
+        if self.latency or self.jitter:
+            time.sleep(self.latency + (random.uniform(0, self.jitter) if self.jitter else 0.0))
+        parsed = self._parse(query)
+        query_id = hashlib.md5(' '.join(query.split()).encode('utf-8')).digest()
+        with self._lock:
+            self._prepared[query_id] = parsed
+        routing = None
+        if parsed.table is not None:
+            names = [m.name for m in parsed.markers]
+            if all(c in names for c in parsed.table.partition_key):
+                routing = [names.index(c) for c in parsed.table.partition_key]
+        result_metadata = []
+        if parsed.kind == 'select':
+            result_metadata = [ColumnMetadata(self.keyspace, parsed.table.name, name, None)
+                               for _, name in parsed.columns]
+        return PreparedStatement(parsed.markers, query_id, routing, query, self.keyspace,
+                                 PROTOCOL_VERSION, result_metadata, None)
+
+    def execute(self, query, parameters=None, timeout=None, trace=False, custom_payload=None,
+                execution_profile=None, paging_state=None, host=None, execute_as=None):
+        return self.execute_async(query, parameters, trace, custom_payload, timeout,
+                                  execution_profile, paging_state, host, execute_as).result()
+
+    def execute_async(self, query, parameters=None, trace=False, custom_payload=None, timeout=None,
+                      execution_profile=None, paging_state=None, host=None, execute_as=None):
+        if isinstance(query, str):
+            query = SimpleStatement(query)
+        if isinstance(query, PreparedStatement):
+            query = query.bind(parameters)
+            parameters = None
+
+        fetch_size = query.fetch_size
+        if fetch_size is FETCH_SIZE_UNSET:
+            fetch_size = self.default_fetch_size
+
+        future = MemoryResponseFuture(self, query, parameters, paging_state, fetch_size,
+                                      self._row_factory(execution_profile))
+        for fn, args, kwargs in self._request_init_listeners:
+            fn(future, *args, **kwargs)
+        self._schedule(future)
+        return future
+
+    def add_request_init_listener(self, fn, *args, **kwargs):
+        self._request_init_listeners.append((fn, args, kwargs))
+
+    def remove_request_init_listener(self, fn, *args, **kwargs):
+        self._request_init_listeners.remove((fn, args, kwargs))
+
+    def execution_profile_clone_update(self, ep, **kwargs):
+        profile = self.execution_profiles.get(ep, ep) if not isinstance(ep, ExecutionProfile) else ep
+        clone = ExecutionProfile(row_factory=getattr(profile, 'row_factory', self.row_factory))
+        for key, value in kwargs.items():
+            setattr(clone, key, value)
+        return clone
+
+    def shutdown(self):
+        pass
+
+    # ----- outils de test -----
+
+    def table(self, name):
+        """Toutes les lignes d'une table (dicts), pour les assertions de test"""
+        with self._lock:
+            table = self._tables[name]
+            rows = []
+            for pk, partition in self._data[name].items():
+                for ck, row in partition.items():
+                    values = dict(zip(table.partition_key, pk))
+                    values.update(zip(table.clustering, ck))
+                    values.update(row.live_values(time.time()))
+                    rows.append(values)
+            return rows
+
+    def truncate(self, name=None):
+        with self._lock:
+            for table in ([name] if name else list(self._data)):
+                self._data[table] = {}
+
+    # ----- exécution -----
+
+    def _row_factory(self, execution_profile):
+        if isinstance(execution_profile, ExecutionProfile):
+            return execution_profile.row_factory
+        if execution_profile in self.execution_profiles:
+            return self.execution_profiles[execution_profile].row_factory
+        return self.row_factory
+
+    def _schedule(self, future):
+        delay = self.latency + (random.uniform(0, self.jitter) if self.jitter else 0.0)
+        if delay <= 0:
+            future._run()
+            return
+        if self._scheduler is None:
+            with self._lock:
+                if self._scheduler is None:
+                    self._scheduler = _LatencyScheduler()
+                    self._scheduler.start()
+        self._scheduler.submit(delay, future)
+
+    def _parse(self, query):
+        return _Parser(query, self._tables, self.keyspace).parse()
+
+    def _timestamp(self):
+        with self._lock:
+            now = time.time_ns() // 1000
+            self._last_timestamp = max(now, self._last_timestamp + 1)
+            return self._last_timestamp
+
+    def _resolve(self, query, parameters):
+        """Retourne [(Statement, valeurs python)] pour une requête du driver"""
+        if isinstance(query, BatchStatement):
+            resolved = []
+            for is_prepared, statement, values in query._statements_and_parameters:
+                if is_prepared:
+                    resolved.append((self._prepared[statement], self._decode(self._prepared[statement], values)))
+                else:
+                    resolved.append((self._parse(statement), []))
+            return resolved
+        if isinstance(query, BoundStatement):
+            parsed = self._prepared[query.prepared_statement.query_id]
+            return [(parsed, self._decode(parsed, query.values))]
+        parsed = self._parse(query.query_string)
+        values = list(parameters or [])
+        values = [_coerce_literal(meta.type, v) for meta, v in zip(parsed.markers, values)]
+        return [(parsed, values)]
+
+    def _decode(self, parsed, values):
+        decoded = []
+        for meta, value in zip(parsed.markers, values):
+            if value is None or not isinstance(value, (bytes, bytearray)):
+                decoded.append(value)
+            else:
+                decoded.append(meta.type.deserialize(bytes(value), PROTOCOL_VERSION))
+        return decoded
+
+    def _execute_now(self, query, parameters, paging_state, fetch_size):
+        """Exécute la requête ; retourne (colonnes, types, lignes, paging_state suivant)"""
+        statements = self._resolve(query, parameters)
+        with self._lock:
+            if isinstance(query, BatchStatement):
+                return self._execute_batch(statements)
+            parsed, values = statements[0]
+            if parsed.kind == 'select':
+                # Seules les lignes jusqu'à la fin de la page (+1 pour savoir s'il en reste) sont produites
+                offset = int(paging_state.decode('ascii')) if paging_state else 0
+                stop = offset + fetch_size + 1 if fetch_size and fetch_size > 0 else None
+                names, types, rows = self._select(parsed, values, stop)
+                return self._page(names, types, rows, paging_state, fetch_size)
+            if parsed.kind == 'ddl':
+                self._ddl(parsed.ddl)
+                return None, None, [], None
+            if parsed.is_lwt:
+                applied, names, types, row = self._check_conditions(parsed, values)
+                if applied:
+                    self._write(parsed, values, self._timestamp())
+                return names, types, [row], None
+            self._write(parsed, values, self._timestamp())
+            return None, None, [], None
+
+    def _execute_batch(self, statements):
+        lwt = [(p, v) for p, v in statements if p.is_lwt]
+        for parsed, values in lwt:
+            applied, names, types, row = self._check_conditions(parsed, values)
+            if not applied:
+                return names, types, [row], None
+        timestamp = self._timestamp()
+        for parsed, values in statements:
+            self._write(parsed, values, timestamp)
+        if lwt:
+            return ['[applied]'], [cqltypes.BooleanType], [[True]], None
+        return None, None, [], None
+
+    def _page(self, names, types, rows, paging_state, fetch_size):
+        offset = int(paging_state.decode('ascii')) if paging_state else 0
+        if not fetch_size or fetch_size <= 0:
+            return names, types, rows[offset:], None
+        end = offset + fetch_size
+        next_state = str(end).encode('ascii') if end < len(rows) else None
+        return names, types, rows[offset:end], next_state
+
+    # ----- DDL -----
+
+    def _ddl(self, text):
+        cleaned = strip_comments(text).strip()
+        upper = ' '.join(cleaned.split()).upper()
+        if upper.startswith('CREATE TABLE'):
+            table = parse_create_table(cleaned)
+            if table.name in self._tables and 'IF NOT EXISTS' not in upper:
+                raise InvalidRequest(f"Table {table.name} already exists")
+            if table.name not in self._tables:
+                self._tables[table.name] = table
+                self._data[table.name] = {}
+        elif upper.startswith('DROP TABLE'):
+            name = cleaned.split()[-1].split('.')[-1].lower()
+            self._tables.pop(name, None)
+            self._data.pop(name, None)
+        elif upper.startswith('TRUNCATE'):
+            name = cleaned.split()[-1].split('.')[-1].lower()
+            self._data[name] = {}
+        elif upper.startswith('DROP KEYSPACE'):
+            self._tables.clear()
+            self._data.clear()
+        elif upper.startswith('USE'):
+            self.keyspace = cleaned.split()[-1]
+        # CREATE KEYSPACE / ALTER / CREATE INDEX : sans effet en mémoire
+
+    # ----- lecture -----
+
+    def _operand_value(self, operand, values):
+        if isinstance(operand, Marker):
+            return values[operand.index]
+        if isinstance(operand, Literal):
+            return operand.value
+        return [self._operand_value(o, values) for o in operand]
+
+    def _bound_where(self, parsed, values):
+        return [(term, op, self._operand_value(operand, values)) for term, op, operand in parsed.where]
+
+    def _partition_keys(self, table, where):
+        """Clés de partition ciblées, ou None pour un parcours complet"""
+        restricted = {}
+        for term, op, value in where:
+            if term.column in table.partition_key:
+                restricted[term.column] = value if op == 'IN' else [value]
+                # Comme le cluster : une clé de partition nulle est une requête invalide
+                if value is None or None in restricted[term.column]:
+                    raise InvalidRequest(f"Invalid null value in condition for column {term.column}")
+        if not restricted:
+            return None
+        if len(restricted) != len(table.partition_key):
+            raise InvalidRequest("Partition key parts must be restricted")
+        keys = [()]
+        for column in table.partition_key:
+            keys = [k + (v,) for k in keys for v in restricted[column]]
+        return keys
+
+    def _matches(self, table, pk, ck, row_values, token, where):
+        for term, op, expected in where:
+            if term.is_token:
+                actual, ctype = token, cqltypes.LongType
+            elif term.column in table.partition_key:
+                continue
+            elif term.column in table.clustering:
+                actual, ctype = ck[table.clustering.index(term.column)], table.columns[term.column]
+            else:
+                actual, ctype = row_values.get(term.column), table.columns[term.column]
+            if not _compare(ctype, actual, op, expected):
+                return False
+        return True
+
+    def _ring(self, table, data):
+        cached = self._rings.get(table.name)
+        if cached is None or cached[0] is not data:
+            ring = sorted(((_token(table, pk), pk) for pk in data), key=lambda item: item[0])
+            cached = self._rings[table.name] = (data, ring, [token for token, _ in ring])
+        return cached[1], cached[2]
+
+    def _token_slice(self, table, data, where):
+        """Partitions de l'anneau restreintes par les bornes sur token(clé) (dichotomie)"""
+        ring, tokens = self._ring(table, data)
+        low, high = 0, len(ring)
+        for term, op, value in where:
+            if not term.is_token:
+                continue
+            if op == '>':
+                low = max(low, bisect.bisect_right(tokens, value))
+            elif op == '>=':
+                low = max(low, bisect.bisect_left(tokens, value))
+            elif op == '<':
+                high = min(high, bisect.bisect_left(tokens, value))
+            elif op == '<=':
+                high = min(high, bisect.bisect_right(tokens, value))
+        return ring[low:high] if low or high != len(ring) else ring
+
+    def _iter_rows(self, table, where, desc=False):
+        """Parcourt les lignes visibles dans l'ordre Cassandra (token, puis clustering)"""
+        now = time.time()
+        data = self._data[table.name]
+        keys = self._partition_keys(table, where)
+        if keys is None:
+            candidates = self._token_slice(table, data, where)
+        else:
+            candidates = [(_token(table, pk), pk) for pk in keys if pk in data]
+        for token, pk in candidates:
+            partition = data.get(pk)
+            if not partition:
+                continue
+            for ck in self._sorted_clustering(table, partition, desc):
+                row = partition[ck]
+                values = row.live_values(now)
+                if not row.marker and not any(v is not None for v in values.values()):
+                    continue
+                if self._matches(table, pk, ck, values, token, where):
+                    yield pk, ck, row, values, token
+
+    def _sorted_clustering(self, table, partition, desc):
+        keys = list(partition)
+        if not table.clustering:
+            return keys
+        for i in reversed(range(len(table.clustering))):
+            column = table.clustering[i]
+            reverse = (table.order[column] == 'DESC') != bool(desc)
+            ctype = table.columns[column]
+            keys.sort(key=lambda k: _sort_key(ctype, k[i]), reverse=reverse)
+        return keys
+
+    def _select(self, parsed, values, stop=None):
+        table = parsed.table
+        where = self._bound_where(parsed, values)
+        limit = self._operand_value(parsed.limit, values) if parsed.limit is not None else None
+        desc = False
+        if parsed.order_desc is not None and table.clustering:
+            # ORDER BY inverse le sens naturel de la première colonne de clustering
+            desc = parsed.order_desc != (table.order[table.clustering[0]] == 'DESC')
+
+        names, types, extractors = [], [], []
+        for expr, name in parsed.columns:
+            kind, column = expr
+            if kind == 'star':
+                for col in table.star_columns():
+                    names.append(col)
+                    types.append(table.columns[col])
+                    extractors.append(('column', col))
+            elif kind == 'count':
+                names.append(name)
+                types.append(cqltypes.LongType)
+                extractors.append(('count', None))
+            elif kind == 'token':
+                names.append(name)
+                types.append(cqltypes.LongType)
+                extractors.append(('token', None))
+            elif kind == 'writetime':
+                names.append(name)
+                types.append(cqltypes.LongType)
+                extractors.append(('writetime', column))
+            elif kind == 'ttl':
+                names.append(name)
+                types.append(cqltypes.Int32Type)
+                extractors.append(('ttl', column))
+            else:
+                names.append(name)
+                types.append(table.columns[column])
+                extractors.append(('column', column))
+
+        if any(kind == 'count' for kind, _ in extractors):
+            count = sum(1 for _ in self._iter_rows(table, where, desc))
+            if limit is not None:
+                count = min(count, limit)
+            return names, types, [[count]]
+
+        now = time.time()
+        rows = []
+        for pk, ck, row, live, token in self._iter_rows(table, where, desc):
+            full = dict(zip(table.partition_key, pk))
+            full.update(zip(table.clustering, ck))
+            full.update(live)
+            out = []
+            for kind, column in extractors:
+                if kind == 'column':
+                    out.append(full.get(column))
+                elif kind == 'token':
+                    out.append(token)
+                elif kind == 'writetime':
+                    out.append(row.writetime.get(column) if live.get(column) is not None else None)
+                else:
+                    expires = row.expires.get(column)
+                    out.append(int(expires - now) if expires and live.get(column) is not None else None)
+            rows.append(out)
+            if (limit is not None and len(rows) >= limit) or (stop is not None and len(rows) >= stop):
+                break
+        return names, types, rows
+
+    # ----- écriture -----
+
+    def _primary_key(self, table, columns_values):
+        try:
+            pk = tuple(columns_values[c] for c in table.partition_key)
+            ck = tuple(columns_values[c] for c in table.clustering)
+        except KeyError as e:
+            raise InvalidRequest(f"Some primary key parts are missing: {e.args[0]}")
+        if any(v is None for v in pk + ck):
+            raise InvalidRequest("Invalid null value for primary key column")
+        return pk, ck
+
+    def _key_from_where(self, table, where):
+        """Clé (pk, ck) d'une écriture ; ck peut être partiel pour un DELETE de plage"""
+        equal = {term.column: value for term, op, value in where if op == '='}
+        pk = tuple(equal.get(c) for c in table.partition_key)
+        if any(v is None for v in pk):
+            raise InvalidRequest("Some partition key parts are missing")
+        ck = []
+        for column in table.clustering:
+            if column not in equal:
+                break
+            ck.append(equal[column])
+        return pk, tuple(ck)
+
+    def _existing(self, table, pk, ck):
+        partition = self._data[table.name].get(pk)
+        if not partition or ck not in partition:
+            return None
+        row = partition[ck]
+        values = row.live_values(time.time())
+        if not row.marker and not any(v is not None for v in values.values()):
+            return None
+        return values
+
+    def _check_conditions(self, parsed, values):
+        """Évalue la condition d'une transaction légère"""
+        table = parsed.table
+        if parsed.kind == 'insert':
+            row_values = dict(zip(parsed.columns, (self._operand_value(v, values) for v in parsed.values)))
+            pk, ck = self._primary_key(table, row_values)
+        else:
+            pk, ck = self._key_from_where(table, self._bound_where(parsed, values))
+        existing = self._existing(table, pk, ck)
+
+        if parsed.if_not_exists:
+            if existing is None:
+                return True, ['[applied]'], [cqltypes.BooleanType], [True]
+            full = dict(zip(table.partition_key, pk))
+            full.update(zip(table.clustering, ck))
+            full.update(existing)
+            columns = table.star_columns()
+            return (False, ['[applied]'] + columns, [cqltypes.BooleanType] + [table.columns[c] for c in columns],
+                    [False] + [full.get(c) for c in columns])
+
+        if parsed.if_exists:
+            applied = existing is not None
+            return applied, ['[applied]'], [cqltypes.BooleanType], [applied]
+
+        applied = existing is not None
+        current = existing or {}
+        for column, op, operand in parsed.conditions:
+            if not _compare(table.columns[column], current.get(column), op, self._operand_value(operand, values)):
+                applied = False
+        if applied:
+            return True, ['[applied]'], [cqltypes.BooleanType], [True]
+        columns = [c for c, _, _ in parsed.conditions]
+        return (False, ['[applied]'] + columns, [cqltypes.BooleanType] + [table.columns[c] for c in columns],
+                [False] + [current.get(c) for c in columns])
+
+    def _write(self, parsed, values, timestamp):
+        table = parsed.table
+        ttl = self._operand_value(parsed.ttl, values) if parsed.ttl is not None else None
+        expires = time.time() + ttl if ttl else None
+        if parsed.timestamp is not None:
+            timestamp = self._operand_value(parsed.timestamp, values)
+        data = self._data[table.name]
+
+        if parsed.kind == 'insert':
+            if table.is_counter_table():
+                raise InvalidRequest("INSERT statements are not allowed on counter tables, use UPDATE instead")
+            row_values = dict(zip(parsed.columns, (self._operand_value(v, values) for v in parsed.values)))
+            pk, ck = self._primary_key(table, row_values)
+            if pk not in data:
+                self._rings.pop(table.name, None)
+            row = data.setdefault(pk, {}).setdefault(ck, _Row())
+            row.marker = True
+            for column, value in row_values.items():
+                if column not in table.partition_key and column not in table.clustering:
+                    self._set_cell(row, column, value, timestamp, expires)
+            return
+
+        where = self._bound_where(parsed, values)
+        pk, ck = self._key_from_where(table, where)
+
+        if parsed.kind == 'update':
+            if len(ck) != len(table.clustering):
+                raise InvalidRequest("Missing mandatory PRIMARY KEY part")
+            if pk not in data:
+                self._rings.pop(table.name, None)
+            row = data.setdefault(pk, {}).setdefault(ck, _Row())
+            for column, op, operand in parsed.assignments:
+                value = self._operand_value(operand, values)
+                if op in ('+', '-'):
+                    current = row.values.get(column) or 0
+                    value = current + value if op == '+' else current - value
+                self._set_cell(row, column, value, timestamp, expires)
+            return
+
+        # DELETE : colonnes, ligne, plage de clustering ou partition entière
+        partition = data.get(pk)
+        if not partition:
+            return
+        if parsed.columns:
+            row = partition.get(ck)
+            if row is not None:
+                for column in parsed.columns:
+                    self._set_cell(row, column, None, timestamp, None)
+            return
+        slice_conditions = [(t, op, v) for t, op, v in where if op != '=' and t.column in table.clustering]
+        for key in list(partition):
+            if key[:len(ck)] == ck and self._matches(table, pk, key, {}, None, slice_conditions):
+                del partition[key]
+        if not partition:
+            del data[pk]
+            self._rings.pop(table.name, None)
+
+    def _set_cell(self, row, column, value, timestamp, expires):
+        if value is UNSET_VALUE:
+            return
+        # Dernière écriture gagnante : une écriture plus ancienne (USING TIMESTAMP) est ignorée
+        if row.writetime.get(column, timestamp) > timestamp:
+            return
+        if value is None:
+            row.values.pop(column, None)
+            row.writetime.pop(column, None)
+            row.expires.pop(column, None)
+            return
+        row.values[column] = value
+        row.writetime[column] = timestamp
+        if expires:
+            row.expires[column] = expires
+        else:
+            row.expires.pop(column, None)
+
+def _compare(ctype, actual, op, expected):
+    if op == 'IN':
+        return actual in expected
+    if actual is None or expected is None:
+        return op == '=' and actual is expected
+    a, b = _sort_key(ctype, actual), _sort_key(ctype, expected)
+    if op == '=':
+        return a == b
+    if op == '!=':
+        return a != b
+    if op == '<':
+        return a < b
+    if op == '<=':
+        return a <= b
+    if op == '>':
+        return a > b
+    if op == '>=':
+        return a >= b
+    raise InvalidRequest(f"Opérateur non supporté : {op}")
+
+class MemoryConnection:
+    """Même interface que CassandraConnection, sans cluster"""
+
+    def __init__(self, keyspace='library_system', schema_path=DEFAULT_SCHEMA, latency=0.0, jitter=0.0):
+        self.keyspace = keyspace
+        self.schema_path = schema_path
+        self.latency = latency
+        self.jitter = jitter
+        self.session = None
+
+    def connect(self):
+        self.session = MemorySession(self.schema_path, self.keyspace, self.latency, self.jitter)
+        logger.success(f"✅ Session en mémoire active ({len(self.session._tables)} tables)")
+        return self.session
+
+    def close(self):
+        if self.session:
+            self.session.shutdown()
+            logger.info("🔌 Session en mémoire fermée")
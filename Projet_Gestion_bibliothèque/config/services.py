@@ -0,0 +1,105 @@
+import time
+import threading
+from loguru import logger
+from config import database
+from models.book import BookRepository
+from models.user import UserRepository
+from models.borrow import BorrowRepository
+from models.reservation import ReservationRepository
+from models.counters import CounterAggregator
+from models.flight import SingleFlight
+from models.instrumentation import QueryMetrics
+from models.statements import warm_up, statements_for
+
+class LibraryServices:
+    """Connexion et repositories créés à la première utilisation.
+
+    Importer la CLI (ou afficher --help) ne contacte pas le cluster : la
+    session est ouverte par le premier repository demandé, et chaque
+    requête n'est préparée que lorsqu'elle sert (models.statements).
+    warm_up() prépare d'avance toutes les requêtes, en parallèle.
+    """
+
+    def __init__(self, connection_factory=None, book_cache=None, user_cache=None):
+        # Résolu à l'appel : CassandraConnection par défaut
+        self.connection_factory = connection_factory
+        self.book_cache = book_cache
+        self.user_cache = user_cache
+        # Lectures identiques en vol regroupées (livres et membres, threads et asyncio)
+        self.flight = SingleFlight()
+        # Installé sur la session dès son ouverture : toutes les requêtes sont mesurées
+        self.query_metrics = QueryMetrics(flight=self.flight)
+        self.db = None
+        self.connect_seconds = None
+        self._session = None
+        self._components = {}
+        self._lock = threading.RLock()
+
+    @property
+    def connected(self):
+        return self._session is not None
+
+    @property
+    def session(self):
+        with self._lock:
+            if self._session is None:
+                start = time.perf_counter()
+                factory = self.connection_factory or database.CassandraConnection
+                self.db = factory()
+                self._session = self.db.connect()
+                self.connect_seconds = time.perf_counter() - start
+                self.query_metrics.install(self._session)
+            return self._session
+
+    def _component(self, name, build):
+        with self._lock:
+            component = self._components.get(name)
+            if component is None:
+                component = self._components[name] = build()
+                self.query_metrics.register(component)
+            return component
+
+    @property
+    def counters(self):
+        return self._component('counters', lambda: CounterAggregator(self.session))
+
+    @property
+    def book_repo(self):
+        return self._component('book_repo', lambda: BookRepository(
+            self.session, cache=self.book_cache, counters=self.counters, flight=self.flight))
+
+    @property
+    def user_repo(self):
+        return self._component('user_repo', lambda: UserRepository(
+            self.session, cache=self.user_cache, counters=self.counters, flight=self.flight))
+
+    @property
+    def reservation_repo(self):
+        return self._component('reservation_repo', lambda: ReservationRepository(self.session))
+
+    @property
+    def borrow_repo(self):
+        return self._component('borrow_repo', lambda: BorrowRepository(
+            self.session, book_cache=self.book_cache, counters=self.counters,
+            reservations=self.reservation_repo, flight=self.flight))
+
+    def warm_up(self):
+        """Crée tous les repositories et prépare leurs requêtes en une vague parallèle"""
+        start = time.perf_counter()
+        repos = [self.book_repo, self.user_repo, self.borrow_repo, self.reservation_repo, self.counters]
+        warm_up(*repos, self.borrow_repo.stock)
+        elapsed = time.perf_counter() - start
+        logger.info(f"🔧 {len(statements_for(self.session))} requêtes préparées en {elapsed * 1000:.0f} ms")
+        return elapsed
+
+    def close(self):
+        """Envoie les compteurs en attente, sauvegarde l'index de recherche puis ferme la session"""
+        with self._lock:
+            counters = self._components.get('counters')
+            if counters is not None:
+                counters.close()
+            book_repo = self._components.get('book_repo')
+            if book_repo is not None and book_repo.search_index is not None:
+                book_repo.search_index.flush()
+            if self.db is not None:
+                self.db.close()
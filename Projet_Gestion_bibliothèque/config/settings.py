@@ -0,0 +1,96 @@
+import os
+from cassandra import ConsistencyLevel
+from dotenv import load_dotenv
+from loguru import logger
+
+# Fichier .env à la racine du projet (surchargé par LIBRARY_ENV_FILE)
+DEFAULT_ENV_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.env')
+
+COMPRESSIONS = ('auto', 'lz4', 'snappy', 'none')
+CONSISTENCIES = tuple(ConsistencyLevel.name_to_value)
+
+def _split(value):
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+def _to_int(value):
+    return int(value) if value not in (None, '') else None
+
+class CassandraSettings:
+    """Paramètres de transport du driver (variables CASSANDRA_*).
+
+    Valeurs par défaut adaptées au cluster docker-compose : routage
+    token-aware dans le DC local (chaque requête part vers une réplique),
+    compression, reconnexion exponentielle et timeout de requête de 10 s.
+    """
+
+    def __init__(self, hosts=None, port=9042, keyspace='library_system', local_dc=None,
+                 username=None, password=None, protocol_version=None, compression='auto',
+                 request_timeout=10.0, connect_timeout=5.0, consistency='LOCAL_ONE',
+                 reconnect_base_delay=1.0, reconnect_max_delay=60.0, executor_threads=2):
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"Compression inconnue : {compression} ({', '.join(COMPRESSIONS)})")
+        if consistency not in CONSISTENCIES:
+            raise ValueError(f"Cohérence inconnue : {consistency} ({', '.join(CONSISTENCIES)})")
+        self.hosts = hosts or ['127.0.0.1']
+        self.port = port
+        self.keyspace = keyspace
+        self.local_dc = local_dc
+        self.username = username
+        self.password = password
+        self.protocol_version = protocol_version
+        self.compression = compression
+        self.request_timeout = request_timeout
+        self.connect_timeout = connect_timeout
+        self.consistency = consistency
+        self.reconnect_base_delay = reconnect_base_delay
+        self.reconnect_max_delay = reconnect_max_delay
+        self.executor_threads = executor_threads
+
+    @classmethod
+    def from_env(cls, env_file=None, environ=None):
+        """Construit les paramètres depuis l'environnement, complété par le fichier .env"""
+        if environ is None:
+            path = env_file or os.environ.get('LIBRARY_ENV_FILE', DEFAULT_ENV_FILE)
+            if os.path.exists(path):
+                # Les variables déjà définies dans l'environnement restent prioritaires
+                load_dotenv(path, override=False)
+            environ = os.environ
+
+        def get(name, default=None):
+            value = environ.get(f"CASSANDRA_{name}")
+            return default if value in (None, '') else value
+
+        defaults = cls()
+        return cls(
+            hosts=_split(get('HOSTS', '127.0.0.1')),
+            port=int(get('PORT', defaults.port)),
+            keyspace=get('KEYSPACE', defaults.keyspace),
+            local_dc=get('LOCAL_DC'),
+            username=get('USERNAME'),
+            password=get('PASSWORD'),
+            protocol_version=_to_int(get('PROTOCOL_VERSION')),
+            compression=get('COMPRESSION', defaults.compression).lower(),
+            request_timeout=float(get('REQUEST_TIMEOUT', defaults.request_timeout)),
+            connect_timeout=float(get('CONNECT_TIMEOUT', defaults.connect_timeout)),
+            consistency=get('CONSISTENCY', defaults.consistency).upper(),
+            reconnect_base_delay=float(get('RECONNECT_BASE_DELAY', defaults.reconnect_base_delay)),
+            reconnect_max_delay=float(get('RECONNECT_MAX_DELAY', defaults.reconnect_max_delay)),
+            executor_threads=int(get('EXECUTOR_THREADS', defaults.executor_threads)),
+        )
+
+    def driver_compression(self):
+        """Valeur du paramètre `compression` de Cluster"""
+        if self.compression == 'none':
+            return False
+        if self.compression == 'auto':
+            return True
+        try:
+            __import__('lz4' if self.compression == 'lz4' else 'snappy')
+        except ImportError:
+            logger.warning(f"⚠️  Compression {self.compression} indisponible (module manquant), choix automatique")
+            return True
+        return self.compression
+
+    def describe(self):
+        return (f"{', '.join(self.hosts)}:{self.port} (DC {self.local_dc or 'auto'}, "
+                f"protocole {self.protocol_version or 'auto'}, compression {self.compression})")
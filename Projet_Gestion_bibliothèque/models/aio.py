@@ -0,0 +1,406 @@
+import uuid
+import random
+import asyncio
+from datetime import datetime
+from loguru import logger
+from cassandra.cluster import ResultSet
+from cassandra.query import BatchStatement
+from models.cache import MISSING
+from models.user import user_from_row, normalize_email
+from models.counters import TOTAL_BOOKS, TOTAL_USERS
+from models.stock import StockContentionError
+from models.borrow import WRITE_BATCH, new_loan, month_bucket, _match_loan
+from models.statements import warm_up
+from models.flight import flight_key
+
+# ================== ADAPTATION DES FUTURES DU DRIVER ==================
+
+def _settle(waiter, rows, error):
+    if waiter.done():
+        return
+    if error is not None:
+        waiter.set_exception(error)
+    else:
+        waiter.set_result(rows)
+
+def _page(response_future):
+    """Awaitable de la page en cours d'un ResponseFuture.
+
+    Les callbacks du driver s'exécutent sur son thread réseau : le résultat
+    est remis à la boucle asyncio par call_soon_threadsafe, sans thread bloqué.
+    """
+    loop = asyncio.get_running_loop()
+    waiter = loop.create_future()
+
+    def deliver(rows=None, error=None):
+        try:
+            loop.call_soon_threadsafe(_settle, waiter, rows, error)
+        except RuntimeError:
+            # Boucle fermée entre l'envoi et la réponse : plus personne n'attend
+            pass
+
+    response_future.add_callbacks(deliver, lambda exc: deliver(error=exc))
+    return waiter
+
+async def execute(session, query, parameters=None, **kwargs):
+    """session.execute en version asyncio : ResultSet de la première page.
+
+    Ne pas itérer au-delà de cette page dans la boucle (fetch_next_page
+    est bloquant) : utiliser fetch_all pour lire toutes les pages.
+    """
+    response_future = session.execute_async(query, parameters, **kwargs)
+    rows = await _page(response_future)
+    return ResultSet(response_future, rows)
+
+async def fetch_all(session, query, parameters=None, **kwargs):
+    """Toutes les lignes d'une requête ; les pages suivantes sont demandées sans bloquer"""
+    response_future = session.execute_async(query, parameters, **kwargs)
+    rows = list(await _page(response_future))
+    while response_future.has_more_pages:
+        # Les callbacks de la page précédente seraient rappelés avec la suivante
+        response_future.clear_callbacks()
+        response_future.start_fetching_next_page()
+        rows.extend(await _page(response_future))
+    return rows
+
+async def _coalesce(repository, load, statement, params, store=None):
+    """Lecture partagée avec les appels identiques en vol (threads compris) si le repository a un SingleFlight"""
+    if repository.flight is None:
+        result = await load()
+        if store is not None:
+            store(result)
+        return result
+    return await repository.flight.run_async(flight_key(statement, params), load, store)
+
+async def _one(session, statement, params):
+    return (await execute(session, statement, params)).one()
+
+async def prepare(*repositories):
+    """Prépare d'avance les requêtes des repositories (la préparation à la demande bloquerait la boucle)"""
+    components = []
+    for repository in repositories:
+        inner = getattr(repository, 'repository', repository)
+        components.append(inner)
+        stock = getattr(inner, 'stock', None)
+        if stock is not None:
+            components.append(stock)
+    await asyncio.to_thread(warm_up, *components)
+
+# ================== STOCK ==================
+
+class AsyncStock:
+    """Compare-and-set du stock (models.stock.StockEngine) attendu sans bloquer.
+
+    Mêmes requêtes, mêmes compteurs de contention et même backoff « full
+    jitter », la pause étant un asyncio.sleep.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    async def current(self, isbn):
+        row = (await execute(self.engine.session, self.engine.prep_get_stock, [isbn])).one()
+        return row.available_copies if row else None
+
+    async def adjust(self, isbn, delta, expected=None):
+        engine = self.engine
+        engine._count(operations=1)
+        if expected is None:
+            expected = await self.current(isbn)
+
+        for attempt in range(engine.max_attempts):
+            if expected is None:
+                return None
+            new_stock = expected + delta
+            if new_stock < 0:
+                engine._count(out_of_stock=1)
+                return None
+
+            engine._count(attempts=1)
+            result = await execute(engine.session, engine.prep_cas_stock, (new_stock, isbn, expected))
+            if result.was_applied:
+                return new_stock
+
+            engine._count(conflicts=1)
+            expected = getattr(result.one(), 'available_copies', None)
+            if attempt + 1 < engine.max_attempts:
+                engine._count(retries=1)
+                await asyncio.sleep(random.uniform(0, min(engine.max_delay, engine.base_delay * (2 ** attempt))))
+
+        engine._count(exhausted=1)
+        logger.warning(f"⚠️  Contention sur l'ISBN {isbn} : {engine.max_attempts} tentatives sans succès")
+        raise StockContentionError(isbn)
+
+    async def reserve(self, isbn, quantity=1, expected=None):
+        return await self.adjust(isbn, -quantity, expected)
+
+    async def release(self, isbn, quantity=1, expected=None):
+        return await self.adjust(isbn, quantity, expected)
+
+# ================== REPOSITORIES ==================
+
+class AsyncBookRepository:
+    """Version asyncio de BookRepository (mêmes requêtes préparées, cache et compteurs)"""
+
+    def __init__(self, repository):
+        self.repository = repository
+        self.session = repository.session
+
+    async def get_book_by_isbn(self, isbn):
+        repo = self.repository
+        if repo.cache is not None:
+            cached = repo.cache.get(isbn)
+            if cached is not MISSING:
+                return cached
+        try:
+            return await _coalesce(repo, lambda: _one(self.session, repo.prep_get_by_isbn, [isbn]),
+                                   repo.prep_get_by_isbn, [isbn], store=repo._cache_row(isbn))
+        except Exception as e:
+            logger.error(f"❌ Erreur recherche ISBN {isbn}: {e}")
+            return None
+
+    async def get_books_by_category(self, category):
+        try:
+            repo = self.repository
+            rows = await _coalesce(repo, lambda: fetch_all(self.session, repo.prep_get_by_cat, [category]),
+                                   repo.prep_get_by_cat, [category])
+            return list(rows)
+        except Exception as e:
+            logger.error(f"❌ Erreur recherche catégorie {category}: {e}")
+            return []
+
+    async def get_books_by_author(self, author):
+        try:
+            repo = self.repository
+            rows = await _coalesce(repo, lambda: fetch_all(self.session, repo.prep_get_by_author, [author]),
+                                   repo.prep_get_by_author, [author])
+            return list(rows)
+        except Exception as e:
+            logger.error(f"❌ Erreur recherche auteur {author}: {e}")
+            return []
+
+    async def add_book(self, book):
+        repo = self.repository
+        try:
+            batch = BatchStatement()
+            batch.add(repo.prep_insert_by_id, (
+                book.isbn, book.title, book.author, book.category, book.publisher,
+                book.publication_year, book.total_copies, book.available_copies, book.description
+            ))
+            batch.add(repo.prep_insert_by_cat, (
+                book.category, book.isbn, book.title, book.author, book.available_copies
+            ))
+            batch.add(repo.prep_insert_by_author, (book.author, book.isbn, book.title))
+            await execute(self.session, batch)
+            repo.forget_book(book.isbn, book.category, book.author)
+            if repo.cache is not None:
+                repo.cache.invalidate(book.isbn)
+            repo._index_book(book)
+            if repo.counters is not None:
+                repo.counters.increment(TOTAL_BOOKS)
+            logger.success(f"✅ Livre ajouté : {book.title} ({book.isbn})")
+            return True
+        except Exception as e:
+            logger.error(f"❌ Erreur ajout livre {book.isbn}: {e}")
+            return False
+
+class AsyncUserRepository:
+    """Version asyncio de UserRepository"""
+
+    def __init__(self, repository):
+        self.repository = repository
+        self.session = repository.session
+
+    async def create_user(self, email, first_name, last_name):
+        repo = self.repository
+        user_id = uuid.uuid4()
+        key = normalize_email(email)
+        try:
+            claim = await execute(self.session, repo.prep_claim_email, (key, user_id))
+            if not claim.was_applied:
+                logger.error(f"❌ Email déjà utilisé : {email}")
+                return None
+            try:
+                await execute(self.session, repo.prep_insert_user, (
+                    user_id, email, first_name, last_name, datetime.now()
+                ))
+            except Exception:
+                await execute(self.session, repo.prep_release_email, (key, user_id))
+                raise
+            repo.forget_user(user_id, email)
+            if repo.cache is not None:
+                repo.cache.invalidate(user_id)
+            if repo.counters is not None:
+                repo.counters.increment(TOTAL_USERS)
+            logger.success(f"✅ Utilisateur créé : {first_name} {last_name} ({user_id})")
+            return user_id
+        except Exception as e:
+            logger.error(f"❌ Erreur création user: {e}")
+            return None
+
+    async def get_user(self, user_id):
+        repo = self.repository
+        try:
+            u_id = uuid.UUID(user_id) if isinstance(user_id, str) else user_id
+            if repo.cache is not None:
+                cached = repo.cache.get(u_id)
+                if cached is not MISSING:
+                    return cached
+
+            async def load():
+                row = await _one(self.session, repo.prep_get_user, [u_id])
+                return user_from_row(row) if row is not None else None
+            return await _coalesce(repo, load, repo.prep_get_user, [u_id], store=repo._cache_user(u_id))
+        except Exception as e:
+            logger.error(f"❌ Erreur récupération user {user_id}: {e}")
+            return None
+
+    async def get_user_by_email(self, email):
+        try:
+            repo, key = self.repository, normalize_email(email)
+            row = await _coalesce(repo, lambda: _one(self.session, repo.prep_get_by_email, [key]),
+                                  repo.prep_get_by_email, [key])
+            return await self.get_user(row.user_id) if row else None
+        except Exception as e:
+            logger.error(f"❌ Erreur recherche par email {email}: {e}")
+            return None
+
+class AsyncBorrowRepository:
+    """Version asyncio de BorrowRepository.
+
+    Même chemin que la version synchrone : CAS sur le stock, écritures
+    dénormalisées (batch, ou requêtes parallèles réunies par
+    asyncio.gather), exemplaire rendu si l'emprunt n'est pas enregistré.
+    Journal, cache des livres, compteurs et file des réservations sont
+    ceux du repository synchrone.
+    """
+
+    def __init__(self, repository):
+        self.repository = repository
+        self.session = repository.session
+        self.stock = AsyncStock(repository.stock)
+
+    async def _write_fanout(self, operation, writes):
+        repo = self.repository
+        if repo.write_mode == WRITE_BATCH:
+            batch = BatchStatement()
+            for name, params in writes:
+                batch.add(getattr(repo, name), params)
+            await execute(self.session, batch)
+            return
+
+        results = await asyncio.gather(*(execute(self.session, getattr(repo, name), params)
+                                         for name, params in writes), return_exceptions=True)
+        failed = []
+        for (name, params), result in zip(writes, results):
+            if not isinstance(result, Exception):
+                continue
+            try:
+                await execute(self.session, getattr(repo, name), params)
+            except Exception as e:
+                failed.append((name, params, e))
+        if len(failed) == len(writes):
+            raise failed[0][2]
+        for name, params, error in failed:
+            repo.journal.record(operation, name, params, error)
+
+    async def borrow_book(self, user_id, user_name, isbn, book_title):
+        repo = self.repository
+        try:
+            u_id = uuid.UUID(user_id) if isinstance(user_id, str) else user_id
+
+            new_stock = await self.stock.reserve(isbn, expected=repo._cached_stock(isbn))
+            if new_stock is None:
+                logger.error(f"❌ Stock insuffisant pour l'ISBN {isbn}")
+                return False
+
+            loan_id, now = new_loan(u_id)
+            try:
+                await self._write_fanout('borrow', [
+                    ('prep_insert_user', (u_id, now, isbn, book_title, loan_id)),
+                    ('prep_insert_book', (isbn, month_bucket(now), now, u_id, user_name)),
+                    ('prep_insert_active', (u_id, isbn, loan_id, now, book_title)),
+                ])
+            except Exception:
+                await self.stock.release(isbn)
+                raise
+            repo._refresh_cached_stock(isbn, new_stock)
+            repo._count_loans(borrowed=1)
+            logger.success(f"✅ Emprunt réussi pour : {book_title}")
+            return True
+
+        except Exception as e:
+            if repo.book_cache is not None:
+                repo.book_cache.invalidate(isbn)
+            logger.error(f"❌ Erreur borrow_book: {e}")
+            return False
+
+    async def borrow(self, user_id, isbn):
+        """Emprunt au guichet : membre et livre lus en parallèle, puis borrow_book"""
+        repo = self.repository
+        try:
+            u_id = uuid.UUID(user_id) if isinstance(user_id, str) else user_id
+            user, book = await asyncio.gather(execute(self.session, repo.prep_get_user, [u_id]),
+                                              execute(self.session, repo.prep_get_book, [isbn]))
+            user, book = user.one(), book.one()
+        except Exception as e:
+            logger.error(f"❌ Erreur borrow: {e}")
+            return False
+        if user is None or book is None:
+            logger.error(f"❌ {'Membre' if user is None else 'Livre'} inconnu ({u_id if user is None else isbn})")
+            return False
+        return await self.borrow_book(u_id, f"{user.first_name} {user.last_name}", isbn, book.title)
+
+    async def return_book(self, user_id, isbn, borrow_date=None):
+        repo = self.repository
+        try:
+            u_id = uuid.UUID(user_id) if isinstance(user_id, str) else user_id
+            if isinstance(borrow_date, str):
+                borrow_date = datetime.fromisoformat(borrow_date)
+
+            loans = await fetch_all(self.session, repo.prep_get_active_isbn, (u_id, isbn))
+            loan = _match_loan(loans, borrow_date)
+            if loan is None:
+                logger.error(f"❌ Aucun emprunt en cours de l'ISBN {isbn} pour {u_id}")
+                return False
+
+            closed = await execute(self.session, repo.prep_delete_active, (u_id, loan.isbn, loan.loan_id))
+            if not closed.was_applied:
+                logger.error(f"❌ Emprunt de l'ISBN {isbn} déjà rendu pour {u_id}")
+                return False
+            writes = repo._return_writes(u_id, loan)
+            try:
+                await self._write_fanout('return', writes)
+            except Exception as e:
+                repo._journal_writes('return', writes, e)
+            repo._count_loans(returned=1)
+            # Attribution aux réservataires : chemin synchrone (LWT de la file), hors de la boucle
+            allocated = None
+            if repo.reservations is not None:
+                allocated = await asyncio.to_thread(repo._allocate, isbn, loan.book_title)
+            if allocated is None:
+                new_stock = await self.stock.release(isbn, expected=repo._cached_stock(isbn))
+                repo._refresh_cached_stock(isbn, new_stock)
+            logger.success(f"✅ Retour réussi pour l'ISBN {isbn}")
+            return True
+        except Exception as e:
+            if repo.book_cache is not None:
+                repo.book_cache.invalidate(isbn)
+            logger.error(f"❌ Erreur return_book: {e}")
+            return False
+
+    async def get_active_loans(self, user_id):
+        try:
+            u_id = uuid.UUID(user_id) if isinstance(user_id, str) else user_id
+            return await fetch_all(self.session, self.repository.prep_get_active, [u_id])
+        except Exception as e:
+            logger.error(f"❌ Erreur lecture emprunts en cours pour {user_id}: {e}")
+            return []
+
+    async def get_user_borrows(self, user_id):
+        try:
+            u_id = uuid.UUID(user_id) if isinstance(user_id, str) else user_id
+            return await fetch_all(self.session, self.repository.prep_get_history, [u_id])
+        except Exception as e:
+            logger.error(f"❌ Erreur lecture historique pour {user_id}: {e}")
+            return []
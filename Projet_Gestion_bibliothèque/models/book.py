@@ -1,48 +1,215 @@
 import uuid
 from loguru import logger
+from cassandra.query import BatchStatement
+from models.paging import Page, fetch_page, DEFAULT_PAGE_SIZE
+from models.columnar import ColumnBatch, fetch_columns
+from models.cache import MISSING
+from models.counters import TOTAL_BOOKS
+from models.statements import LazyStatements
+from models.search import SearchIndex, snapshot_path, discard_snapshot
+from models.scan import TableScanner
+from models.flight import flight_key
 
-class BookRepository:
-    def __init__(self, session):
+# Lecture d'un livre par ISBN, partagée avec le stock et les emprunts (une seule préparation)
+SELECT_BOOK_BY_ISBN = "SELECT isbn, title, author, available_copies FROM books_by_id WHERE isbn = ?"
+
+class Book:
+    __slots__ = ('isbn', 'title', 'author', 'category', 'publisher', 'publication_year',
+                 'total_copies', 'available_copies', 'description')
+
+    def __init__(self, isbn, title, author, category, publisher=None, publication_year=None,
+                 total_copies=1, available_copies=None, description=None):
+        self.isbn = isbn
+        self.title = title
+        self.author = author
+        self.category = category
+        self.publisher = publisher
+        self.publication_year = publication_year
+        self.total_copies = total_copies
+        self.available_copies = total_copies if available_copies is None else available_copies
+        self.description = description
+
+class BookRepository(LazyStatements):
+    def __init__(self, session, cache=None, counters=None, search_index=None, flight=None):
         self.session = session
+        # Cache optionnel (models.cache.LRUCache) des livres par ISBN
+        self.cache = cache
+        # Regroupement des lectures identiques en vol (models.flight.SingleFlight)
+        self.flight = flight
+        # Compteurs de la table statistics (CounterAggregator, écriture différée)
+        self.counters = counters
+        # Index plein texte (models.search.SearchIndex), chargé à la première recherche
+        self.search_index = search_index
         self._prepare_queries()
 
     def _prepare_queries(self):
-        """Préparation des requêtes pour optimiser les performances de l'interface"""
+        """Déclaration des requêtes, préparées à leur première utilisation (models.statements)"""
         # Pour l'onglet "Catalogue Complet"
-        self.prep_get_all = self.session.prepare("""
+        self._declare(prep_get_all="""
             SELECT isbn, title, author, available_copies, category FROM books_by_id
         """)
         
         # Pour la recherche par ISBN (Nécessaire pour l'emprunt)
-        self.prep_get_by_isbn = self.session.prepare("""
-            SELECT isbn, title, author, available_copies FROM books_by_id WHERE isbn = ?
-        """)
+        self._declare(prep_get_by_isbn=SELECT_BOOK_BY_ISBN)
         
         # Pour le filtrage par catégorie
-        self.prep_get_by_cat = self.session.prepare("""
+        self._declare(prep_get_by_cat="""
             SELECT isbn, title, author, available_copies FROM books_by_category WHERE category = ?
         """)
 
-    def get_all_books(self):
-        """Récupère tous les livres pour l'affichage initial du Dashboard"""
+        # Pour la recherche par auteur
+        self._declare(prep_get_by_author="""
+            SELECT isbn, title FROM books_by_author WHERE author = ?
+        """)
+
+        # Insertions dénormalisées (1 livre = 3 tables)
+        self._declare(prep_insert_by_id="""
+            INSERT INTO books_by_id (isbn, title, author, category, publisher, publication_year,
+                                     total_copies, available_copies, description)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """)
+        self._declare(prep_insert_by_cat="""
+            INSERT INTO books_by_category (category, isbn, title, author, available_copies)
+            VALUES (?, ?, ?, ?, ?)
+        """)
+        self._declare(prep_insert_by_author="""
+            INSERT INTO books_by_author (author, isbn, title) VALUES (?, ?, ?)
+        """)
+
+    def _coalesce(self, load, statement, params, *extra, store=None):
+        """load() partagé par les appels concurrents identiques (si un SingleFlight est fourni)"""
+        if self.flight is None:
+            result = load()
+            if store is not None:
+                store(result)
+            return result
+        return self.flight.run(flight_key(statement, params, *extra), load, store)
+
+    def _cache_row(self, isbn):
+        """Mise en cache d'une lecture par ISBN (les ISBN inconnus ne sont pas mis en cache)"""
+        def store(row):
+            if row is not None and self.cache is not None:
+                self.cache.set(isbn, row)
+        return store
+
+    def forget_book(self, isbn, category=None, author=None):
+        """Après une écriture : les lectures en vol de ce livre ne sont plus partagées"""
+        if self.flight is None:
+            return
+        keys = [flight_key(self.prep_get_by_isbn, [isbn])]
+        if category:
+            keys += [flight_key(self.prep_get_by_cat, [category]),
+                     flight_key(self.prep_get_by_cat, [category], 'columnar')]
+        if author:
+            keys.append(flight_key(self.prep_get_by_author, [author]))
+        self.flight.forget(*keys)
+
+    def _index_book(self, book):
+        """L'index chargé suit l'ajout ; sans index en mémoire, l'instantané disque est périmé"""
+        if self.search_index is not None:
+            self.search_index.add(book.isbn, book.title, book.author)
+        else:
+            discard_snapshot()
+
+    def add_book(self, book):
+        """Ajoute un livre dans books_by_id, books_by_category et books_by_author (BATCH)"""
+        try:
+            batch = BatchStatement()
+            batch.add(self.prep_insert_by_id, (
+                book.isbn, book.title, book.author, book.category, book.publisher,
+                book.publication_year, book.total_copies, book.available_copies, book.description
+            ))
+            batch.add(self.prep_insert_by_cat, (
+                book.category, book.isbn, book.title, book.author, book.available_copies
+            ))
+            batch.add(self.prep_insert_by_author, (book.author, book.isbn, book.title))
+            self.session.execute(batch)
+            # Vols oubliés avant l'invalidation : une lecture antérieure ne remet pas l'ancienne ligne en cache
+            self.forget_book(book.isbn, book.category, book.author)
+            if self.cache is not None:
+                self.cache.invalidate(book.isbn)
+            self._index_book(book)
+            # NB : un INSERT est un upsert, réenregistrer un ISBN existant le recompte
+            if self.counters is not None:
+                self.counters.increment(TOTAL_BOOKS)
+            logger.success(f"✅ Livre ajouté : {book.title} ({book.isbn})")
+            return True
+        except Exception as e:
+            logger.error(f"❌ Erreur ajout livre {book.isbn}: {e}")
+            return False
+
+    def get_all_books(self, **options):
+        """Récupère tous les livres (générateur) par un parcours parallèle des plages de tokens.
+
+        Les options (splits, concurrency, page_size, rate, checkpoint) sont
+        celles de models.scan.TableScanner. Une erreur avant la première ligne
+        donne un catalogue vide ; après, elle est transmise à l'appelant.
+        """
+        yielded = False
         try:
-            return self.session.execute(self.prep_get_all)
+            for row in TableScanner(self.session, 'books_by_id', '*', 'isbn', **options).scan():
+                yielded = True
+                yield row
         except Exception as e:
             logger.error(f"❌ Erreur lecture catalogue: {e}")
-            return []
+            # Catalogue déjà entamé : l'appelant ne doit pas le croire complet
+            if yielded:
+                raise
+
+    def get_books_page(self, page_size=DEFAULT_PAGE_SIZE, cursor=None, columnar=False):
+        """Une page du catalogue ; passer le curseur retourné pour lire la suivante"""
+        try:
+            return fetch_page(self.session, self.prep_get_all, (), page_size, cursor, columnar)
+        except Exception as e:
+            logger.error(f"❌ Erreur lecture page catalogue: {e}")
+            return Page([], None)
 
     def get_book_by_isbn(self, isbn):
         """Récupère un livre spécifique pour obtenir son titre avant l'emprunt"""
+        if self.cache is not None:
+            cached = self.cache.get(isbn)
+            if cached is not MISSING:
+                return cached
         try:
-            return self.session.execute(self.prep_get_by_isbn, [isbn]).one()
+            # Les ISBN inconnus ne sont pas mis en cache (un ajout les rendrait invisibles)
+            return self._coalesce(lambda: self.session.execute(self.prep_get_by_isbn, [isbn]).one(),
+                                  self.prep_get_by_isbn, [isbn], store=self._cache_row(isbn))
         except Exception as e:
             logger.error(f"❌ Erreur recherche ISBN {isbn}: {e}")
             return None
 
-    def get_books_by_category(self, category):
-        """Recherche filtrée par catégorie"""
+    def get_books_by_category(self, category, columnar=False):
+        """Recherche filtrée par catégorie (columnar=True : ColumnBatch pour le dashboard)"""
         try:
-            return self.session.execute(self.prep_get_by_cat, [category])
+            if columnar:
+                return self._coalesce(lambda: fetch_columns(self.session, self.prep_get_by_cat, [category]),
+                                      self.prep_get_by_cat, [category], 'columnar')
+            if self.flight is None:
+                return self.session.execute(self.prep_get_by_cat, [category])
+            # Lignes partagées entre appelants : chacun reçoit sa propre liste
+            return list(self._coalesce(lambda: list(self.session.execute(self.prep_get_by_cat, [category])),
+                                       self.prep_get_by_cat, [category]))
         except Exception as e:
             logger.error(f"❌ Erreur recherche catégorie {category}: {e}")
-            return []
\ No newline at end of file
+            return ColumnBatch.empty() if columnar else []
+
+    def get_books_by_author(self, author):
+        """Livres d'un auteur (nom exact, books_by_author)"""
+        try:
+            if self.flight is None:
+                return self.session.execute(self.prep_get_by_author, [author])
+            return list(self._coalesce(lambda: list(self.session.execute(self.prep_get_by_author, [author])),
+                                       self.prep_get_by_author, [author]))
+        except Exception as e:
+            logger.error(f"❌ Erreur recherche auteur {author}: {e}")
+            return []
+
+    def search(self, query, limit=20):
+        """Recherche plein texte sur le titre et l'auteur (préfixes, sans accents)"""
+        try:
+            if self.search_index is None:
+                self.search_index = SearchIndex.open(self.session, snapshot_path())
+            return self.search_index.search(query, limit)
+        except Exception as e:
+            logger.error(f"❌ Erreur recherche « {query} »: {e}")
+            return []
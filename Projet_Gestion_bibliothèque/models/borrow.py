@@ -1,98 +1,608 @@
 import uuid
-from datetime import datetime
+import time
+import threading
+from collections import deque, namedtuple, Counter
+from datetime import datetime, timedelta
 from loguru import logger
 from cassandra.query import BatchStatement
+from cassandra.util import uuid_from_time
+from models.paging import Page, fetch_page, DEFAULT_PAGE_SIZE
+from models.cache import MISSING
+from models.stock import StockEngine
+from models.statements import LazyStatements
+from models.book import SELECT_BOOK_BY_ISBN
+from models.user import SELECT_USER_BY_ID
+from models.repair import FanoutJournal
+from models.counters import TOTAL_BORROWS, ACTIVE_LOANS, TOTAL_RETURNS
+from models.flight import flight_key
 
-class BorrowRepository:
-    def __init__(self, session):
+# Modes d'écriture des tables dénormalisées (borrows_by_user / borrows_by_book_monthly)
+WRITE_BATCH = 'batch'          # BatchStatement logué (atomique, batchlog sur le coordinateur)
+WRITE_PARALLEL = 'parallel'    # execute_async concurrents, idempotents, échecs journalisés
+
+def month_bucket(date):
+    """Bucket mensuel de borrows_by_book_monthly (ex : 202410)"""
+    return date.year * 100 + date.month
+
+def month_buckets(since, until):
+    """Buckets couvrant [since, until], du plus récent au plus ancien"""
+    year, month = until.year, until.month
+    buckets = []
+    while (year, month) >= (since.year, since.month):
+        buckets.append(year * 100 + month)
+        year, month = (year, month - 1) if month > 1 else (year - 1, 12)
+    return buckets
+
+_loan_clock_lock = threading.Lock()
+_loan_clock = {}
+
+def new_loan(user_id=None, borrow_date=None):
+    """Identifiant (timeuuid) et date d'un nouvel emprunt.
+
+    Sans date imposée, l'horloge est monotone par membre à la milliseconde
+    (précision des timestamp CQL) : deux emprunts d'un même membre créés
+    par ce processus n'ont jamais la même clé (user_id, borrow_date).
+    """
+    if borrow_date is not None:
+        return uuid_from_time(borrow_date), borrow_date
+    now_ms = int(time.time() * 1000)
+    with _loan_clock_lock:
+        if len(_loan_clock) > 10000:
+            # Les dates déjà dépassées ne peuvent plus entrer en collision
+            for key in [k for k, last in _loan_clock.items() if last < now_ms]:
+                del _loan_clock[key]
+        ms = max(now_ms, _loan_clock.get(user_id, 0) + 1)
+        _loan_clock[user_id] = ms
+    return uuid_from_time(ms / 1000.0), datetime.fromtimestamp(ms // 1000).replace(microsecond=ms % 1000 * 1000)
+
+def _match_loan(loans, borrow_date=None):
+    """Emprunt en cours correspondant à la date (à la seconde près), sinon le plus ancien"""
+    if borrow_date is None:
+        return loans[0] if loans else None
+    for loan in loans:
+        if loan.borrow_date == borrow_date:
+            return loan
+    if not borrow_date.microsecond:
+        for loan in loans:
+            if loan.borrow_date.replace(microsecond=0) == borrow_date:
+                return loan
+    return None
+
+# Rapport d'une opération groupée, une entrée par demande (dans l'ordre reçu)
+BulkResult = namedtuple('BulkResult', ['user_id', 'isbn', 'borrow_date', 'ok', 'error'])
+
+class BorrowRepository(LazyStatements):
+    def __init__(self, session, book_cache=None, write_mode=WRITE_BATCH, journal=None, pipeline_depth=128,
+                 counters=None, reservations=None, flight=None):
+        if write_mode not in (WRITE_BATCH, WRITE_PARALLEL):
+            raise ValueError(f"Mode d'écriture inconnu : {write_mode}")
         self.session = session
+        self.write_mode = write_mode
+        # Nombre maximal de requêtes en vol pour les opérations groupées
+        self.pipeline_depth = pipeline_depth
+        # Écritures partielles à rejouer (mode parallèle)
+        self.journal = journal if journal is not None else FanoutJournal()
+        # Cache des livres partagé avec BookRepository : le stock y est tenu à jour
+        self.book_cache = book_cache
+        # Compteurs de la table statistics (CounterAggregator, écriture différée)
+        self.counters = counters
+        # File des réservations (ReservationRepository) : un exemplaire rendu va au prochain réservataire
+        self.reservations = reservations
+        # SingleFlight partagé avec BookRepository : un changement de stock oublie les lectures en vol
+        self.flight = flight
+        # Stock modifié uniquement par compare-and-set (pas de lecture-modification-écriture)
+        self.stock = StockEngine(session)
         self._prepare_queries()
 
     def _prepare_queries(self):
-        """Préparation des requêtes CQL pour optimiser les performances"""
-        
-        # Lecture du stock actuel
-        self.prep_get_stock = self.session.prepare("""
-            SELECT available_copies FROM books_by_id WHERE isbn = ?
-        """)
+        """Déclaration des requêtes CQL, préparées à leur première utilisation"""
 
         # Insertion emprunt (Dénormalisation du titre)
-        self.prep_insert_user = self.session.prepare("""
-            INSERT INTO borrows_by_user (user_id, borrow_date, isbn, book_title, status) 
-            VALUES (?, ?, ?, ?, 'ACTIVE')
+        self._declare(prep_insert_user="""
+            INSERT INTO borrows_by_user (user_id, borrow_date, isbn, book_title, status, loan_id)
+            VALUES (?, ?, ?, ?, 'ACTIVE', ?)
         """)
-        
-        # Insertion emprunt (Dénormalisation du nom d'utilisateur)
-        self.prep_insert_book = self.session.prepare("""
-            INSERT INTO borrows_by_book (isbn, borrow_date, user_id, user_name) 
-            VALUES (?, ?, ?, ?)
+
+        # Index des emprunts en cours (ligne supprimée au retour, par une LWT :
+        # de deux retours concurrents du même emprunt, un seul est appliqué)
+        self._declare(prep_insert_active="""
+            INSERT INTO active_loans (user_id, isbn, loan_id, borrow_date, book_title)
+            VALUES (?, ?, ?, ?, ?)
+        """)
+        self._declare(prep_delete_active="""
+            DELETE FROM active_loans WHERE user_id = ? AND isbn = ? AND loan_id = ? IF EXISTS
+        """)
+        self._declare(prep_get_active="""
+            SELECT isbn, loan_id, borrow_date, book_title FROM active_loans WHERE user_id = ?
+        """)
+        self._declare(prep_get_active_isbn="""
+            SELECT isbn, loan_id, borrow_date, book_title FROM active_loans WHERE user_id = ? AND isbn = ?
         """)
         
-        # Mise à jour du stock 
-        self.prep_update_stock = self.session.prepare("""
-            UPDATE books_by_id SET available_copies = ? WHERE isbn = ?
+        # Insertion emprunt (Dénormalisation du nom d'utilisateur, partition par mois)
+        self._declare(prep_insert_book="""
+            INSERT INTO borrows_by_book_monthly (isbn, bucket, borrow_date, user_id, user_name)
+            VALUES (?, ?, ?, ?, ?)
         """)
 
         # Retour livre (Mise à jour du statut)
-        self.prep_return_user = self.session.prepare("""
+        self._declare(prep_return_user="""
             UPDATE borrows_by_user SET status = 'RETURNED' 
             WHERE user_id = ? AND borrow_date = ?
         """)
 
         # Lecture historique par utilisateur
-        self.prep_get_history = self.session.prepare("""
+        self._declare(prep_get_history="""
             SELECT * FROM borrows_by_user WHERE user_id = ?
         """)
 
+        # Lecture du suivi par livre (un bucket mensuel, plage de dates)
+        self._declare(prep_get_book_borrows="""
+            SELECT borrow_date, user_id, user_name FROM borrows_by_book_monthly
+            WHERE isbn = ? AND bucket = ? AND borrow_date >= ? AND borrow_date <= ? LIMIT ?
+        """)
+
+        # Préchargement des opérations groupées
+        self._declare(prep_get_book=SELECT_BOOK_BY_ISBN)
+        self._declare(prep_get_user=SELECT_USER_BY_ID)
+
+        # Clés déterministes (loan_id / borrow_date fixés avant l'envoi) : un rejeu réécrit la même ligne
+        self._idempotent('prep_insert_user', 'prep_insert_book', 'prep_return_user',
+                         'prep_insert_active')
+
+    def _refresh_cached_stock(self, isbn, new_stock):
+        """Reporte le nouveau stock dans le cache des livres (sans relecture)"""
+        # Même requête que BookRepository.get_book_by_isbn (registre partagé) : même clé de vol
+        if self.flight is not None:
+            self.flight.forget(flight_key(self.prep_get_book, [isbn]))
+        if self.book_cache is not None and new_stock is not None:
+            self.book_cache.update(isbn, lambda row: row._replace(available_copies=new_stock))
+
+    def _cached_stock(self, isbn):
+        """Stock connu du cache, utilisé comme valeur attendue du premier CAS"""
+        if self.book_cache is None:
+            return None
+        book = self.book_cache.get(isbn)
+        return None if book is MISSING else book.available_copies
+
+    def _pipeline(self, statements, results=None):
+        """Exécute [(requête, paramètres)] avec au plus `pipeline_depth` requêtes en vol.
+
+        Retourne, dans l'ordre, None (succès) ou l'exception de chaque requête.
+        Si `results` est une liste, le ResultSet de chaque requête réussie y est placé.
+        """
+        errors = [None] * len(statements)
+        in_flight = deque()
+
+        def wait_oldest():
+            index, future = in_flight.popleft()
+            try:
+                result = future.result()
+                if results is not None:
+                    results[index] = result
+            except Exception as e:
+                errors[index] = e
+
+        for index, (query, params) in enumerate(statements):
+            if len(in_flight) >= self.pipeline_depth:
+                wait_oldest()
+            in_flight.append((index, self.session.execute_async(query, params)))
+        while in_flight:
+            wait_oldest()
+        return errors
+
+    def _count_loans(self, borrowed=0, returned=0):
+        if self.counters is None:
+            return
+        if borrowed:
+            self.counters.increment(TOTAL_BORROWS, borrowed)
+        if returned:
+            self.counters.increment(TOTAL_RETURNS, returned)
+        if borrowed != returned:
+            self.counters.increment(ACTIVE_LOANS, borrowed - returned)
+
+    def _write_fanout_many(self, operation, loans):
+        """Écrit plusieurs opérations, chacune dans plusieurs tables, selon le mode choisi.
+
+        loans : [[(nom de la requête préparée, paramètres)]]. En mode parallèle,
+        une écriture qui échoue deux fois est journalisée pour réparation.
+        Retourne, par opération, None ou l'erreur si aucune table n'a été écrite.
+        """
+        if self.write_mode == WRITE_BATCH:
+            batches = []
+            for writes in loans:
+                batch = BatchStatement()
+                for name, params in writes:
+                    batch.add(getattr(self, name), params)
+                batches.append((batch, None))
+            return self._pipeline(batches)
+
+        flat = [(index, name, params) for index, writes in enumerate(loans) for name, params in writes]
+        errors = self._pipeline([(getattr(self, name), params) for _, name, params in flat])
+        failures = {}
+        for (index, name, params), error in zip(flat, errors):
+            if error is None:
+                continue
+            try:
+                self.session.execute(getattr(self, name), params)
+            except Exception as e:
+                failures.setdefault(index, []).append((name, params, e))
+
+        results = [None] * len(loans)
+        for index, failed in failures.items():
+            if len(failed) == len(loans[index]):
+                results[index] = failed[0][2]
+                continue
+            for name, params, error in failed:
+                self.journal.record(operation, name, params, error)
+        return results
+
+    def _write_fanout(self, operation, writes):
+        """Version unitaire de _write_fanout_many : lève l'erreur si rien n'est écrit"""
+        error = self._write_fanout_many(operation, [writes])[0]
+        if error is not None:
+            raise error
+
+    def repair_pending(self):
+        """Rejoue les écritures dénormalisées restées incomplètes"""
+        return self.journal.replay(lambda name, params: self.session.execute(getattr(self, name), params))
+
     def borrow_book(self, user_id, user_name, isbn, book_title):
-        """Exécute l'emprunt en Batch pour garantir l'atomicité sur 3 tables."""
+        """Réserve un exemplaire (CAS sur le stock) puis écrit l'emprunt (batch ou parallèle)."""
         try:
             u_id = uuid.UUID(user_id) if isinstance(user_id, str) else user_id
-            
-            row = self.session.execute(self.prep_get_stock, [isbn]).one()
-            if not row or row.available_copies <= 0:
+
+            new_stock = self.stock.reserve(isbn, expected=self._cached_stock(isbn))
+            if new_stock is None:
                 logger.error(f"❌ Stock insuffisant pour l'ISBN {isbn}")
                 return False
 
-            new_stock = row.available_copies - 1
-            now = datetime.now()
-
-            batch = BatchStatement()
-            batch.add(self.prep_insert_user, (u_id, now, isbn, book_title))
-            batch.add(self.prep_insert_book, (isbn, now, u_id, user_name))
-            batch.add(self.prep_update_stock, (new_stock, isbn))
-            
-            self.session.execute(batch)
+            loan_id, now = new_loan(u_id)
+            try:
+                self._write_fanout('borrow', [
+                    ('prep_insert_user', (u_id, now, isbn, book_title, loan_id)),
+                    ('prep_insert_book', (isbn, month_bucket(now), now, u_id, user_name)),
+                    ('prep_insert_active', (u_id, isbn, loan_id, now, book_title)),
+                ])
+            except Exception:
+                # L'emprunt n'a pas été enregistré : on rend l'exemplaire réservé
+                self.stock.release(isbn)
+                raise
+            self._refresh_cached_stock(isbn, new_stock)
+            self._count_loans(borrowed=1)
             logger.success(f"✅ Emprunt réussi pour : {book_title}")
             return True
 
         except Exception as e:
+            if self.book_cache is not None:
+                self.book_cache.invalidate(isbn)
             logger.error(f"❌ Erreur borrow_book: {e}")
             return False
 
-    def return_book(self, user_id, isbn, borrow_date):
-        """Gère le retour et incrémente le stock"""
+    def _close_loan(self, user_id, loan):
+        """Supprime l'emprunt de active_loans ; False s'il a déjà été rendu"""
+        return self.session.execute(self.prep_delete_active, (user_id, loan.isbn, loan.loan_id)).was_applied
+
+    def _return_writes(self, user_id, loan):
+        return [('prep_return_user', (user_id, loan.borrow_date))]
+
+    def _journal_writes(self, operation, writes, error):
+        """Emprunt déjà clos : une écriture d'historique en échec est rejouée plus tard"""
+        for name, params in writes:
+            self.journal.record(operation, name, params, error)
+
+    def _allocate(self, isbn, book_title):
+        """Prête l'exemplaire rendu au premier réservataire ; retourne sa réservation ou None.
+
+        Appelé dans le chemin du retour : pas de tâche de fond qui
+        parcourrait les titres à la recherche de réservations en attente.
+        """
+        if self.reservations is None:
+            return None
+        try:
+            holder = self.reservations.pop(isbn)
+        except Exception as e:
+            logger.error(f"❌ Lecture de la file de l'ISBN {isbn} impossible : {e}")
+            return None
+        if holder is None:
+            return None
+        loan_id, now = new_loan(holder.user_id)
+        try:
+            self._write_fanout('borrow', [
+                ('prep_insert_user', (holder.user_id, now, isbn, book_title, loan_id)),
+                ('prep_insert_book', (isbn, month_bucket(now), now, holder.user_id, holder.user_name)),
+                ('prep_insert_active', (holder.user_id, isbn, loan_id, now, book_title)),
+            ])
+        except Exception as e:
+            # Prêt non enregistré : le membre retrouve sa place, l'exemplaire retourne en stock
+            logger.error(f"❌ Attribution de l'ISBN {isbn} à {holder.user_id} impossible : {e}")
+            self.reservations.restore(isbn, holder)
+            return None
+        self._count_loans(borrowed=1)
+        logger.success(f"📦 Exemplaire {isbn} attribué à {holder.user_name} (réservation)")
+        return holder
+
+    def get_active_loans(self, user_id):
+        """Emprunts en cours d'un membre (sans parcourir son historique)"""
+        try:
+            u_id = uuid.UUID(user_id) if isinstance(user_id, str) else user_id
+            return list(self.session.execute(self.prep_get_active, [u_id]))
+        except Exception as e:
+            logger.error(f"❌ Erreur lecture emprunts en cours pour {user_id}: {e}")
+            return []
+
+    def return_book(self, user_id, isbn, borrow_date=None):
+        """Gère le retour : l'exemplaire va au prochain réservataire, sinon en stock.
+
+        L'emprunt est retrouvé dans active_loans par (user_id, isbn) ;
+        borrow_date ne sert qu'à choisir parmi plusieurs exemplaires du
+        même titre (par défaut, le plus ancien).
+        """
         try:
             u_id = uuid.UUID(user_id) if isinstance(user_id, str) else user_id
             if isinstance(borrow_date, str):
-                b_date = datetime.strptime(borrow_date, '%Y-%m-%d %H:%M:%S')
-            else:
-                b_date = borrow_date
-
-            row = self.session.execute(self.prep_get_stock, [isbn]).one()
-            new_stock = (row.available_copies if row else 0) + 1
-
-            batch = BatchStatement()
-            batch.add(self.prep_return_user, (u_id, b_date))
-            batch.add(self.prep_update_stock, (new_stock, isbn))
-            
-            self.session.execute(batch)
+                borrow_date = datetime.fromisoformat(borrow_date)
+
+            loans = list(self.session.execute(self.prep_get_active_isbn, (u_id, isbn)))
+            loan = _match_loan(loans, borrow_date)
+            if loan is None:
+                logger.error(f"❌ Aucun emprunt en cours de l'ISBN {isbn} pour {u_id}")
+                return False
+
+            # Emprunt clos (IF EXISTS) avant de rendre l'exemplaire : de deux
+            # retours concurrents, seul celui qui a supprimé la ligne rend le stock
+            if not self._close_loan(u_id, loan):
+                logger.error(f"❌ Emprunt de l'ISBN {isbn} déjà rendu pour {u_id}")
+                return False
+            writes = self._return_writes(u_id, loan)
+            try:
+                self._write_fanout('return', writes)
+            except Exception as e:
+                self._journal_writes('return', writes, e)
+            self._count_loans(returned=1)
+            if self._allocate(isbn, loan.book_title) is None:
+                new_stock = self.stock.release(isbn, expected=self._cached_stock(isbn))
+                self._refresh_cached_stock(isbn, new_stock)
             logger.success(f"✅ Retour réussi pour l'ISBN {isbn}")
             return True
         except Exception as e:
+            if self.book_cache is not None:
+                self.book_cache.invalidate(isbn)
             logger.error(f"❌ Erreur return_book: {e}")
             return False
 
+    def return_by_isbn(self, user_id, isbn):
+        """Retour au guichet : le membre et le livre suffisent (une lecture ponctuelle)"""
+        return self.return_book(user_id, isbn)
+
+    def _prefetch(self, prepared, keys):
+        """Lit en parallèle une ligne par clé ; {clé: ligne ou None}"""
+        futures = [(key, self.session.execute_async(prepared, [key])) for key in keys]
+        return {key: future.result().one() for key, future in futures}
+
+    def borrow_many(self, requests):
+        """Enregistre un lot d'emprunts (bornes libre-service, saisies hors ligne).
+
+        requests : [(user_id, isbn)] ou [(user_id, isbn, borrow_date)].
+        Livres et membres sont préchargés en parallèle, le stock est réservé
+        par un CAS par ISBN et les écritures sont pipelinées : quelques
+        allers-retours pour tout le lot. Retourne une liste de BulkResult.
+        """
+        results = [None] * len(requests)
+        items = []
+        for index, request in enumerate(requests):
+            user_id, isbn, borrow_date = (tuple(request) + (None,))[:3]
+            try:
+                u_id = uuid.UUID(user_id) if isinstance(user_id, str) else user_id
+                if isinstance(borrow_date, str):
+                    borrow_date = datetime.fromisoformat(borrow_date)
+            except ValueError as e:
+                results[index] = BulkResult(user_id, isbn, borrow_date, False, f"Entrée invalide : {e}")
+                continue
+            if not u_id or not isbn:
+                # Clé de partition nulle : rejetée par le cluster, elle ferait échouer tout le lot
+                missing = 'user_id' if not u_id else 'isbn'
+                results[index] = BulkResult(user_id, isbn, borrow_date, False, f"Entrée invalide : {missing} manquant")
+                continue
+            items.append((index, u_id, isbn, borrow_date))
+
+        try:
+            books = self._prefetch(self.prep_get_book, {isbn for _, _, isbn, _ in items})
+            users = self._prefetch(self.prep_get_user, {u_id for _, u_id, _, _ in items})
+
+            wanted = []
+            for index, u_id, isbn, borrow_date in items:
+                if books[isbn] is None:
+                    results[index] = BulkResult(u_id, isbn, borrow_date, False, "Livre inconnu")
+                elif users[u_id] is None:
+                    results[index] = BulkResult(u_id, isbn, borrow_date, False, "Membre inconnu")
+                else:
+                    wanted.append((index, u_id, isbn, borrow_date))
+
+            # Un seul CAS par titre ; s'il ne reste pas assez d'exemplaires,
+            # les premières demandes du lot sont servies
+            reserved = self.stock.adjust_many(
+                {isbn: -count for isbn, count in Counter(isbn for _, _, isbn, _ in wanted).items()},
+                expected={isbn: books[isbn].available_copies for _, _, isbn, _ in wanted},
+                partial=True)
+            remaining = {isbn: -granted for isbn, (granted, _) in reserved.items()}
+
+            loans, granted = [], []
+            last_date = {}
+            for index, u_id, isbn, borrow_date in wanted:
+                if remaining[isbn] == 0:
+                    results[index] = BulkResult(u_id, isbn, borrow_date, False, "Stock insuffisant")
+                    continue
+                remaining[isbn] -= 1
+                # Clé (user_id, borrow_date) à la milliseconde : deux emprunts
+                # du même membre dans le lot ne doivent pas s'écraser
+                loan_id, date = new_loan(u_id, borrow_date)
+                date = date.replace(microsecond=date.microsecond // 1000 * 1000)
+                if u_id in last_date and date <= last_date[u_id]:
+                    date = last_date[u_id] + timedelta(milliseconds=1)
+                last_date[u_id] = date
+
+                user = users[u_id]
+                title = books[isbn].title
+                loans.append([
+                    ('prep_insert_user', (u_id, date, isbn, title, loan_id)),
+                    ('prep_insert_book', (isbn, month_bucket(date), date, u_id,
+                                          f"{user.first_name} {user.last_name}")),
+                    ('prep_insert_active', (u_id, isbn, loan_id, date, title)),
+                ])
+                granted.append((index, u_id, isbn, date))
+
+            errors = self._write_fanout_many('borrow', loans)
+            released = Counter()
+            for (index, u_id, isbn, date), error in zip(granted, errors):
+                if error is not None:
+                    released[isbn] += 1
+                    results[index] = BulkResult(u_id, isbn, date, False, str(error))
+                else:
+                    results[index] = BulkResult(u_id, isbn, date, True, None)
+
+            # Exemplaires réservés mais non enregistrés : on les rend en un seul CAS par titre
+            final = {isbn: stock for isbn, (_, stock) in reserved.items()}
+            if released:
+                for isbn, (_, stock) in self.stock.adjust_many(dict(released)).items():
+                    final[isbn] = stock
+            for isbn, stock in final.items():
+                self._refresh_cached_stock(isbn, stock)
+
+        except Exception as e:
+            if self.book_cache is not None:
+                for _, _, isbn, _ in items:
+                    self.book_cache.invalidate(isbn)
+            logger.error(f"❌ Erreur borrow_many: {e}")
+            for index, u_id, isbn, borrow_date in items:
+                if results[index] is None:
+                    results[index] = BulkResult(u_id, isbn, borrow_date, False, str(e))
+
+        ok = sum(1 for r in results if r.ok)
+        self._count_loans(borrowed=ok)
+        logger.info(f"📦 Emprunts groupés : {ok}/{len(results)} réussis")
+        return results
+
+    def return_many(self, requests):
+        """Enregistre un lot de retours [(user_id, isbn)] ou [(user_id, isbn, borrow_date)].
+
+        Les emprunts en cours des membres concernés sont lus en parallèle :
+        un retour sans emprunt actif correspondant est refusé, ce qui rend
+        la réimportation d'un fichier sans effet sur le stock. Écritures
+        pipelinées, attribution aux réservataires, puis un CAS par ISBN
+        pour les exemplaires restants.
+        """
+        results = [None] * len(requests)
+        items = []
+        for index, request in enumerate(requests):
+            user_id, isbn, borrow_date = (tuple(request) + (None,))[:3]
+            try:
+                u_id = uuid.UUID(user_id) if isinstance(user_id, str) else user_id
+                if isinstance(borrow_date, str):
+                    borrow_date = datetime.fromisoformat(borrow_date)
+            except ValueError as e:
+                results[index] = BulkResult(user_id, isbn, borrow_date, False, f"Entrée invalide : {e}")
+                continue
+            if not u_id or not isbn:
+                # Clé de partition nulle : rejetée par le cluster, elle ferait échouer tout le lot
+                missing = 'user_id' if not u_id else 'isbn'
+                results[index] = BulkResult(user_id, isbn, borrow_date, False, f"Entrée invalide : {missing} manquant")
+                continue
+            items.append((index, u_id, isbn, borrow_date))
+
+        try:
+            futures = [(u_id, self.session.execute_async(self.prep_get_active, [u_id]))
+                       for u_id in {u_id for _, u_id, _, _ in items}]
+            open_loans = {}
+            for u_id, future in futures:
+                for loan in future.result():
+                    open_loans.setdefault((u_id, loan.isbn), []).append(loan)
+
+            matched = []
+            for index, u_id, isbn, date in items:
+                candidates = open_loans.get((u_id, isbn), [])
+                loan = _match_loan(candidates, date)
+                if loan is None:
+                    results[index] = BulkResult(u_id, isbn, date, False, "Aucun emprunt en cours")
+                    continue
+                # Un même emprunt ne peut être rendu deux fois dans le lot
+                candidates.remove(loan)
+                matched.append((index, u_id, isbn, loan))
+
+            # Clôtures conditionnelles pipelinées : un emprunt rendu en même
+            # temps par un autre retour n'est compté qu'une fois
+            closed = [None] * len(matched)
+            errors = self._pipeline([(self.prep_delete_active, (u_id, loan.isbn, loan.loan_id))
+                                     for _, u_id, _, loan in matched], closed)
+            returned = Counter()
+            titles = {}
+            applied = []
+            for (index, u_id, isbn, loan), error, result in zip(matched, errors, closed):
+                if error is not None:
+                    results[index] = BulkResult(u_id, isbn, loan.borrow_date, False, str(error))
+                elif not result.was_applied:
+                    results[index] = BulkResult(u_id, isbn, loan.borrow_date, False, "Emprunt déjà rendu")
+                else:
+                    returned[isbn] += 1
+                    titles[isbn] = loan.book_title
+                    results[index] = BulkResult(u_id, isbn, loan.borrow_date, True, None)
+                    applied.append((u_id, loan))
+
+            writes = [self._return_writes(u_id, loan) for u_id, loan in applied]
+            for loan_writes, error in zip(writes, self._write_fanout_many('return', writes)):
+                if error is not None:
+                    self._journal_writes('return', loan_writes, error)
+
+            for isbn in list(returned):
+                while returned[isbn] and self._allocate(isbn, titles[isbn]) is not None:
+                    returned[isbn] -= 1
+            returned = +returned
+
+            hints = {isbn: self._cached_stock(isbn) for isbn in returned}
+            for isbn, (_, stock) in self.stock.adjust_many(dict(returned), expected=hints).items():
+                self._refresh_cached_stock(isbn, stock)
+
+        except Exception as e:
+            if self.book_cache is not None:
+                for _, _, isbn, _ in items:
+                    self.book_cache.invalidate(isbn)
+            logger.error(f"❌ Erreur return_many: {e}")
+            for index, u_id, isbn, borrow_date in items:
+                if results[index] is None:
+                    results[index] = BulkResult(u_id, isbn, borrow_date, False, str(e))
+
+        ok = sum(1 for r in results if r.ok)
+        self._count_loans(returned=ok)
+        logger.info(f"📦 Retours groupés : {ok}/{len(results)} réussis")
+        return results
+
+    def get_book_borrows(self, isbn, since=None, until=None, limit=50, concurrency=6):
+        """Emprunteurs d'un livre entre since et until, du plus récent au plus ancien.
+
+        Les buckets mensuels sont lus par vagues de `concurrency` requêtes
+        parallèles, en partant du plus récent ; la lecture s'arrête dès que
+        `limit` lignes sont réunies. Par défaut : les 12 derniers mois.
+        """
+        try:
+            until = until or datetime.now()
+            since = since or until - timedelta(days=365)
+            buckets = month_buckets(since, until)
+            rows = []
+            for start in range(0, len(buckets), concurrency):
+                wave = buckets[start:start + concurrency]
+                futures = [self.session.execute_async(self.prep_get_book_borrows,
+                                                      (isbn, bucket, since, until, limit - len(rows)))
+                           for bucket in wave]
+                # Buckets disjoints et triés : la concaténation reste ordonnée
+                for future in futures:
+                    rows.extend(future.result())
+                if len(rows) >= limit:
+                    break
+            return rows[:limit]
+        except Exception as e:
+            logger.error(f"❌ Erreur lecture suivi du livre {isbn}: {e}")
+            return []
+
     # ✅ CORRECTION : Ajout du nom attendu par Streamlit
     def get_user_borrows(self, user_id):
         """
@@ -106,6 +616,15 @@ class BorrowRepository:
             logger.error(f"❌ Erreur lecture historique pour {user_id}: {e}")
             return []
 
+    def get_user_borrows_page(self, user_id, page_size=DEFAULT_PAGE_SIZE, cursor=None, columnar=False):
+        """Une page de l'historique (du plus récent au plus ancien)"""
+        try:
+            u_id = uuid.UUID(user_id) if isinstance(user_id, str) else user_id
+            return fetch_page(self.session, self.prep_get_history, [u_id], page_size, cursor, columnar)
+        except Exception as e:
+            logger.error(f"❌ Erreur lecture page historique pour {user_id}: {e}")
+            return Page([], None)
+
     # Gardé par compatibilité si d'autres parties du code l'utilisent
     def get_all_borrows(self, user_id):
         return self.get_user_borrows(user_id)
\ No newline at end of file
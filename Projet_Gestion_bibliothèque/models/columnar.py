@@ -0,0 +1,115 @@
+import uuid
+import weakref
+import threading
+from datetime import datetime
+from cassandra.cluster import EXEC_PROFILE_DEFAULT
+
+class ColumnBatch:
+    """Résultat en colonnes : {nom de colonne: liste de valeurs}.
+
+    Construit par columnar_factory (une transposition zip(*rows) par page,
+    sans objet Python par ligne) ; to_frame() remet les colonnes à pandas
+    sans réinférence ligne à ligne, UUID et horodatages étant convertis
+    colonne par colonne.
+    """
+
+    __slots__ = ('names', 'columns', 'length')
+
+    def __init__(self, names, columns, length):
+        self.names = list(names)
+        self.columns = columns
+        self.length = length
+
+    @classmethod
+    def empty(cls, names=()):
+        return cls(names, {name: [] for name in names}, 0)
+
+    def __len__(self):
+        return self.length
+
+    def __bool__(self):
+        return self.length > 0
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def __iter__(self):
+        return zip(*(self.columns[name] for name in self.names))
+
+    def extend(self, other):
+        """Ajoute les lignes d'une autre page (mêmes colonnes)"""
+        # ResultSet.current_rows remplace une page vide par []
+        if not other:
+            return self
+        if not self.names:
+            self.names = list(other.names)
+            self.columns = {name: [] for name in other.names}
+        for name in self.names:
+            self.columns[name].extend(other.columns[name])
+        self.length += other.length
+        return self
+
+    def to_frame(self):
+        """DataFrame pandas construit colonne par colonne"""
+        import pandas as pd
+        return pd.DataFrame({name: _convert(self.columns[name]) for name in self.names},
+                            columns=self.names)
+
+# Positions des chiffres hexadécimaux dans la forme texte d'un UUID (8-4-4-4-12)
+_HEX_POSITIONS = [i for i in range(36) if i not in (8, 13, 18, 23)]
+
+def uuid_strings(values):
+    """UUID -> texte pour toute une colonne : 16 octets par valeur, formatés par numpy"""
+    import numpy as np
+    missing = [i for i, v in enumerate(values) if v is None]
+    raw = b''.join(_NIL_BYTES if v is None else v.bytes for v in values)
+    digits = np.frombuffer(raw, np.uint8).reshape(-1, 16)
+    text = np.full((len(values), 36), ord('-'), np.uint8)
+    hexa = np.frombuffer(b'0123456789abcdef', np.uint8)
+    text[:, _HEX_POSITIONS[0::2]] = hexa[digits >> 4]
+    text[:, _HEX_POSITIONS[1::2]] = hexa[digits & 15]
+    strings = text.view('S36').ravel().astype(str)
+    if missing:
+        strings = strings.astype(object)
+        strings[missing] = None
+    return strings
+
+_NIL_BYTES = bytes(16)
+
+def _convert(values):
+    sample = next((v for v in values if v is not None), None)
+    if isinstance(sample, uuid.UUID):
+        # Affichés en texte : évite une colonne object d'UUID, convertie cellule par cellule au rendu
+        return uuid_strings(values)
+    if isinstance(sample, datetime):
+        import pandas as pd
+        return pd.DatetimeIndex(values)
+    return values
+
+def columnar_factory(colnames, rows):
+    """row_factory du driver : la page entière est transposée en colonnes"""
+    if not rows:
+        return ColumnBatch.empty(colnames)
+    return ColumnBatch(colnames, dict(zip(colnames, map(list, zip(*rows)))), len(rows))
+
+_profiles = weakref.WeakKeyDictionary()
+_profiles_lock = threading.Lock()
+
+def columnar_profile(session):
+    """Profil d'exécution de la session, avec columnar_factory pour row_factory"""
+    with _profiles_lock:
+        profile = _profiles.get(session)
+        if profile is None:
+            profile = _profiles[session] = session.execution_profile_clone_update(
+                EXEC_PROFILE_DEFAULT, row_factory=columnar_factory)
+        return profile
+
+def fetch_columns(session, prepared, params=()):
+    """Exécute une requête et regroupe toutes ses pages en un seul ColumnBatch"""
+    result = session.execute(prepared, params, execution_profile=columnar_profile(session))
+    batch = ColumnBatch.empty()
+    while True:
+        batch.extend(result.current_rows)
+        if not result.has_more_pages:
+            return batch
+        result.fetch_next_page()
@@ -0,0 +1,132 @@
+import atexit
+import threading
+from collections import Counter
+from cassandra import WriteTimeout, OperationTimedOut
+from cassandra.query import BatchStatement, BatchType
+from loguru import logger
+from models.statements import LazyStatements
+
+# Compteurs de la table statistics (metric_name)
+TOTAL_BORROWS = 'total_borrows'
+ACTIVE_LOANS = 'active_loans'
+TOTAL_RETURNS = 'total_returns'
+TOTAL_USERS = 'total_users'
+TOTAL_BOOKS = 'total_books'
+METRICS = (TOTAL_BORROWS, ACTIVE_LOANS, TOTAL_RETURNS, TOTAL_USERS, TOTAL_BOOKS)
+
+class CounterAggregator(LazyStatements):
+    """Compteurs de la table statistics en écriture différée (write-behind).
+
+    increment() ne fait qu'additionner en mémoire : le chemin d'emprunt
+    n'attend jamais Cassandra. Un thread de fond regroupe les variations
+    et les envoie en un BatchStatement COUNTER toutes les `flush_interval`
+    secondes, ou dès `flush_events` incréments.
+
+    Un compteur n'est pas idempotent : après un timeout d'écriture (issue
+    inconnue) le lot est abandonné plutôt que rejoué, pour ne jamais
+    compter deux fois ; les autres erreurs remettent les variations en attente.
+    """
+
+    def __init__(self, session, flush_interval=0.5, flush_events=500):
+        self.session = session
+        self.flush_interval = flush_interval
+        self.flush_events = flush_events
+        self._pending = Counter()
+        self._events = 0
+        self._cond = threading.Condition()
+        self._closed = False
+        self._metrics = {'events': 0, 'flushes': 0, 'failed': 0, 'dropped': 0}
+        self._prepare_queries()
+        self._thread = threading.Thread(target=self._run, name="counter-aggregator", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def _prepare_queries(self):
+        self._declare(prep_increment="""
+            UPDATE statistics SET value = value + ? WHERE metric_name = ?
+        """)
+        self._declare(prep_read="""
+            SELECT metric_name, value FROM statistics WHERE metric_name IN ?
+        """)
+
+    def increment(self, metric, delta=1):
+        """Ajoute delta au compteur (en mémoire, sans attente)"""
+        with self._cond:
+            self._pending[metric] += delta
+            self._events += 1
+            self._metrics['events'] += 1
+            if self._events >= self.flush_events:
+                self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._closed and self._events < self.flush_events:
+                    self._cond.wait(self.flush_interval)
+                if self._closed:
+                    return
+            self.flush()
+
+    def _take(self):
+        with self._cond:
+            deltas = {metric: n for metric, n in self._pending.items() if n}
+            self._pending.clear()
+            self._events = 0
+        return deltas
+
+    def _restore(self, deltas):
+        with self._cond:
+            self._pending.update(deltas)
+
+    def flush(self):
+        """Envoie les variations en attente ; retourne le nombre de compteurs écrits"""
+        deltas = self._take()
+        if not deltas:
+            return 0
+        batch = BatchStatement(batch_type=BatchType.COUNTER)
+        for metric, delta in deltas.items():
+            batch.add(self.prep_increment, (delta, metric))
+        try:
+            self.session.execute(batch)
+            with self._cond:
+                self._metrics['flushes'] += 1
+            return len(deltas)
+        except (WriteTimeout, OperationTimedOut) as e:
+            with self._cond:
+                self._metrics['dropped'] += 1
+            logger.warning(f"⚠️  Compteurs non confirmés, lot abandonné ({deltas}) : {e}")
+        except Exception as e:
+            self._restore(deltas)
+            with self._cond:
+                self._metrics['failed'] += 1
+            logger.error(f"❌ Erreur écriture statistics : {e}")
+        return 0
+
+    def read(self, metrics=METRICS):
+        """Valeurs des compteurs en une requête, y compris les variations non encore envoyées"""
+        values = dict.fromkeys(metrics, 0)
+        try:
+            for row in self.session.execute(self.prep_read, [list(metrics)]):
+                values[row.metric_name] = row.value or 0
+        except Exception as e:
+            logger.error(f"❌ Erreur lecture statistics : {e}")
+        with self._cond:
+            for metric in metrics:
+                values[metric] += self._pending.get(metric, 0)
+        return values
+
+    def close(self):
+        """Arrête le thread de fond et envoie les dernières variations"""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+        self.flush()
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._metrics)
+            stats['pending'] = sum(1 for n in self._pending.values() if n)
+        return stats
@@ -0,0 +1,252 @@
+import os
+import csv
+import json
+import glob
+import time
+import uuid
+from collections import namedtuple
+from datetime import datetime, date
+from loguru import logger
+from models.scan import TableScanner, ScanCheckpoint
+from models.columnar import uuid_strings
+
+# Tables exportables : (table, clé de partition)
+EXPORTS = {
+    'books': ('books_by_id', 'isbn'),
+    'users': ('users_by_id', 'user_id'),
+    'borrows': ('borrows_by_user', 'user_id'),
+    # Historique par livre : borrows_by_book a été remplacée par les buckets mensuels
+    'book-borrows': ('borrows_by_book_monthly', ('isbn', 'bucket')),
+}
+
+FORMATS = ('csv', 'jsonl', 'parquet')
+
+ExportReport = namedtuple('ExportReport', ['rows', 'chunks', 'elapsed', 'resumed'])
+
+def guess_format(path):
+    extension = os.path.splitext(path.rstrip('/'))[1].lower().lstrip('.')
+    return extension if extension in FORMATS else 'csv'
+
+def _text(value):
+    """Valeur d'une cellule CSV / JSON"""
+    if value is None:
+        return None
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    return value
+
+class CsvWriter:
+    """Un seul fichier ; la position de reprise est sa taille à la dernière validation"""
+
+    def __init__(self, path, columns=None):
+        self.path = path
+        self.columns = columns
+        self._file = None
+        self._writer = None
+        self._header = False
+
+    def open(self, position=None):
+        if position:
+            with open(self.path, 'r+b') as f:
+                f.truncate(position)
+            self._header = True
+        self._file = open(self.path, 'a' if position else 'w', encoding='utf-8', newline='')
+        self._writer = csv.writer(self._file)
+
+    def write(self, names, rows):
+        if not self._header:
+            self._writer.writerow(names)
+            self._header = True
+        self._writer.writerows(['' if v is None else _text(v) for v in row] for row in rows)
+
+    def commit(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        return self._file.tell()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
+class JsonlWriter(CsvWriter):
+    def open(self, position=None):
+        if position:
+            with open(self.path, 'r+b') as f:
+                f.truncate(position)
+        self._file = open(self.path, 'a' if position else 'w', encoding='utf-8')
+
+    def write(self, names, rows):
+        self._file.writelines(
+            json.dumps(dict(zip(names, map(_text, row))), ensure_ascii=False) + "\n" for row in rows)
+
+class ParquetWriter:
+    """Répertoire de fichiers part-NNNNN.parquet, un par lot validé (pyarrow requis).
+
+    columns : {colonne: type CQL}. Tous les fichiers partagent le schéma
+    déduit de ces types : une colonne vide dans un lot n'y devient pas
+    `null`, et le répertoire se relit d'un seul bloc.
+    """
+
+    def __init__(self, path, columns=None):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise RuntimeError("Export Parquet indisponible : installer pyarrow (pip install pyarrow)")
+        self.path = path
+        self.columns = columns
+        self._pa = pyarrow
+        self._pq = pyarrow.parquet
+        string = pyarrow.string()
+        self._types = {
+            'text': string, 'varchar': string, 'ascii': string, 'inet': string,
+            'uuid': string, 'timeuuid': string,
+            'int': pyarrow.int32(), 'bigint': pyarrow.int64(), 'counter': pyarrow.int64(),
+            'varint': pyarrow.int64(), 'smallint': pyarrow.int16(), 'tinyint': pyarrow.int8(),
+            'boolean': pyarrow.bool_(), 'float': pyarrow.float32(), 'double': pyarrow.float64(),
+            'timestamp': pyarrow.timestamp('ms'), 'date': pyarrow.date32(), 'blob': pyarrow.binary(),
+        }
+        self._parts = 0
+        self._pending = []
+        self._names = None
+
+    def open(self, position=None):
+        os.makedirs(self.path, exist_ok=True)
+        self._parts = position or 0
+        # Lots écrits après la dernière validation : ils seront relus
+        for part in glob.glob(os.path.join(self.path, 'part-*.parquet')):
+            if int(os.path.basename(part)[5:10]) >= self._parts:
+                os.remove(part)
+
+    def write(self, names, rows):
+        self._names = names
+        self._pending.extend(rows)
+
+    def _table(self):
+        columns, fields = {}, []
+        for name, values in zip(self._names, zip(*self._pending)):
+            values = list(values)
+            sample = next((v for v in values if v is not None), None)
+            columns[name] = uuid_strings(values) if isinstance(sample, uuid.UUID) else values
+            if self.columns is not None:
+                arrow = self._types.get(self.columns.get(name))
+                if arrow is None:
+                    # Type sans équivalent direct (collections, decimal...) : texte
+                    arrow = self._pa.string()
+                    columns[name] = [None if v is None else str(_text(v)) for v in values]
+                fields.append(self._pa.field(name, arrow))
+        return self._pa.table(columns, schema=self._pa.schema(fields) if fields else None)
+
+    def commit(self):
+        if self._pending:
+            path = os.path.join(self.path, f"part-{self._parts:05d}.parquet")
+            self._pq.write_table(self._table(), f"{path}.tmp")
+            os.replace(f"{path}.tmp", path)
+            self._parts += 1
+            self._pending = []
+        return self._parts
+
+    def close(self):
+        pass
+
+WRITERS = {'csv': CsvWriter, 'jsonl': JsonlWriter, 'parquet': ParquetWriter}
+
+class TableExporter:
+    """Export d'une table entière en flux, par lots de taille fixe.
+
+    La table est lue par plages de tokens (models/scan.py) ; les lignes sont
+    écrites par lots de `chunk_size`, chaque lot étant validé (fsync, ou
+    fichier Parquet fermé) avant d'enregistrer dans le point de reprise, en
+    une seule écriture, la position de chaque plage et celle du fichier de
+    sortie. Une reprise tronque la sortie à la dernière validation et relit
+    les plages à partir de là : aucune ligne perdue ni dupliquée.
+    La mémoire est bornée par chunk_size et la file du scanner, quelle que
+    soit la taille de la table.
+    """
+
+    def __init__(self, session, export, path, fmt=None, chunk_size=10000, checkpoint_path=None,
+                 report_every=100000, **scan_options):
+        if export not in EXPORTS:
+            raise ValueError(f"Export inconnu : {export} ({', '.join(EXPORTS)})")
+        self.session = session
+        self.export = export
+        self.path = path
+        self.format = fmt or guess_format(path)
+        self.chunk_size = chunk_size
+        self.checkpoint_path = checkpoint_path or f"{path.rstrip('/')}.checkpoint"
+        self.report_every = report_every
+        self.scan_options = scan_options
+
+    def _columns(self, table):
+        """{colonne: type CQL}, lus dans les métadonnées du résultat (même si la table est vide)"""
+        result = self.session.execute(f"SELECT * FROM {table} LIMIT 1")
+        return {name: getattr(cql_type, 'typename', None)
+                for name, cql_type in zip(result.column_names or [], result.column_types or [])}
+
+    def run(self, restart=False):
+        table, partition_key = EXPORTS[self.export]
+        if restart and os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+        checkpoint = ScanCheckpoint(self.checkpoint_path)
+        scanner = TableScanner(self.session, table, '*', partition_key, checkpoint=checkpoint,
+                               **self.scan_options)
+        columns = self._columns(table)
+        writer = WRITERS[self.format](self.path, columns)
+
+        start = time.perf_counter()
+        buffered, pages = [], []
+        rows = checkpoint.get_meta('rows', 0)
+        resumed = rows > 0
+        chunks = 0
+        next_report = rows + self.report_every
+        names = None
+
+        def commit():
+            nonlocal rows, chunks, next_report
+            if buffered:
+                writer.write(names, buffered)
+            position = writer.commit()
+            rows += len(buffered)
+            chunks += 1
+            for token_range, paging_state in pages:
+                checkpoint.advance(token_range, paging_state, save=False)
+            checkpoint.set_meta('position', position)
+            checkpoint.set_meta('rows', rows)
+            checkpoint.save(force=True)
+            buffered.clear()
+            pages.clear()
+            if rows >= next_report:
+                next_report = rows + self.report_every
+                elapsed = time.perf_counter() - start
+                logger.info(f"📦 {self.export} : {rows:,} lignes exportées "
+                            f"({scanner.stats()['rows'] / elapsed if elapsed else 0:,.0f} lignes/s)")
+
+        writer.open(checkpoint.get_meta('position') if resumed else None)
+        if resumed:
+            logger.info(f"🔧 Reprise de l'export {self.export} après {rows:,} lignes")
+        try:
+            for token_range, page, paging_state in scanner.pages():
+                if page and names is None:
+                    names = list(page[0]._fields)
+                buffered.extend(page)
+                pages.append((token_range, paging_state))
+                if len(buffered) >= self.chunk_size:
+                    commit()
+            if pages:
+                commit()
+            if names is None and not resumed:
+                # Table vide : l'en-tête CSV est écrit quand même (colonnes lues dans les métadonnées du résultat)
+                writer.write(list(columns), [])
+                writer.commit()
+        finally:
+            writer.close()
+
+        # Export complet : le point de reprise n'a plus lieu d'être
+        checkpoint.clear()
+        elapsed = time.perf_counter() - start
+        report = ExportReport(rows, chunks, elapsed, resumed)
+        logger.success(f"✅ {self.export} exporté dans {self.path} : {rows:,} lignes en {elapsed:.1f}s "
+                       f"({scanner.stats()['rows'] / elapsed if elapsed else 0:,.0f} lignes/s)")
+        return report
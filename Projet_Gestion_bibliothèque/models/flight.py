@@ -0,0 +1,134 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+from cassandra.query import PreparedStatement, BoundStatement
+
+def _freeze(value):
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, (set, frozenset)):
+        return frozenset(_freeze(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    return value
+
+def flight_key(statement, params=(), *extra):
+    """Clé d'une lecture : requête préparée (query_id) + paramètres ; None si non hachable"""
+    if isinstance(statement, BoundStatement):
+        statement = statement.prepared_statement
+    query = statement.query_id if isinstance(statement, PreparedStatement) else str(statement)
+    key = (query, _freeze(params or ())) + extra
+    try:
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+class SingleFlight:
+    """Regroupement des lectures identiques en vol (single-flight).
+
+    Le premier appelant d'une clé exécute la lecture ; ceux qui arrivent
+    pendant qu'elle est en vol attendent son résultat au lieu d'envoyer la
+    même requête. La clé est retirée dès la réponse : l'appel suivant
+    relit le cluster, rien n'est conservé (pas de TTL ni de donnée périmée).
+
+    Threads et coroutines partagent les mêmes vols (concurrent.futures.Future) :
+    un appel asyncio peut attendre une lecture lancée par un thread, et
+    inversement. Le résultat est partagé : il ne doit pas être modifié.
+
+    Une écriture appelle forget(clé) : les lectures suivantes partent sur un
+    nouveau vol au lieu de rejoindre une lecture lancée avant l'écriture, et
+    le résultat de cette lecture n'est plus mis en cache (paramètre `store`).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._metrics = {'requests': 0, 'executed': 0, 'collapsed': 0, 'errors': 0, 'forgotten': 0}
+
+    def _join(self, key):
+        """(future, True) pour le premier appelant de la clé, (future, False) pour les suivants"""
+        with self._lock:
+            self._metrics['requests'] += 1
+            future = self._calls.get(key)
+            if future is not None:
+                self._metrics['collapsed'] += 1
+                return future, False
+            future = self._calls[key] = Future()
+            self._metrics['executed'] += 1
+            return future, True
+
+    def _finish(self, key, future, result=None, error=None, store=None):
+        with self._lock:
+            # Clé oubliée par une écriture (et peut-être reprise par un nouveau vol)
+            current = self._calls.get(key) is future
+            if current:
+                del self._calls[key]
+            if error is not None:
+                self._metrics['errors'] += 1
+            elif current and store is not None:
+                # Sous le verrou : un forget() concurrent passe avant ou après, jamais entre les deux
+                store(result)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def forget(self, *keys):
+        """Appelé après une écriture : les lectures suivantes de ces clés partent sur un nouveau vol"""
+        with self._lock:
+            for key in keys:
+                if key is not None and self._calls.pop(key, None) is not None:
+                    self._metrics['forgotten'] += 1
+
+    def run(self, key, load, store=None):
+        """Résultat de load(), exécuté une seule fois pour les appelants concurrents de même clé.
+
+        store(résultat) (ex : mise en cache) n'est appelé par le premier appelant
+        que si aucune écriture n'a oublié la clé pendant la lecture.
+        """
+        if key is None:
+            result = load()
+            if store is not None:
+                store(result)
+            return result
+        future, leader = self._join(key)
+        if not leader:
+            return future.result()
+        try:
+            result = load()
+        except Exception as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, result, store=store)
+        return result
+
+    async def run_async(self, key, load, store=None):
+        """Version asyncio : load est une fonction coroutine"""
+        if key is None:
+            result = await load()
+            if store is not None:
+                store(result)
+            return result
+        future, leader = self._join(key)
+        if leader:
+            task = asyncio.ensure_future(load())
+
+            def done(task):
+                if task.cancelled():
+                    self._finish(key, future, error=asyncio.CancelledError())
+                elif task.exception() is not None:
+                    self._finish(key, future, error=task.exception())
+                else:
+                    self._finish(key, future, task.result(), store=store)
+            task.add_done_callback(done)
+        # Un appelant annulé n'annule pas la lecture dont les autres attendent le résultat
+        return await asyncio.shield(asyncio.wrap_future(future))
+
+    def stats(self):
+        """Lectures demandées, envoyées au cluster, et regroupées sur une lecture en vol"""
+        with self._lock:
+            stats = dict(self._metrics)
+            stats['in_flight'] = len(self._calls)
+        stats['collapse_ratio'] = round(stats['collapsed'] / stats['requests'], 3) if stats['requests'] else 0.0
+        return stats
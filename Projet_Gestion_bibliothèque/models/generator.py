@@ -0,0 +1,360 @@
+import os
+import json
+import math
+import time
+import uuid
+import unicodedata
+from collections import Counter, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, date
+import numpy as np
+from loguru import logger
+
+CATEGORIES = ['Science Fiction', 'Fantasy', 'Thriller', 'Romance',
+              'Histoire', 'Science', 'Biographie', 'Philosophie']
+PUBLISHERS = ['Gallimard', 'Flammarion', 'Hachette', 'Albin Michel', 'Seuil']
+DOMAINS = ['example.com', 'example.fr', 'example.org']
+
+# Flux aléatoires indépendants : (graine, nature, numéro de lot)
+USERS, LOANS = 1, 2
+
+DatasetSpec = namedtuple('DatasetSpec', [
+    'books', 'users', 'loans_per_year', 'years', 'loan_days', 'zipf', 'seed', 'shard_size', 'until'])
+
+FakerPools = namedtuple('FakerPools', ['titles', 'authors', 'first_names', 'last_names',
+                                       'first_slugs', 'last_slugs', 'descriptions'])
+
+GenerationReport = namedtuple('GenerationReport', ['books', 'users', 'loans', 'active', 'shards', 'elapsed'])
+
+def _slug(text):
+    ascii_text = unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode()
+    return ''.join(c for c in ascii_text.lower() if c.isalnum())
+
+def build_pools(seed, size=5000, locale='fr_FR'):
+    """Valeurs Faker tirées une fois pour toutes, puis indexées par tableaux numpy.
+
+    Faker coûte quelques dizaines de µs par appel : le jeu de données
+    (des millions de lignes) pioche dans ces réserves au lieu de l'appeler.
+    """
+    from faker import Faker
+    fake = Faker(locale)
+    fake.seed_instance(seed)
+    first_names = [fake.first_name() for _ in range(size)]
+    last_names = [fake.last_name() for _ in range(size)]
+    return FakerPools(
+        titles=np.array([fake.sentence(nb_words=4)[:-1] for _ in range(size)], dtype=object),
+        authors=np.array([fake.name() for _ in range(size)], dtype=object),
+        first_names=np.array(first_names, dtype=object),
+        last_names=np.array(last_names, dtype=object),
+        first_slugs=np.array([_slug(n) or 'membre' for n in first_names], dtype=object),
+        last_slugs=np.array([_slug(n) or 'membre' for n in last_names], dtype=object),
+        descriptions=np.array([fake.text(max_nb_chars=200) for _ in range(size)], dtype=object),
+    )
+
+def _mix(indexes, seed, field):
+    """Hachage splitmix64 vectorisé : attribut `field` du livre n° index, sans état partagé"""
+    z = indexes.astype(np.uint64) + np.uint64(((seed * 31 + field) * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF)
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return z ^ (z >> np.uint64(31))
+
+def _pick(pool, hashes):
+    return pool[(hashes % np.uint64(len(pool))).astype(np.int64)]
+
+def book_isbns(indexes):
+    """ISBN-13 valides (préfixe 978, clé de contrôle) numérotés par index de livre"""
+    indexes = np.asarray(indexes, dtype=np.int64)
+    digits = (indexes[:, None] // 10 ** np.arange(8, -1, -1)) % 10
+    # Poids 1/3 alternés ; 9-7-8 pèse 9 + 21 + 8 = 38
+    check = (10 - (38 + digits @ np.array([3, 1, 3, 1, 3, 1, 3, 1, 3])) % 10) % 10
+    return [f"978-{i // 10**8}-{i // 100 % 10**6:06d}-{i % 100:02d}-{c}"
+            for i, c in zip(indexes.tolist(), check.tolist())]
+
+def book_titles(spec, pools, indexes):
+    """Titre du livre n° index : calculable par n'importe quel processus (emprunts)"""
+    return _pick(pools.titles, _mix(np.asarray(indexes), spec.seed, 1))
+
+def shard_bounds(total, shard_size, shard):
+    start = shard * shard_size
+    return start, min(total, start + shard_size)
+
+def shard_count(total, shard_size):
+    return (total + shard_size - 1) // shard_size
+
+class Popularity:
+    """Loi de Zipf bornée sur les livres : le rang r est tiré avec une probabilité ∝ 1 / r^s.
+
+    Les rangs sont répartis sur les index par une permutation affine :
+    les best-sellers ne sont pas les premiers livres générés.
+    """
+
+    def __init__(self, books, exponent, seed):
+        self.books = books
+        weights = 1.0 / np.arange(1, books + 1, dtype=np.float64) ** exponent
+        self.cdf = np.cumsum(weights)
+        self.cdf /= self.cdf[-1]
+        self.stride = max(1, int(books * 0.618)) | 1
+        while math.gcd(self.stride, books) != 1:
+            self.stride += 2
+        self.offset = int(_mix(np.array([0]), seed, 99)[0] % np.uint64(books))
+
+    def sample(self, rng, size):
+        ranks = np.minimum(np.searchsorted(self.cdf, rng.random(size)), self.books - 1)
+        return (ranks * self.stride + self.offset) % self.books
+
+def _datetimes(until, millis_before):
+    """until - n ms, pour tout un tableau ; objets datetime pour le driver"""
+    moments = np.datetime64(until, 'ms') - millis_before.astype('timedelta64[ms]')
+    return moments.astype('datetime64[ms]').tolist()
+
+# ---------- Génération d'un lot (pure : ne dépend que de spec, pools et du numéro de lot) ----------
+
+def member_shard(spec, pools, popularity, shard):
+    """Membres du lot et leur historique d'emprunts.
+
+    Retourne (membres, emprunts, {index de livre: emprunts en cours}).
+    Chaque membre emprunte en moyenne `loans_per_year` livres par an depuis
+    son inscription ; un emprunt de moins de `loan_days` jours est en cours.
+    """
+    start, stop = shard_bounds(spec.users, spec.shard_size, shard)
+    count = stop - start
+    rng = np.random.default_rng([spec.seed, USERS, shard])
+    span = int(spec.years * 365 * 86400 * 1000)
+
+    firsts = rng.integers(len(pools.first_names), size=count)
+    lasts = rng.integers(len(pools.last_names), size=count)
+    domains = rng.integers(len(DOMAINS), size=count)
+    registered = rng.integers(0, span, size=count)
+    raw = rng.bytes(16 * count)
+    user_ids = [uuid.UUID(bytes=raw[16 * k:16 * k + 16], version=4) for k in range(count)]
+    registrations = _datetimes(spec.until, registered)
+
+    users = []
+    for k in range(count):
+        users.append({
+            'user_id': user_ids[k],
+            'email': f"{pools.first_slugs[firsts[k]]}.{pools.last_slugs[lasts[k]]}.{start + k}"
+                     f"@{DOMAINS[domains[k]]}",
+            'first_name': pools.first_names[firsts[k]],
+            'last_name': pools.last_names[lasts[k]],
+            'registration_date': registrations[k],
+        })
+
+    # Historique : tous les emprunts du lot tirés d'un bloc
+    rng = np.random.default_rng([spec.seed, LOANS, shard])
+    per_user = rng.poisson(spec.loans_per_year * registered / (365 * 86400 * 1000))
+    owners = np.repeat(np.arange(count), per_user)
+    before = (rng.random(len(owners)) * registered[owners]).astype(np.int64)
+    books = popularity.sample(rng, len(owners)) if len(owners) else np.zeros(0, dtype=np.int64)
+
+    # Clé (user_id, borrow_date) : une milliseconde ne porte qu'un emprunt par membre
+    order = np.lexsort((before, owners))
+    owners, before, books = owners[order], before[order], books[order]
+    keep = np.ones(len(owners), dtype=bool)
+    keep[1:] = (owners[1:] != owners[:-1]) | (before[1:] != before[:-1])
+    owners, before, books = owners[keep], before[keep], books[keep]
+
+    active = before < spec.loan_days * 86400 * 1000
+    isbns = book_isbns(books)
+    titles = book_titles(spec, pools, books)
+    dates = _datetimes(spec.until, before)
+    loans = []
+    for k in range(len(owners)):
+        user = users[owners[k]]
+        loans.append({
+            'user_id': user['user_id'],
+            'user_name': f"{user['first_name']} {user['last_name']}",
+            'isbn': isbns[k],
+            'book_title': titles[k],
+            'borrow_date': dates[k],
+            'status': 'ACTIVE' if active[k] else 'RETURNED',
+        })
+    return users, loans, Counter(books[active].tolist())
+
+def book_shard(spec, pools, shard, active=None):
+    """Livres du lot ; le stock tient compte des emprunts en cours ({index: nombre})"""
+    active = active or {}
+    start, stop = shard_bounds(spec.books, spec.shard_size, shard)
+    indexes = np.arange(start, stop, dtype=np.uint64)
+    titles = book_titles(spec, pools, indexes)
+    authors = _pick(pools.authors, _mix(indexes, spec.seed, 2))
+    categories = _pick(np.array(CATEGORIES, dtype=object), _mix(indexes, spec.seed, 3))
+    publishers = _pick(np.array(PUBLISHERS, dtype=object), _mix(indexes, spec.seed, 4))
+    years = (1950 + _mix(indexes, spec.seed, 5) % np.uint64(75)).tolist()
+    copies = (1 + _mix(indexes, spec.seed, 6) % np.uint64(10)).tolist()
+    descriptions = _pick(pools.descriptions, _mix(indexes, spec.seed, 7))
+
+    books = []
+    for k, isbn in enumerate(book_isbns(indexes)):
+        borrowed = active.get(start + k, 0)
+        total = max(copies[k], borrowed)
+        books.append({
+            'isbn': isbn,
+            'title': titles[k],
+            'author': authors[k],
+            'category': categories[k],
+            'publisher': publishers[k],
+            'publication_year': years[k],
+            'total_copies': total,
+            'available_copies': total - borrowed,
+            'description': descriptions[k],
+        })
+    return books
+
+# ---------- Destinations ----------
+
+def _json_value(value):
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} non sérialisable")
+
+class FileSink:
+    """Un fichier JSONL par nature et par lot (books-00000.jsonl...), pour scripts/bulk_load.py"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def write(self, kind, shard, records):
+        path = os.path.join(self.directory, f"{kind}-{shard:05d}.jsonl")
+        with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False, default=_json_value) + "\n")
+        os.replace(f"{path}.tmp", path)
+
+class ClusterSink:
+    """Écriture directe par le BulkLoader ; une connexion par processus"""
+
+    def __init__(self, concurrency=128):
+        from config.database import CassandraConnection
+        from models.loader import BulkLoader
+        self.db = CassandraConnection()
+        self.loader = BulkLoader(self.db.connect(), concurrency=concurrency, report_every=10**9)
+
+    def write(self, kind, shard, records):
+        load = {'users': self.loader.load_users, 'borrows': self.loader.load_borrows,
+                'books': self.loader.load_books}[kind]
+        report = load(records)
+        if report.failed:
+            raise RuntimeError(f"{report.failed} écritures en échec ({kind}, lot {shard})")
+
+# ---------- Processus de travail ----------
+
+_worker = {}
+
+def _init_worker(spec, pools, output, concurrency):
+    _worker['spec'] = spec
+    _worker['pools'] = pools
+    _worker['popularity'] = Popularity(spec.books, spec.zipf, spec.seed)
+    _worker['sink'] = FileSink(output) if output else ClusterSink(concurrency)
+
+def _members_task(shard):
+    users, loans, active = member_shard(_worker['spec'], _worker['pools'], _worker['popularity'], shard)
+    _worker['sink'].write('users', shard, users)
+    _worker['sink'].write('borrows', shard, loans)
+    return shard, len(users), len(loans), active
+
+def _books_task(shard, active):
+    books = book_shard(_worker['spec'], _worker['pools'], shard, active)
+    _worker['sink'].write('books', shard, books)
+    return shard, len(books)
+
+class DatasetGenerator:
+    """Jeu de données synthétique volumineux, réparti en lots sur un pool de processus.
+
+    Chaque lot de `shard_size` membres ou livres est une fonction pure de
+    (seed, numéro de lot) : le résultat est identique quel que soit le
+    nombre de processus. Les membres et leurs emprunts sont générés
+    d'abord ; les emprunts en cours, agrégés par livre, fixent ensuite
+    le stock (available_copies) de chaque livre.
+
+    output : répertoire de fichiers JSONL (scripts/bulk_load.py), sinon
+    écriture directe sur le cluster, chaque processus ayant sa session.
+    """
+
+    def __init__(self, books=100, users=50, loans_per_year=4.0, years=3, loan_days=21, zipf=1.1,
+                 seed=42, shard_size=10000, pool_size=5000, until=None, processes=None,
+                 output=None, concurrency=128):
+        until = until or datetime.combine(date.today(), datetime.min.time())
+        self.spec = DatasetSpec(books, users, loans_per_year, years, loan_days, zipf, seed, shard_size, until)
+        self.pool_size = pool_size
+        self.processes = processes or os.cpu_count() or 1
+        self.output = output
+        self.concurrency = concurrency
+
+    def _map(self, executor, task, *iterables):
+        if executor is None:
+            return map(task, *iterables)
+        return executor.map(task, *iterables)
+
+    def run(self):
+        spec = self.spec
+        start = time.perf_counter()
+        logger.info(f"🎲 Génération de {spec.books:,} livres et {spec.users:,} membres "
+                    f"(graine {spec.seed}, {self.processes} processus)...")
+        pools = build_pools(spec.seed, self.pool_size)
+        init_args = (spec, pools, self.output, self.concurrency)
+
+        executor = None
+        if self.processes > 1:
+            executor = ProcessPoolExecutor(self.processes, initializer=_init_worker, initargs=init_args)
+        else:
+            _init_worker(*init_args)
+        try:
+            users = loans = 0
+            active = Counter()
+            member_shards = shard_count(spec.users, spec.shard_size)
+            for shard, created, borrowed, in_progress in self._map(executor, _members_task, range(member_shards)):
+                users += created
+                loans += borrowed
+                active.update(in_progress)
+                logger.info(f"  👥 Lot {shard + 1}/{member_shards} : {created:,} membres, {borrowed:,} emprunts")
+
+            # Emprunts en cours regroupés par lot de livres : chaque processus ne reçoit que les siens
+            by_shard = {}
+            for index, count in active.items():
+                by_shard.setdefault(index // spec.shard_size, {})[index] = count
+            book_shards = shard_count(spec.books, spec.shard_size)
+            books = 0
+            shards = range(book_shards)
+            for shard, created in self._map(executor, _books_task, shards, [by_shard.get(s) for s in shards]):
+                books += created
+                logger.info(f"  📚 Lot {shard + 1}/{book_shards} : {created:,} livres")
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+        report = GenerationReport(books, users, loans, sum(active.values()),
+                                  member_shards + book_shards, time.perf_counter() - start)
+        if self.output:
+            self._write_manifest(report)
+        else:
+            self._update_statistics(report)
+        logger.success(f"✅ {books:,} livres, {users:,} membres, {loans:,} emprunts "
+                       f"({report.active:,} en cours) en {report.elapsed:.1f}s")
+        return report
+
+    def _update_statistics(self, report):
+        """Compteurs de la table statistics, une fois tous les lots écrits"""
+        from config.database import CassandraConnection
+        from models.counters import (CounterAggregator, TOTAL_BOOKS, TOTAL_USERS, TOTAL_BORROWS,
+                                     ACTIVE_LOANS, TOTAL_RETURNS)
+        db = CassandraConnection()
+        try:
+            counters = CounterAggregator(db.connect())
+            counters.increment(TOTAL_BOOKS, report.books)
+            counters.increment(TOTAL_USERS, report.users)
+            counters.increment(TOTAL_BORROWS, report.loans)
+            counters.increment(ACTIVE_LOANS, report.active)
+            counters.increment(TOTAL_RETURNS, report.loans - report.active)
+            counters.close()
+        finally:
+            db.close()
+
+    def _write_manifest(self, report):
+        """Paramètres et volumes du jeu généré : de quoi le régénérer à l'identique"""
+        manifest = {'spec': self.spec._asdict(), 'pool_size': self.pool_size, 'report': report._asdict()}
+        with open(os.path.join(self.output, 'manifest.json'), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2, default=_json_value)
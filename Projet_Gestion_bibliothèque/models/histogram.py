@@ -0,0 +1,92 @@
+import math
+import threading
+
+class LatencyHistogram:
+    """Histogramme de latences à buckets logarithmiques (erreur relative ~1%).
+
+    Les valeurs sont enregistrées en secondes et stockées en microsecondes ;
+    la mémoire reste constante quel que soit le nombre de mesures, ce qui
+    permet de calculer p50/p95/p99 sur des millions d'opérations.
+    """
+
+    GROWTH = 1.02
+
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = 0.0
+
+    def _index(self, micros):
+        if micros < 1:
+            return 0
+        return int(math.log(micros) / math.log(self.GROWTH)) + 1
+
+    def _upper_bound(self, index):
+        if index == 0:
+            return 1.0
+        return self.GROWTH ** index
+
+    def record(self, seconds):
+        """Enregistre une latence (en secondes)"""
+        micros = seconds * 1e6
+        index = self._index(micros)
+        with self._lock:
+            self._buckets[index] = self._buckets.get(index, 0) + 1
+            self.count += 1
+            self.total += seconds
+            self.max = max(self.max, seconds)
+            self.min = seconds if self.min is None else min(self.min, seconds)
+
+    def merge(self, other):
+        """Ajoute les mesures d'un autre histogramme (ex: un par thread)"""
+        with self._lock:
+            for index, n in other._buckets.items():
+                self._buckets[index] = self._buckets.get(index, 0) + n
+            self.count += other.count
+            self.total += other.total
+            self.max = max(self.max, other.max)
+            if other.min is not None:
+                self.min = other.min if self.min is None else min(self.min, other.min)
+        return self
+
+    def percentile(self, p):
+        """Latence (secondes) sous laquelle se trouvent p % des mesures"""
+        with self._lock:
+            if not self.count:
+                return 0.0
+            rank = max(1, math.ceil(self.count * p / 100.0))
+            seen = 0
+            for index in sorted(self._buckets):
+                seen += self._buckets[index]
+                if seen >= rank:
+                    # Borne haute du bucket, plafonnée par le max réellement observé
+                    return min(self._upper_bound(index) / 1e6, self.max)
+            return self.max
+
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def buckets(self):
+        """Buckets cumulés [(borne_haute_secondes, nombre)] pour l'export"""
+        with self._lock:
+            items = sorted(self._buckets.items())
+        cumulative = 0
+        result = []
+        for index, n in items:
+            cumulative += n
+            result.append((self._upper_bound(index) / 1e6, cumulative))
+        return result
+
+    def summary(self):
+        """Résumé en millisecondes (format des rapports JSON)"""
+        return {
+            'count': self.count,
+            'mean_ms': round(self.mean() * 1000, 3),
+            'p50_ms': round(self.percentile(50) * 1000, 3),
+            'p95_ms': round(self.percentile(95) * 1000, 3),
+            'p99_ms': round(self.percentile(99) * 1000, 3),
+            'max_ms': round(self.max * 1000, 3),
+        }
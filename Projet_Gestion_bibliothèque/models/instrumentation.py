@@ -0,0 +1,305 @@
+import re
+import time
+import bisect
+import threading
+import urllib.request
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from cassandra.query import BatchStatement, BoundStatement, PreparedStatement
+from loguru import logger
+from models.histogram import LatencyHistogram
+from models.statements import normalize
+
+# Bornes (secondes) des buckets exportés au format Prometheus
+EXPORT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class _Series:
+    """Compteurs d'une requête ou d'un coordinateur"""
+
+    def __init__(self):
+        self.count = 0
+        self.retries = 0
+        self.errors = Counter()
+        self.latency = LatencyHistogram()
+        # Comptes exacts par borne exportée : un bucket logarithmique peut chevaucher une borne
+        self.export_counts = [0] * len(EXPORT_BUCKETS)
+
+    def observe(self, seconds):
+        self.latency.record(seconds)
+        # Première borne le >= latence (bornes inclusives, comme Prometheus)
+        index = bisect.bisect_left(EXPORT_BUCKETS, seconds)
+        if index < len(EXPORT_BUCKETS):
+            self.export_counts[index] += 1
+
+    @property
+    def error_count(self):
+        return sum(self.errors.values())
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+class QueryMetrics:
+    """Métriques par requête CQL, collectées par un request-init listener du driver.
+
+    Chaque requête envoyée par la session est suivie jusqu'à sa réponse :
+    nombre d'appels, erreurs par type, histogramme de latence (première
+    page), rejeux et nœud coordinateur. Les requêtes préparées des
+    repositories enregistrés apparaissent sous leur nom
+    (ex : BookRepository.prep_get_by_isbn), les autres sous leur texte CQL.
+    """
+
+    def __init__(self, flight=None):
+        self._lock = threading.Lock()
+        # SingleFlight de l'application : lectures regroupées ajoutées à l'exposition
+        self.flight = flight
+        self._names = {}
+        self._names_by_query = {}
+        self._statements = {}
+        self._hosts = {}
+        self._sessions = []
+
+    # ----- Installation -----
+
+    def install(self, session):
+        session.add_request_init_listener(self._on_request)
+        self._sessions.append(session)
+        return self
+
+    def uninstall(self):
+        for session in self._sessions:
+            session.remove_request_init_listener(self._on_request)
+        self._sessions = []
+
+    def register(self, *repositories):
+        """Nomme les requêtes préparées (attributs prep_*) des repositories.
+
+        Les requêtes préparées à la demande (LazyStatements) sont reconnues
+        par leur texte ; une requête partagée garde le premier nom enregistré.
+        """
+        for repo in repositories:
+            declared = getattr(repo, 'declared_queries', None)
+            if declared is not None:
+                for attr, query in declared().items():
+                    self._names_by_query.setdefault(normalize(query), f"{type(repo).__name__}.{attr}")
+            for attr, value in vars(repo).items():
+                if attr.startswith('prep_') and isinstance(value, PreparedStatement):
+                    self._names.setdefault(id(value), f"{type(repo).__name__}.{attr}")
+            # Moteur de stock et file de réservations des emprunts : requêtes propres
+            for attr in ('stock', 'reservations'):
+                component = getattr(repo, attr, None)
+                if component is not None and component is not repo:
+                    self.register(component)
+        return self
+
+    def statement_name(self, query):
+        if isinstance(query, BoundStatement):
+            query = query.prepared_statement
+        if isinstance(query, PreparedStatement):
+            name = self._names.get(id(query))
+            if name:
+                return name
+            name = self._names_by_query.get(normalize(query.query_string))
+            if name:
+                # Mémorisé par instance : le texte n'est normalisé qu'une fois
+                self._names[id(query)] = name
+                return name
+            query = query.query_string
+        elif isinstance(query, BatchStatement):
+            return 'BATCH'
+        text = getattr(query, 'query_string', query)
+        return re.sub(r'\s+', ' ', str(text)).strip()[:120]
+
+    # ----- Collecte -----
+
+    def _on_request(self, future):
+        state = {'name': self.statement_name(future.query), 'start': time.perf_counter(), 'done': False}
+        future.add_callbacks(self._on_response, self._on_error,
+                             callback_args=(future, state), errback_args=(future, state))
+
+    def _record(self, future, state, error=None):
+        # Une seule mesure par requête : les pages suivantes ne sont pas chronométrées
+        if state['done']:
+            return
+        state['done'] = True
+        elapsed = time.perf_counter() - state['start']
+        host = future.coordinator_host
+        if host is None and future.attempted_hosts:
+            host = future.attempted_hosts[-1]
+        host = str(host) if host is not None else 'inconnu'
+        retries = getattr(future, '_query_retries', 0) or 0
+
+        with self._lock:
+            for key, series in ((state['name'], self._statements), (host, self._hosts)):
+                s = series.get(key)
+                if s is None:
+                    s = series[key] = _Series()
+                s.count += 1
+                s.retries += retries
+                s.observe(elapsed)
+                if error is not None:
+                    s.errors[type(error).__name__] += 1
+
+    def _on_response(self, rows, future, state):
+        self._record(future, state)
+
+    def _on_error(self, error, future, state):
+        self._record(future, state, error)
+
+    # ----- Lecture -----
+
+    def snapshot(self):
+        """Résumé par requête et par coordinateur (triés par nombre d'appels)"""
+        def rows(series, key):
+            with self._lock:
+                items = list(series.items())
+            result = []
+            for name, s in sorted(items, key=lambda item: -item[1].count):
+                row = {key: name, 'errors': s.error_count, 'retries': s.retries}
+                row.update(s.latency.summary())
+                result.append(row)
+            return result
+        return {'statements': rows(self._statements, 'statement'), 'hosts': rows(self._hosts, 'host')}
+
+    def reset(self):
+        with self._lock:
+            self._statements.clear()
+            self._hosts.clear()
+
+    def prometheus(self, prefix='library_cql'):
+        """Exposition au format texte Prometheus"""
+        lines = []
+        with self._lock:
+            groups = (('statement', dict(self._statements)), ('host', dict(self._hosts)))
+
+        for label, series in groups:
+            metric = f"{prefix}_{label}"
+            lines.append(f"# HELP {metric}_requests_total Requêtes CQL par {label}")
+            lines.append(f"# TYPE {metric}_requests_total counter")
+            for key, s in series.items():
+                lines.append(f'{metric}_requests_total{{{label}="{_escape(key)}"}} {s.count}')
+
+            lines.append(f"# HELP {metric}_errors_total Requêtes CQL en erreur par {label} et type d'erreur")
+            lines.append(f"# TYPE {metric}_errors_total counter")
+            for key, s in series.items():
+                for error, n in s.errors.items():
+                    lines.append(f'{metric}_errors_total{{{label}="{_escape(key)}",error="{error}"}} {n}')
+
+            lines.append(f"# HELP {metric}_retries_total Rejeux du driver par {label}")
+            lines.append(f"# TYPE {metric}_retries_total counter")
+            for key, s in series.items():
+                lines.append(f'{metric}_retries_total{{{label}="{_escape(key)}"}} {s.retries}')
+
+            lines.append(f"# HELP {metric}_duration_seconds Latence des requêtes CQL par {label}")
+            lines.append(f"# TYPE {metric}_duration_seconds histogram")
+            for key, s in series.items():
+                name = _escape(key)
+                n = 0
+                for bound, count in zip(EXPORT_BUCKETS, s.export_counts):
+                    n += count
+                    lines.append(f'{metric}_duration_seconds_bucket{{{label}="{name}",le="{bound}"}} {n}')
+                lines.append(f'{metric}_duration_seconds_bucket{{{label}="{name}",le="+Inf"}} {s.latency.count}')
+                lines.append(f'{metric}_duration_seconds_sum{{{label}="{name}"}} {round(s.latency.total, 6)}')
+                lines.append(f'{metric}_duration_seconds_count{{{label}="{name}"}} {s.latency.count}')
+
+        if self.flight is not None:
+            stats = self.flight.stats()
+            for name, help_text in (('requests', "Lectures demandées"), ('executed', "Lectures envoyées au cluster"),
+                                    ('collapsed', "Lectures regroupées sur une lecture en vol")):
+                lines.append(f"# HELP library_reads_{name}_total {help_text} (single-flight)")
+                lines.append(f"# TYPE library_reads_{name}_total counter")
+                lines.append(f"library_reads_{name}_total {stats[name]}")
+        return '\n'.join(lines) + '\n'
+
+def serve_metrics(metrics, port, host='0.0.0.0'):
+    """Expose /metrics sur un thread HTTP en arrière-plan ; retourne le serveur"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = metrics.prometheus().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    logger.success(f"✅ Métriques exposées sur http://{host}:{port}/metrics")
+    return server
+
+# ---------- Lecture d'une exposition publiée par serve_metrics ----------
+
+_SAMPLE = re.compile(r'^(\w+)(?:\{(.*)\})?\s+(\S+)$')
+_LABEL = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+def _unescape(value):
+    return re.sub(r'\\(.)', lambda m: '\n' if m.group(1) == 'n' else m.group(1), value)
+
+def parse_exposition(text):
+    """[(nom, {label: valeur}, valeur)] d'un texte au format Prometheus"""
+    samples = []
+    for line in text.splitlines():
+        match = _SAMPLE.match(line.strip())
+        if match is None or line.startswith('#'):
+            continue
+        name, labels, value = match.groups()
+        labels = {k: _unescape(v) for k, v in _LABEL.findall(labels or '')}
+        samples.append((name, labels, float(value)))
+    return samples
+
+def _quantile(buckets, count, q):
+    """Borne du premier bucket atteignant le rang q (estimation par excès)"""
+    if not count:
+        return 0.0
+    rank = count * q
+    for bound, cumulative in sorted(buckets):
+        if cumulative >= rank:
+            return bound
+    return float('inf')
+
+def summarize_exposition(text, prefix='library_cql'):
+    """Résumé par requête et par coordinateur d'une exposition (même forme que QueryMetrics.snapshot)"""
+    series = {}
+    reads = {}
+    for name, labels, value in parse_exposition(text):
+        if name.startswith('library_reads_'):
+            reads[name[len('library_reads_'):-len('_total')]] = int(value)
+            continue
+        for label in ('statement', 'host'):
+            metric = f"{prefix}_{label}_"
+            if not name.startswith(metric) or label not in labels:
+                continue
+            entry = series.setdefault((label, labels[label]), {
+                'count': 0, 'errors': 0, 'retries': 0, 'sum': 0.0, 'buckets': []})
+            field = name[len(metric):]
+            if field == 'requests_total':
+                entry['count'] = int(value)
+            elif field == 'errors_total':
+                entry['errors'] += int(value)
+            elif field == 'retries_total':
+                entry['retries'] = int(value)
+            elif field == 'duration_seconds_sum':
+                entry['sum'] = value
+            elif field == 'duration_seconds_bucket' and labels.get('le') != '+Inf':
+                entry['buckets'].append((float(labels['le']), value))
+
+    result = {'statements': [], 'hosts': [], 'reads': reads}
+    for (label, key), e in sorted(series.items(), key=lambda item: -item[1]['count']):
+        row = {label: key, 'count': e['count'], 'errors': e['errors'], 'retries': e['retries'],
+               'mean_ms': round(e['sum'] / e['count'] * 1000, 3) if e['count'] else 0.0}
+        for q in (50, 95, 99):
+            # Borne haute du bucket exporté qui contient le quantile
+            row[f'p{q}_ms'] = round(_quantile(e['buckets'], e['count'], q / 100.0) * 1000, 3)
+        result['statements' if label == 'statement' else 'hosts'].append(row)
+    return result
+
+def fetch_exposition(url, timeout=5.0):
+    """Texte publié par serve_metrics (ex : http://localhost:9108/metrics)"""
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        return response.read().decode('utf-8')
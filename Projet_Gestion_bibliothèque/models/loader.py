@@ -0,0 +1,399 @@
+import csv
+import json
+import sys
+import time
+import uuid
+import threading
+from collections import deque, namedtuple
+from datetime import datetime
+from loguru import logger
+from cassandra.util import uuid_from_time
+from models.borrow import month_bucket
+from models.user import normalize_email
+from models.statements import LazyStatements
+from models.search import discard_snapshot
+
+LoadReport = namedtuple('LoadReport', ['records', 'statements', 'rejected', 'failed', 'retries', 'elapsed'])
+
+# Ligne JSONL illisible : transmise à la place de l'enregistrement pour être écartée par le chargeur
+InvalidLine = namedtuple('InvalidLine', ['line', 'error'])
+
+
+def read_records(path):
+    """Lit un flux CSV ou JSONL ligne par ligne (sans tout charger en mémoire).
+
+    Le format est déduit de l'extension ; '-' lit du JSONL sur l'entrée standard.
+    Une ligne JSONL mal formée produit un InvalidLine (numéro de ligne, erreur)
+    au lieu d'interrompre la lecture.
+    """
+    if path == '-':
+        yield from _read_jsonl(sys.stdin)
+        return
+
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        if path.lower().endswith('.csv'):
+            yield from csv.DictReader(f)
+        else:
+            yield from _read_jsonl(f)
+
+
+def _read_jsonl(stream):
+    for number, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as e:
+            yield InvalidLine(number, str(e))
+
+
+def invalid_record(record):
+    """Motif de rejet d'un enregistrement qui n'est pas un objet, sinon None"""
+    if isinstance(record, InvalidLine):
+        return f"ligne {record.line} illisible ({record.error})"
+    if not isinstance(record, dict):
+        return f"{_record_key(record)} n'est pas un objet"
+    return None
+
+
+def _to_int(value, default=None):
+    if value is None or value == '':
+        return default
+    return int(value)
+
+
+def _loan_id(record, user_id, borrow_date):
+    """loan_id fourni, sinon déduit de (user_id, borrow_date) : un rechargement ne crée pas de doublon"""
+    loan_id = record.get('loan_id')
+    if loan_id:
+        return loan_id if isinstance(loan_id, uuid.UUID) else uuid.UUID(str(loan_id))
+    return uuid_from_time(borrow_date, node=user_id.int & 0xFFFFFFFFFFFF, clock_seq=0)
+
+
+def _record_key(record):
+    """Clé lisible d'un enregistrement pour les journaux"""
+    if not isinstance(record, dict):
+        return repr(record)[:80]
+    keys = [str(record[k]) for k in ('isbn', 'user_id', 'email', 'borrow_date') if record.get(k)]
+    return '/'.join(keys) or repr(record)[:80]
+
+
+def _applied(rows):
+    """Résultat d'une écriture conditionnelle (colonne [applied]) reçu par un callback"""
+    if not rows:
+        return True
+    row = rows[0]
+    return row['[applied]'] if isinstance(row, dict) else row[0]
+
+
+def _claim_owner(rows):
+    """user_id du membre qui détient déjà l'adresse (réservation refusée)"""
+    if not rows:
+        return None
+    row = rows[0]
+    return row.get('user_id') if isinstance(row, dict) else getattr(row, 'user_id', None)
+
+
+class BulkLoader(LazyStatements):
+    """Chargement massif asynchrone (flux éditeurs, jeux de test volumineux).
+
+    Chaque ligne est transformée en requêtes préparées envoyées avec
+    execute_async. Le nombre de requêtes en vol est borné par une fenêtre
+    (sémaphore) : le producteur se bloque quand le cluster ne suit plus,
+    ce qui évite de saturer les coordinateurs et la mémoire du client.
+    """
+
+    def __init__(self, session, concurrency=128, max_retries=3, retry_backoff=0.05, report_every=10000):
+        self.session = session
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.report_every = report_every
+        self._prepare_queries()
+
+    def _prepare_queries(self):
+        """Déclaration des insertions (une par table dénormalisée), partagées via le registre de la session"""
+        self._declare(prep_insert_by_id="""
+            INSERT INTO books_by_id (isbn, title, author, category, publisher, publication_year,
+                                     total_copies, available_copies, description)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """)
+        self._declare(prep_insert_by_cat="""
+            INSERT INTO books_by_category (category, isbn, title, author, available_copies)
+            VALUES (?, ?, ?, ?, ?)
+        """)
+        self._declare(prep_insert_by_author="""
+            INSERT INTO books_by_author (author, isbn, title) VALUES (?, ?, ?)
+        """)
+        self._declare(prep_insert_user="""
+            INSERT INTO users_by_id (user_id, email, first_name, last_name, registration_date)
+            VALUES (?, ?, ?, ?, ?)
+        """)
+        # Conditionnel : un import ne prend jamais l'adresse d'un membre existant
+        # (le profil n'est inséré qu'après la réservation, voir _user_statements)
+        self._declare(prep_claim_email="""
+            INSERT INTO users_by_email (email, user_id) VALUES (?, ?) IF NOT EXISTS
+        """)
+        self._declare(prep_insert_book_borrow="""
+            INSERT INTO borrows_by_book_monthly (isbn, bucket, borrow_date, user_id, user_name)
+            VALUES (?, ?, ?, ?, ?)
+        """)
+        self._declare(prep_insert_active_loan="""
+            INSERT INTO active_loans (user_id, isbn, loan_id, borrow_date, book_title)
+            VALUES (?, ?, ?, ?, ?)
+        """)
+        self._declare(prep_insert_user_borrow="""
+            INSERT INTO borrows_by_user (user_id, borrow_date, isbn, book_title, status, loan_id)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """)
+        self._declare(prep_set_loan_id="""
+            UPDATE borrows_by_user SET loan_id = ? WHERE user_id = ? AND borrow_date = ?
+        """)
+        # Les INSERT sont rejouables sans effet de bord : le driver peut les relancer
+        self._idempotent('prep_insert_by_id', 'prep_insert_by_cat', 'prep_insert_by_author',
+                         'prep_insert_user', 'prep_insert_book_borrow',
+                         'prep_insert_active_loan', 'prep_insert_user_borrow', 'prep_set_loan_id')
+
+    # ---------- Transformation des enregistrements ----------
+
+    def _book_statements(self, record):
+        """Un livre = 3 écritures (books_by_id, books_by_category, books_by_author)"""
+        isbn = (record.get('isbn') or '').strip()
+        if not isbn:
+            return None
+
+        title = record.get('title')
+        author = record.get('author')
+        category = record.get('category')
+        total = _to_int(record.get('total_copies'), 1)
+        available = _to_int(record.get('available_copies'), total)
+
+        statements = [(self.prep_insert_by_id, (
+            isbn, title, author, category, record.get('publisher') or None,
+            _to_int(record.get('publication_year')), total, available,
+            record.get('description') or None
+        ))]
+        if category:
+            statements.append((self.prep_insert_by_cat, (category, isbn, title, author, available)))
+        if author:
+            statements.append((self.prep_insert_by_author, (author, isbn, title)))
+        return statements
+
+    def _user_statements(self, record):
+        email = record.get('email')
+        if not email:
+            return None
+
+        user_id = record.get('user_id')
+        user_id = uuid.UUID(str(user_id)) if user_id else uuid.uuid4()
+        registration = record.get('registration_date')
+        if isinstance(registration, str) and registration:
+            registration = datetime.fromisoformat(registration)
+
+        profile = [(self.prep_insert_user, (
+            user_id, email, record.get('first_name'), record.get('last_name'),
+            registration or datetime.now()
+        ))]
+
+        def claimed(rows):
+            # Adresse réservée par ce membre (ou par une tentative précédente du même import)
+            if _applied(rows) or _claim_owner(rows) == user_id:
+                return profile
+            logger.warning(f"⚠️  Email déjà utilisé, membre ignoré : {email}")
+            return None
+
+        # L'email est réservé d'abord ; le profil n'est écrit que si la réservation aboutit
+        return [(self.prep_claim_email, (normalize_email(email), user_id), claimed)]
+
+    def _book_borrow_statements(self, record):
+        isbn = record.get('isbn')
+        borrow_date = record.get('borrow_date')
+        if not isbn or not borrow_date or not record.get('user_id'):
+            return None
+        if isinstance(borrow_date, str):
+            borrow_date = datetime.fromisoformat(borrow_date)
+        user_id = record['user_id']
+        user_id = user_id if isinstance(user_id, uuid.UUID) else uuid.UUID(str(user_id))
+        return [(self.prep_insert_book_borrow, (
+            isbn, month_bucket(borrow_date), borrow_date, user_id, record.get('user_name')
+        ))]
+
+    def _active_loan_statements(self, record):
+        user_id, isbn, borrow_date = record.get('user_id'), record.get('isbn'), record.get('borrow_date')
+        if not user_id or not isbn or not borrow_date:
+            return None
+        user_id = user_id if isinstance(user_id, uuid.UUID) else uuid.UUID(str(user_id))
+        if isinstance(borrow_date, str):
+            borrow_date = datetime.fromisoformat(borrow_date)
+        loan_id = _loan_id(record, user_id, borrow_date)
+        return [
+            (self.prep_insert_active_loan, (user_id, isbn, loan_id, borrow_date, record.get('book_title'))),
+            (self.prep_set_loan_id, (loan_id, user_id, borrow_date)),
+        ]
+
+    def _borrow_statements(self, record):
+        """Un emprunt d'historique = borrows_by_user + buckets mensuels (+ active_loans s'il est en cours)"""
+        user_id, isbn, borrow_date = record.get('user_id'), record.get('isbn'), record.get('borrow_date')
+        if not user_id or not isbn or not borrow_date:
+            return None
+        user_id = user_id if isinstance(user_id, uuid.UUID) else uuid.UUID(str(user_id))
+        if isinstance(borrow_date, str):
+            borrow_date = datetime.fromisoformat(borrow_date)
+        status = record.get('status') or 'RETURNED'
+        loan_id = _loan_id(record, user_id, borrow_date)
+        title = record.get('book_title')
+
+        statements = [
+            (self.prep_insert_user_borrow, (user_id, borrow_date, isbn, title, status, loan_id)),
+            (self.prep_insert_book_borrow, (isbn, month_bucket(borrow_date), borrow_date, user_id,
+                                            record.get('user_name'))),
+        ]
+        if status == 'ACTIVE':
+            statements.append((self.prep_insert_active_loan, (user_id, isbn, loan_id, borrow_date, title)))
+        return statements
+
+    def load_books(self, records):
+        """Charge un itérable de livres (dict) ; retourne un LoadReport"""
+        report = self._run(records, self._book_statements, "livres")
+        if report.records:
+            # Livres absents de l'instantané de l'index de recherche : reconstruit au prochain démarrage
+            discard_snapshot()
+        return report
+
+    def load_users(self, records):
+        """Charge un itérable d'utilisateurs (dict) ; retourne un LoadReport"""
+        return self._run(records, self._user_statements, "utilisateurs")
+
+    def _user_email_statements(self, record):
+        email, user_id = record.get('email'), record.get('user_id')
+        if not email or not user_id:
+            return None
+        user_id = user_id if isinstance(user_id, uuid.UUID) else uuid.UUID(str(user_id))
+        return [(self.prep_claim_email, (normalize_email(email), user_id))]
+
+    def load_user_emails(self, records):
+        """Alimente users_by_email (user_id, email) ; une adresse déjà réservée n'est pas modifiée"""
+        return self._run(records, self._user_email_statements, "emails")
+
+    def load_active_loans(self, records):
+        """Alimente active_loans à partir d'emprunts en cours (user_id, isbn, borrow_date, book_title)"""
+        return self._run(records, self._active_loan_statements, "emprunts en cours")
+
+    def load_borrows(self, records):
+        """Charge un historique d'emprunts (user_id, user_name, isbn, book_title, borrow_date, status)
+        dans toutes ses tables : borrows_by_user, borrows_by_book_monthly et active_loans"""
+        return self._run(records, self._borrow_statements, "emprunts")
+
+    def load_book_borrows(self, records):
+        """Charge le suivi par livre (isbn, borrow_date, user_id, user_name) dans les buckets mensuels"""
+        return self._run(records, self._book_borrow_statements, "emprunts par livre")
+
+    # ---------- Pipeline asynchrone ----------
+
+    def _run(self, records, to_statements, label):
+        window = threading.Semaphore(self.concurrency)
+        lock = threading.Lock()
+        idle = threading.Condition(lock)
+        retry_queue = deque()
+        # Requêtes déclenchées par le résultat d'une écriture conditionnelle
+        follow_ups = deque()
+        state = {'inflight': 0, 'done': 0, 'failed': 0, 'retries': 0, 'refused': 0, 'follow_ups': 0}
+
+        def on_success(rows, then=None):
+            with lock:
+                state['inflight'] -= 1
+                state['done'] += 1
+                if then is not None:
+                    statements = then(rows)
+                    if statements:
+                        follow_ups.extend(statements)
+                    else:
+                        state['refused'] += 1
+                idle.notify_all()
+            window.release()
+
+        def on_error(exc, statement, params, attempt, then=None):
+            with lock:
+                state['inflight'] -= 1
+                if attempt < self.max_retries:
+                    state['retries'] += 1
+                    retry_queue.append((statement, params, attempt + 1, then))
+                else:
+                    state['failed'] += 1
+                    logger.error(f"❌ Écriture abandonnée après {attempt + 1} tentatives : {exc}")
+                idle.notify_all()
+            window.release()
+
+        def submit(statement, params, then=None, attempt=0):
+            # then(lignes) : requêtes à envoyer ensuite, ou None si l'enregistrement est refusé
+            window.acquire()
+            with lock:
+                state['inflight'] += 1
+            future = self.session.execute_async(statement, params)
+            future.add_callbacks(on_success, on_error, callback_args=(then,),
+                                 errback_args=(statement, params, attempt, then))
+
+        def drain_retries():
+            # Envoyées par le producteur : un callback ne doit pas attendre la fenêtre
+            while follow_ups:
+                state['follow_ups'] += 1
+                submit(*follow_ups.popleft())
+            while retry_queue:
+                statement, params, attempt, then = retry_queue.popleft()
+                # Backoff exponentiel : on ralentit le producteur quand le cluster sature
+                time.sleep(self.retry_backoff * (2 ** (attempt - 1)))
+                submit(statement, params, then, attempt)
+
+        start = time.perf_counter()
+        count = rejected = statements = 0
+        logger.info(f"🚚 Chargement des {label} (fenêtre de {self.concurrency} requêtes en vol)...")
+
+        for record in records:
+            drain_retries()
+            reason = invalid_record(record)
+            if reason is not None:
+                logger.warning(f"⚠️  Enregistrement ignoré : {reason}")
+                rejected += 1
+                continue
+            try:
+                batch = to_statements(record)
+            except (ValueError, TypeError) as e:
+                # Valeur mal formée (nombre, UUID, date) : la ligne est écartée, le chargement continue
+                logger.warning(f"⚠️  Enregistrement {_record_key(record)} ignoré : {e}")
+                rejected += 1
+                continue
+            if not batch:
+                rejected += 1
+                continue
+            for item in batch:
+                submit(*item)
+                statements += 1
+            count += 1
+            if count % self.report_every == 0:
+                self._report(label, count, start)
+
+        # Attente de la fin des requêtes en vol (et de leurs éventuels rejeux)
+        while True:
+            drain_retries()
+            with lock:
+                if state['inflight'] == 0 and not retry_queue and not follow_ups:
+                    break
+                idle.wait(0.1)
+
+        elapsed = time.perf_counter() - start
+        # Refusés par une écriture conditionnelle (ex : email déjà utilisé)
+        count -= state['refused']
+        rejected += state['refused']
+        statements += state['follow_ups']
+        self._report(label, count, start)
+        if rejected:
+            logger.warning(f"⚠️  {rejected} enregistrements ignorés (clé manquante, valeur invalide ou refusés)")
+        logger.success(f"✅ {count} {label} chargés en {elapsed:.1f}s "
+                       f"({state['failed']} écritures en échec, {state['retries']} rejeux)")
+        return LoadReport(count, statements, rejected, state['failed'], state['retries'], elapsed)
+
+    def _report(self, label, count, start):
+        elapsed = time.perf_counter() - start
+        rate = count / elapsed if elapsed > 0 else 0.0
+        logger.info(f"  📦 {count} {label} ({rate:,.0f} lignes/s)")
@@ -0,0 +1,38 @@
+import base64
+from collections import namedtuple
+from models.columnar import ColumnBatch, columnar_profile
+
+# rows : lignes de la page courante ; cursor : jeton opaque de la page suivante (None = fin)
+Page = namedtuple('Page', ['rows', 'cursor'])
+
+DEFAULT_PAGE_SIZE = 50
+
+def encode_cursor(paging_state):
+    """paging_state du driver -> chaîne transmissible (URL, session Streamlit)"""
+    if not paging_state:
+        return None
+    return base64.urlsafe_b64encode(paging_state).decode('ascii')
+
+def decode_cursor(cursor):
+    if not cursor:
+        return None
+    return base64.urlsafe_b64decode(cursor.encode('ascii'))
+
+def fetch_page(session, prepared, params=(), page_size=DEFAULT_PAGE_SIZE, cursor=None, columnar=False):
+    """Lit une seule page d'une requête préparée (fetch_size + paging_state).
+
+    Seules `page_size` lignes sont transférées ; le curseur retourné permet de
+    reprendre la lecture là où elle s'est arrêtée, même dans un autre processus.
+    columnar=True : les lignes de la page arrivent en colonnes (models.columnar.ColumnBatch).
+    """
+    bound = prepared.bind(params)
+    bound.fetch_size = page_size
+    if columnar:
+        result = session.execute(bound, paging_state=decode_cursor(cursor),
+                                 execution_profile=columnar_profile(session))
+        rows = result.current_rows or ColumnBatch.empty(result.column_names or ())
+    else:
+        result = session.execute(bound, paging_state=decode_cursor(cursor))
+        rows = list(result.current_rows)
+    next_cursor = encode_cursor(result.paging_state) if result.has_more_pages else None
+    return Page(rows, next_cursor)
@@ -0,0 +1,222 @@
+import os
+import json
+import time
+from collections import namedtuple
+from datetime import datetime
+from loguru import logger
+from models.statements import LazyStatements
+from models.scan import TableScanner, RateLimiter
+
+# Écart constaté : kind = missing (ligne absente) | stale (valeurs différentes)
+Drift = namedtuple('Drift', ['isbn', 'table', 'kind', 'fields', 'expected', 'actual'])
+
+ReconcileReport = namedtuple('ReconcileReport', [
+    'started_at', 'scanned', 'checked', 'drifts', 'by_table', 'repaired', 'failed', 'elapsed'])
+
+# Colonnes recopiées de books_by_id dans chaque table dénormalisée
+CATEGORY_FIELDS = ('title', 'author', 'available_copies')
+AUTHOR_FIELDS = ('title',)
+
+def _micros(moment):
+    return int(moment.timestamp() * 1_000_000)
+
+def load_watermark(path):
+    """Début de la dernière réconciliation terminée (mode incrémental), None si aucune"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return datetime.fromisoformat(json.load(f)['last_run'])
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning(f"⚠️  État de réconciliation {path} illisible : {e}")
+        return None
+
+def save_watermark(path, moment):
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump({'last_run': moment.isoformat()}, f)
+    os.replace(tmp, path)
+
+class Reconciler(LazyStatements):
+    """Contrôle (et réparation) des copies de books_by_id dans books_by_category / books_by_author.
+
+    books_by_id est parcouru par plages de tokens (models/scan.py) ; par lot
+    de `batch_size` livres, chaque partition dénormalisée concernée est lue
+    une seule fois (`isbn IN ?`), ces lectures partant en parallèle.
+
+    Les réparations sont des INSERT idempotents, au débit plafonné
+    (`write_rate` écritures/s). Une ligne périmée est réécrite avec le
+    WRITETIME de la source : si elle a été réécrite entre-temps (ajout d'un
+    livre), la valeur la plus récente l'emporte et la réparation est sans
+    effet. Une ligne absente est recréée avec l'horodatage courant.
+
+    `since` limite le contrôle aux livres modifiés depuis cette date
+    (WRITETIME de books_by_id) : les partitions dénormalisées des autres
+    livres ne sont pas lues.
+    """
+
+    def __init__(self, session, batch_size=200, concurrency=32, write_rate=None, scan_options=None):
+        self.session = session
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.limiter = RateLimiter(write_rate)
+        self.scan_options = scan_options or {}
+        self._prepare_queries()
+
+    def _prepare_queries(self):
+        # Une lecture par partition et par lot
+        self._declare(prep_category_rows="""
+            SELECT isbn, title, author, available_copies FROM books_by_category WHERE category = ? AND isbn IN ?
+        """)
+        self._declare(prep_author_rows="""
+            SELECT isbn, title FROM books_by_author WHERE author = ? AND isbn IN ?
+        """)
+
+        # Réparations horodatées avec l'écriture source
+        self._declare(prep_repair_category="""
+            INSERT INTO books_by_category (category, isbn, title, author, available_copies)
+            VALUES (?, ?, ?, ?, ?) USING TIMESTAMP ?
+        """)
+        self._declare(prep_repair_author="""
+            INSERT INTO books_by_author (author, isbn, title) VALUES (?, ?, ?) USING TIMESTAMP ?
+        """)
+
+        self._idempotent('prep_category_rows', 'prep_author_rows',
+                         'prep_repair_category', 'prep_repair_author')
+
+    # ---------- Lecture ----------
+
+    def _source(self):
+        columns = ("isbn, title, author, category, available_copies, "
+                   "WRITETIME(title) AS title_written, WRITETIME(available_copies) AS stock_written")
+        return TableScanner(self.session, 'books_by_id', columns, 'isbn', **self.scan_options)
+
+    def _read_partitions(self, requests):
+        """{(statement, clé): [isbn]} -> {(statement, clé): {isbn: ligne}}, lectures en parallèle"""
+        found = {}
+        items = list(requests.items())
+        for start in range(0, len(items), self.concurrency):
+            window = items[start:start + self.concurrency]
+            futures = [self.session.execute_async(statement, (key, isbns))
+                       for (statement, key), isbns in window]
+            for ((statement, key), _), future in zip(window, futures):
+                found[(statement, key)] = {row.isbn: row for row in future.result()}
+        return found
+
+    def _compare(self, isbn, table, expected, row, fields):
+        if row is None:
+            return Drift(isbn, table, 'missing', fields, expected, None)
+        actual = {f: getattr(row, f) for f in fields}
+        stale = tuple(f for f in fields if actual[f] != expected[f])
+        if stale:
+            return Drift(isbn, table, 'stale', stale, expected, actual)
+        return None
+
+    def check_batch(self, books):
+        """Écarts d'un lot de lignes books_by_id"""
+        requests = {}
+        for book in books:
+            if book.category:
+                requests.setdefault((self.prep_category_rows, book.category), []).append(book.isbn)
+            if book.author:
+                requests.setdefault((self.prep_author_rows, book.author), []).append(book.isbn)
+        found = self._read_partitions(requests)
+
+        drifts = []
+        for book in books:
+            if book.category:
+                expected = {f: getattr(book, f) for f in CATEGORY_FIELDS}
+                row = found[(self.prep_category_rows, book.category)].get(book.isbn)
+                drifts.append(self._compare(book.isbn, 'books_by_category', expected, row, CATEGORY_FIELDS))
+            if book.author:
+                row = found[(self.prep_author_rows, book.author)].get(book.isbn)
+                drifts.append(self._compare(book.isbn, 'books_by_author', {'title': book.title}, row, AUTHOR_FIELDS))
+        return [d for d in drifts if d is not None]
+
+    # ---------- Réparation ----------
+
+    def repair(self, books, drifts):
+        """Réécrit les lignes en écart ; retourne (réparées, en échec)"""
+        by_isbn = {book.isbn: book for book in books}
+        writes = []
+        for drift in drifts:
+            book = by_isbn[drift.isbn]
+            if drift.kind == 'missing':
+                # Ligne supprimée : sa pierre tombale masquerait une écriture horodatée plus tôt
+                written = _micros(datetime.now())
+            else:
+                written = max(book.title_written or 0, book.stock_written or 0) or _micros(datetime.now())
+            if drift.table == 'books_by_category':
+                writes.append((self.prep_repair_category, (book.category, book.isbn, book.title,
+                                                           book.author, book.available_copies, written)))
+            else:
+                writes.append((self.prep_repair_author, (book.author, book.isbn, book.title, written)))
+
+        repaired = failed = 0
+        for start in range(0, len(writes), self.concurrency):
+            window = writes[start:start + self.concurrency]
+            futures = []
+            for statement, params in window:
+                self.limiter.acquire()
+                futures.append(self.session.execute_async(statement, params))
+            for (statement, params), future in zip(window, futures):
+                try:
+                    future.result()
+                    repaired += 1
+                except Exception as e:
+                    failed += 1
+                    logger.error(f"❌ Réparation {params[1]} impossible : {e}")
+        return repaired, failed
+
+    # ---------- Orchestration ----------
+
+    def run(self, repair=False, since=None, report_path=None):
+        """Parcourt books_by_id, compare par lots, répare si demandé.
+
+        report_path : fichier JSONL recevant un écart par ligne (rapport de dérive).
+        """
+        started_at = datetime.now()
+        start = time.perf_counter()
+        threshold = _micros(since) if since else None
+        scanned = checked = repaired = failed = drifts = 0
+        by_table = {}
+        report = open(report_path, 'w', encoding='utf-8') if report_path else None
+
+        def flush(batch):
+            nonlocal checked, repaired, failed, drifts
+            found = self.check_batch(batch)
+            checked += len(batch)
+            drifts += len(found)
+            for drift in found:
+                key = f"{drift.table}.{drift.kind}"
+                by_table[key] = by_table.get(key, 0) + 1
+                if report is not None:
+                    report.write(json.dumps(drift._asdict(), ensure_ascii=False, default=str) + "\n")
+            if repair and found:
+                done, lost = self.repair(batch, found)
+                repaired += done
+                failed += lost
+
+        try:
+            batch = []
+            for book in self._source().scan():
+                scanned += 1
+                # Mode incrémental : livre inchangé depuis la dernière réconciliation
+                if threshold is not None and max(book.title_written or 0, book.stock_written or 0) < threshold:
+                    continue
+                batch.append(book)
+                if len(batch) >= self.batch_size:
+                    flush(batch)
+                    batch = []
+            if batch:
+                flush(batch)
+        finally:
+            if report is not None:
+                report.close()
+
+        result = ReconcileReport(started_at, scanned, checked, drifts, by_table, repaired, failed,
+                                 time.perf_counter() - start)
+        icon = "✅" if not drifts or (repair and not failed and repaired == drifts) else "⚠️ "
+        logger.info(f"{icon} Réconciliation : {checked}/{scanned} livres contrôlés, {drifts} écarts, "
+                    f"{repaired} réparés, {failed} en échec en {result.elapsed:.1f}s")
+        return result
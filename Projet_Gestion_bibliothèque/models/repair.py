@@ -0,0 +1,87 @@
+import json
+import os
+import threading
+from datetime import datetime
+from uuid import UUID
+from loguru import logger
+
+def _encode(value):
+    if isinstance(value, UUID):
+        return {'$uuid': str(value)}
+    if isinstance(value, datetime):
+        return {'$ts': value.isoformat()}
+    return value
+
+def _decode(value):
+    if isinstance(value, dict):
+        if '$uuid' in value:
+            return UUID(value['$uuid'])
+        if '$ts' in value:
+            return datetime.fromisoformat(value['$ts'])
+    return value
+
+class FanoutJournal:
+    """Journal des écritures dénormalisées qui n'ont pas pu être appliquées.
+
+    En mode d'écriture parallèle, une table peut être mise à jour alors
+    qu'une autre a échoué. L'écriture manquante est notée ici (en mémoire,
+    et en JSONL si `path` est fourni) pour être rejouée plus tard : les
+    requêtes étant idempotentes, un rejeu en double est sans danger.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries = []
+        if path and os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self._entries = [json.loads(line) for line in f if line.strip()]
+
+    def record(self, operation, statement, params, error):
+        entry = {
+            'operation': operation,
+            'statement': statement,
+            'params': [_encode(v) for v in params],
+            'error': str(error),
+            'recorded_at': datetime.now().isoformat(timespec='seconds'),
+        }
+        with self._lock:
+            self._entries.append(entry)
+            if self.path:
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(entry) + '\n')
+        logger.warning(f"⚠️  Écriture {statement} ({operation}) à réparer : {error}")
+
+    def pending(self):
+        with self._lock:
+            return list(self._entries)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def replay(self, execute):
+        """Rejoue les écritures en attente via execute(statement, params).
+
+        Les entrées rejouées avec succès sont retirées du journal ;
+        retourne (réparées, encore en échec).
+        """
+        with self._lock:
+            entries, self._entries = self._entries, []
+
+        remaining = []
+        for entry in entries:
+            try:
+                execute(entry['statement'], [_decode(v) for v in entry['params']])
+            except Exception as e:
+                entry['error'] = str(e)
+                remaining.append(entry)
+
+        with self._lock:
+            self._entries = remaining + self._entries
+            if self.path:
+                with open(self.path, 'w', encoding='utf-8') as f:
+                    for entry in self._entries:
+                        f.write(json.dumps(entry) + '\n')
+        repaired = len(entries) - len(remaining)
+        logger.info(f"🔧 {repaired} écritures réparées, {len(remaining)} encore en attente")
+        return repaired, len(remaining)
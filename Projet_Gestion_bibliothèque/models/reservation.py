@@ -0,0 +1,174 @@
+import uuid
+from datetime import datetime, timedelta
+from loguru import logger
+from models.statements import LazyStatements
+
+class ReservationRepository(LazyStatements):
+    """File d'attente des réservations d'un titre épuisé.
+
+    reservations (isbn, reservation_date) est la file : la tête est lue par
+    une lecture `LIMIT 1` sur la clé de clustering, sans parcours.
+    reservations_by_user (user_id, isbn) garantit une seule réservation par
+    membre et par titre, et donne la date qui situe le membre dans la file.
+
+    Les écritures dans la file sont des transactions légères : deux membres
+    réservant à la même milliseconde ne s'écrasent pas, et deux retours
+    simultanés ne peuvent pas attribuer la même réservation.
+    """
+
+    def __init__(self, session, max_attempts=8):
+        self.session = session
+        self.max_attempts = max_attempts
+        self._prepare_queries()
+
+    def _prepare_queries(self):
+        # Une réservation par membre et par titre
+        self._declare(prep_claim="""
+            INSERT INTO reservations_by_user (user_id, isbn, reservation_date) VALUES (?, ?, ?) IF NOT EXISTS
+        """)
+        self._declare(prep_release_claim="""
+            DELETE FROM reservations_by_user WHERE user_id = ? AND isbn = ?
+        """)
+        self._declare(prep_move_claim="""
+            UPDATE reservations_by_user SET reservation_date = ? WHERE user_id = ? AND isbn = ?
+        """)
+        self._declare(prep_get_claim="""
+            SELECT reservation_date FROM reservations_by_user WHERE user_id = ? AND isbn = ?
+        """)
+        self._declare(prep_get_user_reservations="""
+            SELECT isbn, reservation_date FROM reservations_by_user WHERE user_id = ?
+        """)
+
+        # File d'attente par titre
+        self._declare(prep_enqueue="""
+            INSERT INTO reservations (isbn, reservation_date, user_id, user_name) VALUES (?, ?, ?, ?) IF NOT EXISTS
+        """)
+        self._declare(prep_head="""
+            SELECT reservation_date, user_id, user_name FROM reservations WHERE isbn = ? LIMIT 1
+        """)
+        self._declare(prep_queue="""
+            SELECT reservation_date, user_id, user_name FROM reservations WHERE isbn = ? LIMIT ?
+        """)
+        self._declare(prep_count_ahead="""
+            SELECT COUNT(*) FROM reservations WHERE isbn = ? AND reservation_date < ?
+        """)
+        # Attribution et annulation : toutes les écritures de la file sont des LWT
+        self._declare(prep_pop="""
+            DELETE FROM reservations WHERE isbn = ? AND reservation_date = ? IF EXISTS
+        """)
+
+        self._idempotent('prep_release_claim', 'prep_move_claim')
+
+    def reserve(self, user_id, user_name, isbn, reservation_date=None):
+        """Ajoute le membre en fin de file ; retourne la date de réservation, ou None"""
+        try:
+            u_id = uuid.UUID(user_id) if isinstance(user_id, str) else user_id
+            date = reservation_date or datetime.now()
+            date = first = date.replace(microsecond=date.microsecond // 1000 * 1000)
+
+            if not self.session.execute(self.prep_claim, (u_id, isbn, date)).was_applied:
+                logger.error(f"❌ Réservation déjà en cours de l'ISBN {isbn} pour {u_id}")
+                return None
+            try:
+                # Même milliseconde qu'un autre membre : on se place juste derrière lui
+                for _ in range(self.max_attempts):
+                    if self.session.execute(self.prep_enqueue, (isbn, date, u_id, user_name)).was_applied:
+                        break
+                    date += timedelta(milliseconds=1)
+                else:
+                    raise RuntimeError(f"file de l'ISBN {isbn} saturée")
+                if date != first:
+                    self.session.execute(self.prep_move_claim, (date, u_id, isbn))
+            except Exception:
+                self.session.execute(self.prep_release_claim, (u_id, isbn))
+                raise
+            logger.success(f"✅ Réservation enregistrée : ISBN {isbn} pour {user_name}")
+            return date
+        except Exception as e:
+            logger.error(f"❌ Erreur réservation {isbn}: {e}")
+            return None
+
+    def cancel(self, user_id, isbn):
+        """Retire le membre de la file.
+
+        Même suppression conditionnelle que pop() : si un retour vient de
+        servir cette réservation, l'annulation n'est pas appliquée et la
+        réservation est libérée par pop().
+        """
+        try:
+            u_id = uuid.UUID(user_id) if isinstance(user_id, str) else user_id
+            row = self.session.execute(self.prep_get_claim, (u_id, isbn)).one()
+            if row is None:
+                return False
+            if not self.session.execute(self.prep_pop, (isbn, row.reservation_date)).was_applied:
+                logger.error(f"❌ Réservation de l'ISBN {isbn} déjà servie ou en cours pour {u_id}")
+                return False
+            self.session.execute(self.prep_release_claim, (u_id, isbn))
+            logger.success(f"✅ Réservation annulée : ISBN {isbn}")
+            return True
+        except Exception as e:
+            logger.error(f"❌ Erreur annulation réservation {isbn}: {e}")
+            return False
+
+    def head(self, isbn):
+        """Prochain membre servi (réservation la plus ancienne) ou None"""
+        try:
+            return self.session.execute(self.prep_head, [isbn]).one()
+        except Exception as e:
+            logger.error(f"❌ Erreur lecture file {isbn}: {e}")
+            return None
+
+    def get_queue(self, isbn, limit=50):
+        """Réservations d'un titre, dans l'ordre de service"""
+        try:
+            return list(self.session.execute(self.prep_queue, (isbn, limit)))
+        except Exception as e:
+            logger.error(f"❌ Erreur lecture file {isbn}: {e}")
+            return []
+
+    def position(self, user_id, isbn):
+        """Rang du membre dans la file (1 = prochain servi), None s'il n'a pas réservé.
+
+        Seules les réservations placées devant lui sont comptées (tranche
+        de la partition du titre), pas la file entière ni la table.
+        """
+        try:
+            u_id = uuid.UUID(user_id) if isinstance(user_id, str) else user_id
+            row = self.session.execute(self.prep_get_claim, (u_id, isbn)).one()
+            if row is None:
+                return None
+            ahead = self.session.execute(self.prep_count_ahead, (isbn, row.reservation_date)).one()
+            return ahead[0] + 1
+        except Exception as e:
+            logger.error(f"❌ Erreur position dans la file {isbn}: {e}")
+            return None
+
+    def get_user_reservations(self, user_id):
+        try:
+            u_id = uuid.UUID(user_id) if isinstance(user_id, str) else user_id
+            return list(self.session.execute(self.prep_get_user_reservations, [u_id]))
+        except Exception as e:
+            logger.error(f"❌ Erreur lecture réservations pour {user_id}: {e}")
+            return []
+
+    def pop(self, isbn):
+        """Retire et retourne la tête de file (None si la file est vide).
+
+        Suppression conditionnelle (IF EXISTS) : si un autre retour vient
+        de servir ce membre, on passe à la réservation suivante.
+        Les erreurs sont propagées à l'appelant.
+        """
+        for _ in range(self.max_attempts):
+            row = self.session.execute(self.prep_head, [isbn]).one()
+            if row is None:
+                return None
+            if self.session.execute(self.prep_pop, (isbn, row.reservation_date)).was_applied:
+                self.session.execute(self.prep_release_claim, (row.user_id, isbn))
+                return row
+        logger.warning(f"⚠️  Contention sur la file de l'ISBN {isbn}")
+        return None
+
+    def restore(self, isbn, row):
+        """Remet une réservation retirée par pop() à sa place d'origine"""
+        self.session.execute(self.prep_claim, (row.user_id, isbn, row.reservation_date))
+        self.session.execute(self.prep_enqueue, (isbn, row.reservation_date, row.user_id, row.user_name))
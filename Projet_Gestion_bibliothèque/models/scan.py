@@ -0,0 +1,331 @@
+import os
+import json
+import time
+import queue
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from loguru import logger
+from models.paging import encode_cursor, decode_cursor
+from models.statements import statements_for
+
+# Anneau Murmur3Partitioner : tokens de -2^63 (exclu) à 2^63 - 1
+MIN_TOKEN = -2 ** 63
+MAX_TOKEN = 2 ** 63 - 1
+
+# Plage (start, end] de l'anneau et répliques qui la possèdent
+TokenRange = namedtuple('TokenRange', ['start', 'end', 'replicas'])
+
+def _value(token):
+    return getattr(token, 'value', token)
+
+def split_ring(session, keyspace=None, splits=None):
+    """Découpe l'anneau en plages (start, end].
+
+    Avec les métadonnées du driver, chaque plage entre deux tokens du ring
+    est associée à ses répliques puis subdivisée pour obtenir au moins
+    `splits` plages. Sans métadonnées (session en mémoire, token_map
+    désactivée), l'anneau est découpé en `splits` plages égales.
+    """
+    splits = splits or 16
+    keyspace = keyspace or session.keyspace
+    token_map = getattr(session.cluster.metadata, 'token_map', None)
+    ring = sorted(token_map.ring, key=_value) if token_map is not None and token_map.ring else []
+
+    if not ring:
+        bounds = [(MIN_TOKEN, MAX_TOKEN, ())]
+    else:
+        bounds = []
+        for previous, token in zip([ring[-1]] + ring[:-1], ring):
+            replicas = tuple(token_map.get_replicas(keyspace, token))
+            start, end = _value(previous), _value(token)
+            if start < end:
+                bounds.append((start, end, replicas))
+            else:
+                # Plage qui fait le tour de l'anneau : coupée en deux
+                bounds.append((start, MAX_TOKEN, replicas))
+                bounds.append((MIN_TOKEN, end, replicas))
+
+    per_range = max(1, -(-splits // len(bounds)))
+    ranges = []
+    for start, end, replicas in bounds:
+        step = (end - start) // per_range
+        for i in range(per_range):
+            sub_end = end if i == per_range - 1 else start + step * (i + 1)
+            sub_start = start + step * i
+            if sub_start < sub_end:
+                ranges.append(TokenRange(sub_start, sub_end, replicas))
+    return ranges
+
+class RateLimiter:
+    """Seau à jetons : au plus `rate` unités par seconde (None = illimité)"""
+
+    def __init__(self, rate=None, burst=None):
+        self.rate = rate
+        self.capacity = burst or rate or 0
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, amount=1):
+        if not self.rate:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                # Une demande plus grosse que le seau passe dès qu'il est plein
+                if self._tokens >= min(amount, self.capacity):
+                    self._tokens -= amount
+                    return
+                wait = (min(amount, self.capacity) - self._tokens) / self.rate
+            time.sleep(wait)
+
+class ScanCheckpoint:
+    """Progression d'un parcours, plage par plage, pour reprendre après un arrêt.
+
+    Une plage terminée n'est plus relue ; une plage en cours reprend à la
+    page suivant la dernière page entièrement consommée (paging_state).
+    Les lignes de la page en cours lors de l'arrêt peuvent être relues
+    (au moins une fois).
+    """
+
+    def __init__(self, path=None, interval=1.0):
+        self.path = path
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._state = {'ranges': None, 'done': [], 'paging': {}, 'meta': {}}
+        self._saved_at = 0.0
+        if path and os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self._state = json.load(f)
+
+    @staticmethod
+    def key(token_range):
+        return f"{token_range.start}:{token_range.end}"
+
+    def attach(self, ranges):
+        """Associe le point de reprise au découpage ; un découpage différent repart de zéro"""
+        keys = [self.key(r) for r in ranges]
+        with self._lock:
+            if self._state['ranges'] not in (None, keys):
+                logger.warning("⚠️  Découpage de l'anneau modifié : point de reprise ignoré")
+                self._state = {'ranges': None, 'done': [], 'paging': {}, 'meta': {}}
+            self._state['ranges'] = keys
+            self._state.setdefault('meta', {})
+
+    def is_done(self, token_range):
+        with self._lock:
+            return self.key(token_range) in self._state['done']
+
+    def paging_state(self, token_range):
+        with self._lock:
+            return decode_cursor(self._state['paging'].get(self.key(token_range)))
+
+    def advance(self, token_range, paging_state, save=True):
+        """La page est consommée : reprise à paging_state, ou plage terminée si None"""
+        key = self.key(token_range)
+        with self._lock:
+            if paging_state is None:
+                self._state['paging'].pop(key, None)
+                if key not in self._state['done']:
+                    self._state['done'].append(key)
+            else:
+                self._state['paging'][key] = encode_cursor(paging_state)
+        if save:
+            self.save(force=paging_state is None)
+
+    def get_meta(self, key, default=None):
+        """Données de l'appelant enregistrées avec la progression (ex : position dans un fichier)"""
+        with self._lock:
+            return self._state.get('meta', {}).get(key, default)
+
+    def set_meta(self, key, value):
+        with self._lock:
+            self._state.setdefault('meta', {})[key] = value
+
+    def save(self, force=False):
+        if not self.path:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if not force and now - self._saved_at < self.interval:
+                return
+            self._saved_at = now
+            tmp = f"{self.path}.tmp"
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(self._state, f)
+            os.replace(tmp, self.path)
+
+    def progress(self):
+        with self._lock:
+            return len(self._state['done']), len(self._state['ranges'] or [])
+
+    def clear(self):
+        """Parcours terminé : le fichier de reprise est supprimé"""
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+_END = object()
+
+class TableScanner:
+    """Parcours complet d'une table, réparti sur les plages de tokens.
+
+    Chaque plage est lue par une requête préparée
+        SELECT ... FROM table WHERE token(pk) > ? AND token(pk) <= ?
+    envoyée à l'une de ses répliques : les nœuds travaillent en parallèle et
+    une erreur ne fait rejouer qu'une page de la plage concernée. Les lignes
+    sont transmises au fil de l'eau par une file bornée (`buffer_pages`
+    pages en mémoire au plus) ; `rate` limite le débit en lignes/s pour
+    préserver le trafic en ligne.
+    """
+
+    def __init__(self, session, table, columns, partition_key, splits=None, concurrency=6,
+                 page_size=1000, rate=None, checkpoint=None, max_retries=3, buffer_pages=None):
+        self.session = session
+        self.table = table
+        self.columns = columns if isinstance(columns, str) else ', '.join(columns)
+        self.partition_key = partition_key if isinstance(partition_key, str) else ', '.join(partition_key)
+        self.splits = splits or concurrency * 4
+        self.concurrency = concurrency
+        self.page_size = page_size
+        self.limiter = RateLimiter(rate, burst=max(page_size, rate or 0))
+        self.checkpoint = checkpoint
+        self.max_retries = max_retries
+        self.buffer_pages = buffer_pages or concurrency * 2
+        self._metrics = {'ranges': 0, 'pages': 0, 'rows': 0, 'retries': 0}
+        self._lock = threading.Lock()
+
+    def _statement(self):
+        return statements_for(self.session).get(
+            f"SELECT {self.columns} FROM {self.table} "
+            f"WHERE token({self.partition_key}) > ? AND token({self.partition_key}) <= ?",
+            idempotent=True)
+
+    def _count(self, **increments):
+        with self._lock:
+            for name, value in increments.items():
+                self._metrics[name] += value
+
+    def _fetch(self, statement, token_range, paging_state, attempt):
+        bound = statement.bind((token_range.start, token_range.end))
+        bound.fetch_size = self.page_size
+        # Essais successifs sur chaque réplique de la plage, puis choix laissé au driver
+        host = token_range.replicas[attempt] if attempt < len(token_range.replicas) else None
+        return self.session.execute_async(bound, paging_state=paging_state, host=host).result()
+
+    @staticmethod
+    def _put(output, item, closed):
+        """Dépose dans la file bornée ; abandonne si le consommateur est parti"""
+        while not closed.is_set():
+            try:
+                output.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _scan_range(self, statement, token_range, output, closed, errors):
+        paging_state = self.checkpoint.paging_state(token_range) if self.checkpoint else None
+        while not closed.is_set() and not errors:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    result = self._fetch(statement, token_range, paging_state, attempt)
+                    break
+                except Exception as e:
+                    if attempt == self.max_retries:
+                        raise
+                    self._count(retries=1)
+                    logger.warning(f"⚠️  Plage {ScanCheckpoint.key(token_range)} de {self.table} : {e}, nouvel essai")
+                    time.sleep(0.1 * 2 ** attempt)
+            rows = list(result.current_rows)
+            paging_state = result.paging_state if result.has_more_pages else None
+            self.limiter.acquire(len(rows))
+            self._count(pages=1, rows=len(rows))
+            if not self._put(output, (token_range, rows, paging_state), closed) or paging_state is None:
+                break
+
+    def pages(self):
+        """Générateur des pages : (plage, lignes, paging_state suivant, None = plage terminée).
+
+        Le point de reprise ne sert ici qu'à savoir où reprendre chaque plage :
+        l'appelant le fait avancer (advance) quand il a traité la page.
+        """
+        ranges = split_ring(self.session, splits=self.splits)
+        if self.checkpoint is not None:
+            self.checkpoint.attach(ranges)
+            ranges = [r for r in ranges if not self.checkpoint.is_done(r)]
+        statement = self._statement()
+        output = queue.Queue(maxsize=self.buffer_pages)
+        closed = threading.Event()
+        errors = []
+        start = time.perf_counter()
+
+        def worker(token_range):
+            try:
+                self._scan_range(statement, token_range, output, closed, errors)
+                self._count(ranges=1)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                self._put(output, (token_range, _END, None), closed)
+
+        pool = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix=f"scan-{self.table}")
+        try:
+            for token_range in ranges:
+                pool.submit(worker, token_range)
+            pending = len(ranges)
+            while pending:
+                token_range, rows, paging_state = output.get()
+                if rows is _END:
+                    pending -= 1
+                    continue
+                yield token_range, rows, paging_state
+            if errors:
+                raise errors[0]
+            logger.info(f"📦 {self.table} parcourue : {self.stats()['rows']} lignes, "
+                        f"{len(ranges)} plages en {time.perf_counter() - start:.2f}s")
+        finally:
+            # Consommateur arrêté (break, erreur) : les workers s'arrêtent à la page suivante
+            closed.set()
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def scan(self):
+        """Générateur des lignes de la table (ordre non garanti).
+
+        Avec un point de reprise, une page n'est validée qu'une fois la page
+        suivante entièrement remise au consommateur : ce qu'il fait encore
+        des dernières lignes (écritures asynchrones en vol) est relu après
+        un arrêt brutal plutôt que perdu.
+        """
+        consumed = None
+        try:
+            for token_range, rows, paging_state in self.pages():
+                yield from rows
+                if self.checkpoint is not None:
+                    if consumed is not None:
+                        self.checkpoint.advance(*consumed)
+                    consumed = (token_range, paging_state)
+            if consumed is not None:
+                self.checkpoint.advance(*consumed)
+        finally:
+            if self.checkpoint is not None:
+                self.checkpoint.save(force=True)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._metrics)
+
+def add_scan_arguments(parser):
+    """Options communes des scripts qui parcourent une table entière"""
+    parser.add_argument('--splits', type=int, default=None, help="Nombre de plages de tokens (défaut : 4 par worker)")
+    parser.add_argument('--scan-concurrency', type=int, default=6, help="Plages lues en parallèle")
+    parser.add_argument('--rate', type=float, default=None, help="Lignes lues par seconde au plus (défaut : illimité)")
+    parser.add_argument('--checkpoint', help="Fichier de reprise : un parcours interrompu repart où il s'est arrêté")
+
+def scanner_from_args(session, args, table, columns, partition_key):
+    checkpoint = ScanCheckpoint(args.checkpoint) if args.checkpoint else None
+    return TableScanner(session, table, columns, partition_key, splits=args.splits,
+                        concurrency=args.scan_concurrency, page_size=args.page_size,
+                        rate=args.rate, checkpoint=checkpoint)
@@ -0,0 +1,278 @@
+import os
+import re
+import json
+import time
+import bisect
+import threading
+import unicodedata
+from collections import namedtuple
+from datetime import datetime
+from loguru import logger
+from models.scan import TableScanner
+
+SearchHit = namedtuple('SearchHit', ['isbn', 'title', 'author', 'score'])
+
+SNAPSHOT_VERSION = 2
+# Poids d'un mot selon le champ où il apparaît
+TITLE_WEIGHT = 2.0
+AUTHOR_WEIGHT = 1.0
+# Un mot qui ne fait que commencer par le terme cherché compte moitié moins
+PREFIX_FACTOR = 0.5
+
+# Mots vides du catalogue (français / anglais), ignorés à l'indexation
+STOP_WORDS = frozenset("""
+    a au aux d de des du en et l la le les un une sur pour par dans
+    the of and an to in on
+""".split())
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+# Ligatures que la décomposition Unicode ne sépare pas
+_LIGATURES = str.maketrans({'œ': 'oe', 'æ': 'ae', 'ß': 'ss'})
+
+def snapshot_path():
+    """Fichier d'instantané de l'index (LIBRARY_SEARCH_INDEX) ; None = index en mémoire seulement"""
+    return os.environ.get('LIBRARY_SEARCH_INDEX') or None
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+def discard_snapshot(path=None):
+    """Supprime l'instantané (périmé par des ajouts hors index) : il sera reconstruit au prochain démarrage"""
+    path = path or snapshot_path()
+    if not path:
+        return False
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        return False
+    logger.info(f"🔧 Instantané de l'index de recherche périmé, supprimé : {path}")
+    return True
+
+def fold(text):
+    """Minuscules sans accents : « Étranger » -> « etranger »"""
+    text = (text or '').lower()
+    if text.isascii():
+        return text
+    decomposed = unicodedata.normalize('NFKD', text.translate(_LIGATURES))
+    return ''.join(c for c in decomposed if not unicodedata.combining(c))
+
+def tokenize(text):
+    return _TOKEN.findall(fold(text))
+
+class SearchIndex:
+    """Index inversé en mémoire des titres et auteurs du catalogue.
+
+    Chaque mot (sans accents, hors mots vides) pointe vers les ISBN qui le
+    contiennent, avec un poids par champ. Le vocabulaire est tenu trié : une
+    recherche par préfixe (« méta » trouve « Métamorphose ») est une
+    dichotomie, sans parcours du catalogue. Tous les mots de la requête
+    doivent être trouvés ; les livres sont classés par score décroissant.
+
+    L'index se construit par un parcours parallèle de books_by_id, suit les
+    ajouts via add() et se sauvegarde sur disque (save / load) pour éviter
+    de reparcourir la table à chaque redémarrage. Les ajouts postérieurs à
+    l'instantané sont écrits par flush() (LibraryServices.close).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._docs = {}
+        self._postings = {}
+        self._terms = []
+        self.built_at = None
+        # Instantané dont l'index est issu (chemin, date de modification) et ajouts non sauvegardés
+        self.path = None
+        self._snapshot_mtime = None
+        self.dirty = False
+
+    # ----- Mise à jour -----
+
+    def _terms_of(self, title, author):
+        weights = {}
+        for field, weight in ((title, TITLE_WEIGHT), (author, AUTHOR_WEIGHT)):
+            for token in tokenize(field):
+                if token not in STOP_WORDS:
+                    weights[token] = weights.get(token, 0.0) + weight
+        return weights
+
+    def _remove(self, isbn):
+        doc = self._docs.pop(isbn, None)
+        if doc is None:
+            return
+        for term in self._terms_of(*doc):
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            postings.pop(isbn, None)
+            if not postings:
+                del self._postings[term]
+                del self._terms[bisect.bisect_left(self._terms, term)]
+
+    def add(self, isbn, title, author):
+        """Indexe (ou réindexe) un livre"""
+        with self._lock:
+            self.dirty = True
+            self._remove(isbn)
+            self._docs[isbn] = (title or '', author or '')
+            for term, weight in self._terms_of(title, author).items():
+                postings = self._postings.get(term)
+                if postings is None:
+                    postings = self._postings[term] = {}
+                    bisect.insort(self._terms, term)
+                postings[isbn] = weight
+
+    def remove(self, isbn):
+        with self._lock:
+            self.dirty = True
+            self._remove(isbn)
+
+    def __len__(self):
+        return len(self._docs)
+
+    # ----- Recherche -----
+
+    def _matches(self, token):
+        """{isbn: score} des livres contenant un mot commençant par token"""
+        scores = {}
+        terms = self._terms
+        position = bisect.bisect_left(terms, token)
+        while position < len(terms) and terms[position].startswith(token):
+            term = terms[position]
+            position += 1
+            factor = 1.0 if term == token else PREFIX_FACTOR
+            for isbn, weight in self._postings[term].items():
+                score = weight * factor
+                if score > scores.get(isbn, 0.0):
+                    scores[isbn] = score
+        return scores
+
+    def search(self, query, limit=20):
+        """Livres dont le titre ou l'auteur contient tous les mots de la requête"""
+        tokens = list(dict.fromkeys(tokenize(query)))
+        # Les mots vides sont ignorés, sauf le dernier (peut-être un mot en cours de saisie)
+        tokens = [t for t in tokens[:-1] if t not in STOP_WORDS] + tokens[-1:]
+        if not tokens:
+            return []
+
+        with self._lock:
+            totals = None
+            # Les mots les plus sélectifs d'abord : l'intersection reste petite
+            for scores in sorted((self._matches(t) for t in tokens), key=len):
+                if totals is None:
+                    totals = scores
+                else:
+                    totals = {isbn: totals[isbn] + s for isbn, s in scores.items() if isbn in totals}
+                if not totals:
+                    return []
+            docs = self._docs
+            ranked = sorted(totals.items(), key=lambda item: (-item[1], docs[item[0]][0]))
+            return [SearchHit(isbn, docs[isbn][0], docs[isbn][1], round(score, 2))
+                    for isbn, score in ranked[:limit]]
+
+    def stats(self):
+        with self._lock:
+            return {'books': len(self._docs), 'terms': len(self._terms),
+                    'built_at': self.built_at.isoformat(timespec='seconds') if self.built_at else None}
+
+    # ----- Construction et sauvegarde -----
+
+    @classmethod
+    def build(cls, session, page_size=1000, concurrency=6):
+        """Construit l'index par un parcours parallèle de books_by_id (plages de tokens)"""
+        index = cls()
+        start = time.perf_counter()
+        scanner = TableScanner(session, 'books_by_id', 'isbn, title, author', 'isbn',
+                               concurrency=concurrency, page_size=page_size)
+        for row in scanner.scan():
+            index.add(row.isbn, row.title, row.author)
+        index.built_at = datetime.now()
+        logger.info(f"🔧 Index de recherche construit : {len(index)} livres, "
+                    f"{len(index._terms)} mots en {time.perf_counter() - start:.2f}s")
+        return index
+
+    def save(self, path):
+        """Écrit un instantané JSON (fichier temporaire puis renommage atomique).
+
+        Les listes inversées sont sauvegardées telles quelles : le
+        rechargement ne refait pas l'analyse des titres.
+        """
+        with self._lock:
+            snapshot = {
+                'version': SNAPSHOT_VERSION,
+                'built_at': self.built_at.isoformat() if self.built_at else None,
+                'books': [[isbn, title, author] for isbn, (title, author) in self._docs.items()],
+                'postings': {term: list(postings.items()) for term, postings in self._postings.items()},
+            }
+            self.dirty = False
+        tmp = f"{path}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(snapshot, ensure_ascii=False, separators=(',', ':')))
+        os.replace(tmp, path)
+        self.path, self._snapshot_mtime = path, _mtime(path)
+        logger.success(f"✅ Index de recherche sauvegardé : {path}")
+
+    def flush(self, path=None):
+        """Sauvegarde les ajouts faits depuis le dernier instantané ; True si écrit.
+
+        Un instantané modifié entre-temps (autre processus, chargement
+        massif) n'est pas écrasé par cet index, qui ne contient pas ses
+        livres : il est supprimé et sera reconstruit au prochain démarrage.
+        """
+        path = path or self.path
+        if not path or not self.dirty:
+            return False
+        if _mtime(path) != self._snapshot_mtime:
+            logger.warning(f"⚠️  Instantané {path} modifié par ailleurs, reconstruction au prochain démarrage")
+            discard_snapshot(path)
+            return False
+        try:
+            self.save(path)
+        except OSError as e:
+            logger.warning(f"⚠️  Sauvegarde de l'index impossible : {e}")
+            return False
+        return True
+
+    @classmethod
+    def load(cls, path):
+        """Recharge un instantané ; None s'il est absent ou illisible"""
+        try:
+            mtime = _mtime(path)
+            with open(path, 'r', encoding='utf-8') as f:
+                snapshot = json.load(f)
+            if snapshot.get('version') != SNAPSHOT_VERSION:
+                logger.warning(f"⚠️  Instantané {path} d'une autre version, ignoré")
+                return None
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"⚠️  Instantané {path} illisible : {e}")
+            return None
+        index = cls()
+        index._docs = {isbn: (title, author) for isbn, title, author in snapshot['books']}
+        index._postings = {term: dict(pairs) for term, pairs in snapshot['postings'].items()}
+        index._terms = sorted(index._postings)
+        if snapshot.get('built_at'):
+            index.built_at = datetime.fromisoformat(snapshot['built_at'])
+        index.path, index._snapshot_mtime = path, mtime
+        return index
+
+    @classmethod
+    def open(cls, session, path=None, max_age=3600):
+        """Instantané récent si disponible, sinon parcours de books_by_id (puis sauvegarde)"""
+        if path:
+            index = cls.load(path)
+            if index is not None and index.built_at is not None:
+                age = (datetime.now() - index.built_at).total_seconds()
+                if max_age is None or age <= max_age:
+                    logger.info(f"📦 Index de recherche rechargé depuis {path} ({len(index)} livres)")
+                    return index
+        index = cls.build(session)
+        if path:
+            try:
+                index.save(path)
+            except OSError as e:
+                logger.warning(f"⚠️  Sauvegarde de l'index impossible : {e}")
+        return index
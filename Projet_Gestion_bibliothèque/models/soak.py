@@ -0,0 +1,356 @@
+import time
+import uuid
+import random
+import threading
+from collections import namedtuple, Counter
+from datetime import datetime, timedelta
+import numpy as np
+from loguru import logger
+from models.book import BookRepository
+from models.borrow import BorrowRepository, WRITE_BATCH, month_buckets
+from models.histogram import LatencyHistogram
+from models.loader import BulkLoader
+from models.generator import Popularity
+from models.statements import LazyStatements, warm_up
+
+SEARCH, BORROW, RETURN, HISTORY = 'search', 'borrow', 'return', 'history'
+OPERATIONS = (SEARCH, BORROW, RETURN, HISTORY)
+DEFAULT_MIX = {SEARCH: 50, BORROW: 20, RETURN: 20, HISTORY: 10}
+
+SOAK_CATEGORY = "Soak"
+SOAK_NAMESPACE = uuid.UUID('2b7e9c1d-4a5f-4e8b-9c3d-6f0a1b2c3d4e')
+
+# Issue d'une opération : réussie, non tentée (stock vide, rien à rendre, plafond atteint) ou en échec
+OK, REFUSED, FAILED = 'ok', 'refused', 'failed'
+
+# kind = negative_stock | stock_mismatch | missing_book | missing_by_book | missing_by_user
+Violation = namedtuple('Violation', ['kind', 'key', 'detail'])
+
+InvariantReport = namedtuple('InvariantReport', ['books', 'active_loans', 'borrows', 'violations'])
+
+SoakReport = namedtuple('SoakReport', [
+    'run_id', 'started_at', 'elapsed', 'patrons', 'operations', 'timeline',
+    'stock', 'pending_repairs', 'invariants'])
+
+def parse_mix(text):
+    """'search=50,borrow=20,return=20,history=10' -> {opération: poids}"""
+    mix = {}
+    for part in text.split(','):
+        if not part.strip():
+            continue
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise ValueError(f"Opération inconnue : {name} (attendu : {', '.join(OPERATIONS)})")
+        mix[name] = float(weight) if weight.strip() else 1.0
+    if not mix or sum(mix.values()) <= 0:
+        raise ValueError("Mélange d'opérations vide")
+    return mix
+
+class Timeline:
+    """Latences par fenêtre de temps (débit soutenu) et cumulées par opération"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.totals = {op: LatencyHistogram() for op in OPERATIONS}
+        self.outcomes = {op: Counter() for op in OPERATIONS}
+        self.windows = []
+        self._start = time.perf_counter()
+        self._open(self._start)
+
+    def _open(self, now):
+        self._window = LatencyHistogram()
+        self._window_outcomes = Counter()
+        self._window_start = now
+
+    def record(self, op, seconds, outcome):
+        with self._lock:
+            window, outcomes = self._window, self._window_outcomes
+            outcomes[outcome] += 1
+            self.outcomes[op][outcome] += 1
+        # Les opérations non tentées n'ont pas de latence
+        if outcome != REFUSED:
+            window.record(seconds)
+            self.totals[op].record(seconds)
+
+    def roll(self):
+        """Clôt la fenêtre en cours et retourne son résumé"""
+        now = time.perf_counter()
+        with self._lock:
+            window, outcomes, start = self._window, self._window_outcomes, self._window_start
+            self._open(now)
+        elapsed = now - start
+        summary = window.summary()
+        summary.update({
+            't_s': round(now - self._start, 1),
+            'throughput_ops': round(window.count / elapsed, 1) if elapsed else 0.0,
+            'failed': outcomes[FAILED],
+            'refused': outcomes[REFUSED],
+        })
+        self.windows.append(summary)
+        return summary
+
+    def operations(self):
+        result = {}
+        for op in OPERATIONS:
+            summary = self.totals[op].summary()
+            summary.update({'failed': self.outcomes[op][FAILED], 'refused': self.outcomes[op][REFUSED]})
+            result[op] = summary
+        return result
+
+class InvariantChecker(LazyStatements):
+    """Contrôle de cohérence du stock et des emprunts d'un ensemble connu de livres et de membres.
+
+    - le stock (available_copies) n'est jamais négatif ;
+    - stock + emprunts en cours (active_loans) = total_copies ;
+    - chaque ligne de borrows_by_user a sa ligne dans borrows_by_book_monthly, et inversement.
+
+    À lancer sur une base au repos : un emprunt en cours d'écriture
+    (stock réservé, lignes pas encore écrites) serait compté comme un écart.
+    """
+
+    def __init__(self, session, concurrency=32):
+        self.session = session
+        self.concurrency = concurrency
+        self._prepare_queries()
+
+    def _prepare_queries(self):
+        self._declare(prep_get_stock="""
+            SELECT isbn, total_copies, available_copies FROM books_by_id WHERE isbn = ?
+        """)
+        self._declare(prep_get_active="""
+            SELECT isbn FROM active_loans WHERE user_id = ?
+        """)
+        self._declare(prep_get_history="""
+            SELECT borrow_date, isbn FROM borrows_by_user WHERE user_id = ?
+        """)
+        self._declare(prep_get_book_borrows="""
+            SELECT borrow_date, user_id FROM borrows_by_book_monthly WHERE isbn = ? AND bucket = ?
+        """)
+        self._idempotent('prep_get_stock', 'prep_get_active', 'prep_get_history', 'prep_get_book_borrows')
+
+    def _read(self, statement, keys):
+        """{clé: [lignes]}, lectures en parallèle par vagues de `concurrency`"""
+        found = {}
+        for start in range(0, len(keys), self.concurrency):
+            window = keys[start:start + self.concurrency]
+            futures = [self.session.execute_async(statement, key if isinstance(key, tuple) else (key,))
+                       for key in window]
+            for key, future in zip(window, futures):
+                found[key] = list(future.result())
+        return found
+
+    def check(self, isbns, user_ids, since, until=None):
+        """InvariantReport pour les livres `isbns` et les membres `user_ids` (emprunts depuis `since`)"""
+        isbns, user_ids = list(isbns), list(user_ids)
+        known_isbns, known_users = set(isbns), set(user_ids)
+        until = until or datetime.now()
+        # Dates d'emprunt à la milliseconde (new_loan) : `since` est arrondi à la milliseconde inférieure
+        since = since.replace(microsecond=since.microsecond // 1000 * 1000)
+        violations = []
+
+        stock = self._read(self.prep_get_stock, isbns)
+        active = Counter()
+        for rows in self._read(self.prep_get_active, user_ids).values():
+            active.update(row.isbn for row in rows if row.isbn in known_isbns)
+
+        for isbn in isbns:
+            rows = stock[isbn]
+            if not rows:
+                violations.append(Violation('missing_book', isbn, "absent de books_by_id"))
+                continue
+            available, total = rows[0].available_copies or 0, rows[0].total_copies or 0
+            if available < 0:
+                violations.append(Violation('negative_stock', isbn, f"stock {available}"))
+            if available + active[isbn] != total:
+                violations.append(Violation('stock_mismatch', isbn,
+                                            f"{available} en stock + {active[isbn]} prêté(s) ≠ {total} exemplaire(s)"))
+
+        by_user = set()
+        for user_id, rows in self._read(self.prep_get_history, user_ids).items():
+            by_user.update((row.isbn, row.borrow_date, user_id) for row in rows
+                           if row.isbn in known_isbns and since <= row.borrow_date <= until)
+        # Marge d'une seconde : les dates des deux tables sont tronquées à la milliseconde
+        keys = [(isbn, bucket) for isbn in isbns
+                for bucket in month_buckets(since - timedelta(seconds=1), until + timedelta(seconds=1))]
+        by_book = set()
+        for (isbn, _), rows in self._read(self.prep_get_book_borrows, keys).items():
+            by_book.update((isbn, row.borrow_date, row.user_id) for row in rows
+                           if row.user_id in known_users and since <= row.borrow_date <= until)
+
+        for isbn, borrow_date, user_id in sorted(by_user - by_book, key=str):
+            violations.append(Violation('missing_by_book', isbn,
+                                        f"emprunt du {borrow_date} par {user_id} absent de borrows_by_book_monthly"))
+        for isbn, borrow_date, user_id in sorted(by_book - by_user, key=str):
+            violations.append(Violation('missing_by_user', isbn,
+                                        f"emprunt du {borrow_date} par {user_id} absent de borrows_by_user"))
+
+        return InvariantReport(len(isbns), sum(active.values()), len(by_user), violations)
+
+class SoakTest:
+    """Essai d'endurance : `patrons` membres simultanés pendant `duration` secondes.
+
+    Chaque membre enchaîne un mélange pondéré d'opérations : recherche d'un
+    livre par ISBN, emprunt, retour d'un de ses emprunts, lecture de son
+    historique. Les ISBN suivent une loi de Zipf (models.generator.Popularity) :
+    quelques titres concentrent la contention sur le stock.
+
+    Livres et membres sont propres à l'essai (préfixe `run_id`) : les
+    invariants contrôlés à la fin ne dépendent pas des données existantes.
+    """
+
+    def __init__(self, session, patrons=16, duration=60.0, mix=None, books=200, copies=3, zipf=1.1,
+                 max_loans=5, interval=5.0, think=0.0, seed=42, write_mode=WRITE_BATCH, run_id=None):
+        self.session = session
+        self.patrons = patrons
+        self.duration = duration
+        self.mix = mix or DEFAULT_MIX
+        self.copies = copies
+        self.max_loans = max_loans
+        self.interval = interval
+        self.think = think
+        self.seed = seed
+        self.run_id = run_id or uuid.uuid4().hex[:8]
+        self.isbns = [f"SOAK-{self.run_id}-{i}" for i in range(books)]
+        self.members = [(uuid.uuid5(SOAK_NAMESPACE, f"{self.run_id}-{i}"), f"Patron {i}") for i in range(patrons)]
+        self.popularity = Popularity(books, zipf, seed)
+        self.book_repo = BookRepository(session)
+        self.borrow_repo = BorrowRepository(session, write_mode=write_mode)
+        # Stocks négatifs observés pendant l'essai (lectures des recherches)
+        self.negative_reads = []
+        self._operations = {SEARCH: self._search, BORROW: self._borrow,
+                            RETURN: self._return, HISTORY: self._history}
+
+    def seed_data(self):
+        """Insère le catalogue et les membres de l'essai via le chargeur asynchrone"""
+        loader = BulkLoader(self.session, report_every=max(len(self.isbns), 1))
+        loader.load_books({
+            'isbn': isbn, 'title': f"Livre d'endurance {i}", 'author': "Robot Soak",
+            'category': SOAK_CATEGORY, 'total_copies': self.copies
+        } for i, isbn in enumerate(self.isbns))
+        loader.load_users({
+            'user_id': str(user_id), 'email': f"soak-{self.run_id}-{i}@example.com",
+            'first_name': "Patron", 'last_name': str(i)
+        } for i, (user_id, _) in enumerate(self.members))
+
+    # ---------- Opérations d'un membre ----------
+
+    def _search(self, patron):
+        book = self.book_repo.get_book_by_isbn(patron.next_isbn())
+        if book is None:
+            return FAILED
+        if book.available_copies is not None and book.available_copies < 0:
+            self.negative_reads.append((book.isbn, book.available_copies))
+        return OK
+
+    def _borrow(self, patron):
+        if len(patron.loans) >= self.max_loans:
+            return REFUSED
+        book = self.book_repo.get_book_by_isbn(patron.next_isbn())
+        if book is None:
+            return FAILED
+        if not book.available_copies or book.available_copies <= 0:
+            return REFUSED
+        if not self.borrow_repo.borrow_book(patron.user_id, patron.name, book.isbn, book.title):
+            return FAILED
+        patron.loans.append(book.isbn)
+        return OK
+
+    def _return(self, patron):
+        if not patron.loans:
+            return REFUSED
+        index = patron.rng.randrange(len(patron.loans))
+        if not self.borrow_repo.return_book(patron.user_id, patron.loans[index]):
+            return FAILED
+        patron.loans.pop(index)
+        return OK
+
+    def _history(self, patron):
+        list(self.borrow_repo.get_user_borrows(patron.user_id))
+        return OK
+
+    def _patron(self, index, timeline, stop):
+        patron = Patron(self, index)
+        ops, weights = list(self.mix), list(self.mix.values())
+        while not stop.is_set():
+            op = patron.rng.choices(ops, weights)[0]
+            start = time.perf_counter()
+            try:
+                outcome = self._operations[op](patron)
+            except Exception as e:
+                logger.debug(f"{op}: {e}")
+                outcome = FAILED
+            timeline.record(op, time.perf_counter() - start, outcome)
+            if self.think:
+                stop.wait(patron.rng.expovariate(1.0 / self.think))
+
+    # ---------- Exécution ----------
+
+    def run(self):
+        """Lance les membres, relève le débit par fenêtre, puis contrôle les invariants ; retourne un SoakReport"""
+        warm_up(self.book_repo, self.borrow_repo, self.borrow_repo.stock)
+        started_at = datetime.now()
+        timeline = Timeline()
+        stop = threading.Event()
+        threads = [threading.Thread(target=self._patron, args=(i, timeline, stop), daemon=True)
+                   for i in range(self.patrons)]
+        logger.info(f"🔧 Essai {self.run_id} : {self.patrons} membres, {len(self.isbns)} livres, {self.duration:g} s")
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        try:
+            deadline = start + self.duration
+            while True:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                time.sleep(min(self.interval, remaining))
+                if time.perf_counter() < deadline:
+                    self._log_window(timeline.roll())
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+        elapsed = time.perf_counter() - start
+        self._log_window(timeline.roll())
+
+        logger.info("🔧 Contrôle des invariants...")
+        invariants = InvariantChecker(self.session).check(
+            self.isbns, [user_id for user_id, _ in self.members], started_at)
+        for isbn, stock in self.negative_reads:
+            invariants.violations.append(Violation('negative_stock', isbn, f"stock {stock} lu pendant l'essai"))
+        for violation in invariants.violations[:20]:
+            logger.error(f"❌ {violation.kind} {violation.key} : {violation.detail}")
+        if invariants.violations:
+            logger.error(f"❌ {len(invariants.violations)} violation(s) d'invariant")
+        else:
+            logger.success(f"✅ Invariants respectés : {invariants.books} livres, "
+                           f"{invariants.active_loans} prêts en cours, {invariants.borrows} emprunts")
+
+        return SoakReport(self.run_id, started_at.isoformat(timespec='seconds'), round(elapsed, 3),
+                          self.patrons, timeline.operations(), timeline.windows,
+                          self.borrow_repo.stock.stats(), len(self.borrow_repo.journal), invariants)
+
+    def _log_window(self, window):
+        logger.info(f"📊 t={window['t_s']:>6}s {window['throughput_ops']:>9} ops/s "
+                    f"p50 {window['p50_ms']} ms, p95 {window['p95_ms']} ms, p99 {window['p99_ms']} ms, "
+                    f"{window['failed']} échec(s)")
+
+class Patron:
+    """État d'un membre simulé : générateurs aléatoires et emprunts en cours"""
+
+    BLOCK = 256
+
+    def __init__(self, soak, index):
+        self.soak = soak
+        self.user_id, self.name = soak.members[index]
+        self.rng = random.Random(soak.seed * 1000 + index)
+        self.np_rng = np.random.default_rng([soak.seed, index])
+        self.loans = []
+        self._isbns = []
+
+    def next_isbn(self):
+        """ISBN suivant selon la popularité (tirés par blocs)"""
+        if not self._isbns:
+            self._isbns = self.soak.popularity.sample(self.np_rng, self.BLOCK).tolist()
+        return self.soak.isbns[self._isbns.pop()]
@@ -0,0 +1,119 @@
+import re
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from loguru import logger
+
+# Préparations envoyées en même temps lors d'un préchauffage
+PREPARE_CONCURRENCY = 16
+
+def normalize(query):
+    """Texte CQL sans espaces superflus : deux déclarations identiques partagent une préparation"""
+    return re.sub(r'\s+', ' ', query).strip()
+
+class StatementRegistry:
+    """Requêtes préparées d'une session, partagées par tous les repositories.
+
+    Un même texte CQL n'est préparé qu'une fois par session, quel que soit
+    le nombre de repositories qui le déclarent. prepare_many() envoie les
+    préparations manquantes en parallèle.
+    """
+
+    def __init__(self, session):
+        self.session = session
+        self._lock = threading.Lock()
+        self._prepared = {}
+
+    def get(self, query, idempotent=False):
+        key = normalize(query)
+        with self._lock:
+            prepared = self._prepared.get(key)
+        if prepared is None:
+            prepared = self.session.prepare(query)
+            with self._lock:
+                # Préparée entre-temps par un autre thread : on garde la première
+                prepared = self._prepared.setdefault(key, prepared)
+        if idempotent:
+            prepared.is_idempotent = True
+        return prepared
+
+    def prepare_many(self, queries):
+        """Prépare en parallèle les requêtes [(texte, idempotent)] encore inconnues"""
+        with self._lock:
+            missing = {normalize(q): q for q, _ in queries if normalize(q) not in self._prepared}
+        if missing:
+            workers = min(PREPARE_CONCURRENCY, len(missing))
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prepare") as pool:
+                for key, prepared in zip(missing, pool.map(self.session.prepare, missing.values())):
+                    with self._lock:
+                        self._prepared.setdefault(key, prepared)
+            logger.debug(f"🔧 {len(missing)} requêtes préparées ({workers} en parallèle)")
+        return [self.get(q, idempotent) for q, idempotent in queries]
+
+    def __len__(self):
+        return len(self._prepared)
+
+_registries = weakref.WeakKeyDictionary()
+_registries_lock = threading.Lock()
+
+def statements_for(session):
+    """Registre de requêtes préparées propre à la session"""
+    with _registries_lock:
+        registry = _registries.get(session)
+        if registry is None:
+            registry = _registries[session] = StatementRegistry(session)
+        return registry
+
+class LazyStatements:
+    """Requêtes préparées à la première utilisation.
+
+    _prepare_queries() déclare les requêtes (_declare) sans les envoyer ;
+    l'attribut prep_* est préparé au premier accès via le registre de la
+    session. warm_up() prépare d'avance, en parallèle, tout ou partie des
+    requêtes déclarées (ex : tableau de bord qui les utilisera toutes).
+    """
+
+    def _declare(self, **queries):
+        self.__dict__.setdefault('_queries', {}).update(queries)
+
+    def _idempotent(self, *names):
+        self.__dict__.setdefault('_idempotent_queries', set()).update(names)
+
+    def declared_queries(self):
+        """{attribut prep_*: texte CQL}"""
+        return dict(self.__dict__.get('_queries', {}))
+
+    def __getattr__(self, name):
+        queries = self.__dict__.get('_queries')
+        if queries is None or name not in queries:
+            raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+        idempotent = name in self.__dict__.get('_idempotent_queries', ())
+        prepared = statements_for(self.session).get(queries[name], idempotent)
+        # Accès suivants : attribut ordinaire, sans repasser par ici
+        setattr(self, name, prepared)
+        return prepared
+
+    def warm_up(self, *names):
+        """Prépare en parallèle les requêtes nommées (toutes par défaut)"""
+        queries = self.__dict__.get('_queries', {})
+        names = names or tuple(queries)
+        idempotent = self.__dict__.get('_idempotent_queries', ())
+        prepared = statements_for(self.session).prepare_many([(queries[n], n in idempotent) for n in names])
+        for name, statement in zip(names, prepared):
+            setattr(self, name, statement)
+        return self
+
+def warm_up(*components):
+    """Prépare en une seule vague parallèle les requêtes de plusieurs repositories"""
+    components = [c for c in components if isinstance(c, LazyStatements)]
+    if not components:
+        return
+    wanted = []
+    for component in components:
+        idempotent = component.__dict__.get('_idempotent_queries', ())
+        for name, query in component.declared_queries().items():
+            wanted.append((component, name, query, name in idempotent))
+    registry = statements_for(components[0].session)
+    prepared = registry.prepare_many([(query, idem) for _, _, query, idem in wanted])
+    for (component, name, _, _), statement in zip(wanted, prepared):
+        setattr(component, name, statement)
@@ -0,0 +1,156 @@
+import time
+import random
+import threading
+from loguru import logger
+from models.statements import LazyStatements
+from models.book import SELECT_BOOK_BY_ISBN
+
+class StockContentionError(Exception):
+    """Le stock n'a pas pu être modifié après le nombre maximal de tentatives"""
+
+class StockEngine(LazyStatements):
+    """Réservation / restitution d'exemplaires par transactions légères (LWT).
+
+    Chaque modification est un compare-and-set :
+        UPDATE books_by_id SET available_copies = ? WHERE isbn = ? IF available_copies = ?
+    Si un autre guichet a modifié le stock entre-temps, Cassandra refuse la
+    mise à jour et renvoie la valeur courante : on recommence à partir de
+    celle-ci après un backoff exponentiel avec jitter, sans relecture.
+    Aucune mise à jour n'est perdue et le stock ne devient jamais négatif.
+    """
+
+    def __init__(self, session, max_attempts=16, base_delay=0.002, max_delay=0.1):
+        self.session = session
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._lock = threading.Lock()
+        self._metrics = {'operations': 0, 'attempts': 0, 'conflicts': 0, 'retries': 0,
+                         'exhausted': 0, 'out_of_stock': 0}
+        self._prepare_queries()
+
+    def _prepare_queries(self):
+        # Même requête que BookRepository.prep_get_by_isbn : préparée une seule fois
+        self._declare(prep_get_stock=SELECT_BOOK_BY_ISBN)
+        self._declare(prep_cas_stock="""
+            UPDATE books_by_id SET available_copies = ? WHERE isbn = ? IF available_copies = ?
+        """)
+
+    def _count(self, **increments):
+        with self._lock:
+            for name, value in increments.items():
+                self._metrics[name] += value
+
+    def _backoff(self, attempt):
+        # "Full jitter" : les guichets en conflit ne se resynchronisent pas
+        time.sleep(random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt))))
+
+    def current(self, isbn):
+        row = self.session.execute(self.prep_get_stock, [isbn]).one()
+        return row.available_copies if row else None
+
+    def adjust(self, isbn, delta, expected=None):
+        """Ajoute delta au stock ; retourne le nouveau stock, ou None si impossible.
+
+        `expected` est une estimation du stock actuel (ex : valeur en cache) ;
+        si elle est fausse, le premier CAS échoue et renvoie la vraie valeur.
+        """
+        self._count(operations=1)
+        if expected is None:
+            expected = self.current(isbn)
+
+        for attempt in range(self.max_attempts):
+            if expected is None:
+                return None
+            new_stock = expected + delta
+            if new_stock < 0:
+                self._count(out_of_stock=1)
+                return None
+
+            self._count(attempts=1)
+            result = self.session.execute(self.prep_cas_stock, (new_stock, isbn, expected))
+            if result.was_applied:
+                return new_stock
+
+            # Conflit : la ligne renvoyée contient la valeur réellement en base
+            self._count(conflicts=1)
+            expected = getattr(result.one(), 'available_copies', None)
+            if attempt + 1 < self.max_attempts:
+                self._count(retries=1)
+                self._backoff(attempt)
+
+        self._count(exhausted=1)
+        logger.warning(f"⚠️  Contention sur l'ISBN {isbn} : {self.max_attempts} tentatives sans succès")
+        raise StockContentionError(isbn)
+
+    def reserve(self, isbn, quantity=1, expected=None):
+        """Retire des exemplaires ; None si le stock est insuffisant"""
+        return self.adjust(isbn, -quantity, expected)
+
+    def release(self, isbn, quantity=1, expected=None):
+        """Remet des exemplaires en stock"""
+        return self.adjust(isbn, quantity, expected)
+
+    def adjust_many(self, deltas, expected=None, partial=False):
+        """Applique plusieurs variations de stock en parallèle.
+
+        deltas : {isbn: variation}, les demandes d'un même titre étant déjà
+        agrégées : un seul CAS par ISBN. Tous les CAS d'un tour partent
+        ensemble ; seuls les ISBN en conflit repartent au tour suivant.
+        Avec `partial`, un retrait est ramené au stock restant au lieu d'être
+        refusé. Retourne {isbn: (variation appliquée, nouveau stock ou None)}.
+        """
+        expected = dict(expected or {})
+        self._count(operations=len(deltas))
+        unknown = [isbn for isbn in deltas if expected.get(isbn) is None]
+        futures = [(isbn, self.session.execute_async(self.prep_get_stock, [isbn])) for isbn in unknown]
+        for isbn, future in futures:
+            row = future.result().one()
+            expected[isbn] = row.available_copies if row else None
+
+        results = {}
+        pending = dict(deltas)
+        for attempt in range(self.max_attempts):
+            sent = []
+            for isbn, delta in pending.items():
+                current = expected.get(isbn)
+                if current is None:
+                    results[isbn] = (0, None)
+                    continue
+                if partial and delta < 0:
+                    delta = -min(-delta, current)
+                if delta == 0 or current + delta < 0:
+                    self._count(out_of_stock=1)
+                    results[isbn] = (0, current)
+                    continue
+                sent.append((isbn, delta, current,
+                             self.session.execute_async(self.prep_cas_stock, (current + delta, isbn, current))))
+            self._count(attempts=len(sent))
+
+            pending = {}
+            for isbn, delta, current, future in sent:
+                result = future.result()
+                if result.was_applied:
+                    results[isbn] = (delta, current + delta)
+                else:
+                    self._count(conflicts=1)
+                    expected[isbn] = getattr(result.one(), 'available_copies', None)
+                    pending[isbn] = deltas[isbn]
+            if not pending:
+                return results
+            if attempt + 1 < self.max_attempts:
+                self._count(retries=len(pending))
+                self._backoff(attempt)
+
+        self._count(exhausted=len(pending))
+        for isbn in pending:
+            logger.warning(f"⚠️  Contention sur l'ISBN {isbn} : {self.max_attempts} tentatives sans succès")
+            results[isbn] = (0, None)
+        return results
+
+    def stats(self):
+        """Compteurs de contention (conflits CAS, rejeux, abandons)"""
+        with self._lock:
+            stats = dict(self._metrics)
+        stats['conflict_ratio'] = round(stats['conflicts'] / stats['attempts'], 3) if stats['attempts'] else 0.0
+        return stats
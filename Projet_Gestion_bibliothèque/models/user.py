@@ -1,8 +1,20 @@
 import uuid
 from datetime import datetime
 from loguru import logger
+from models.paging import Page, fetch_page, DEFAULT_PAGE_SIZE
+from models.cache import MISSING
+from models.counters import TOTAL_USERS
+from models.statements import LazyStatements
+from models.scan import TableScanner
+from models.flight import flight_key
+
+# Lecture d'un profil, partagée avec les emprunts (une seule préparation)
+SELECT_USER_BY_ID = "SELECT * FROM users_by_id WHERE user_id = ?"
 
 class User:
+    __slots__ = ('user_id', 'first_name', 'last_name', 'email', 'registration_date',
+                 'total_borrows', 'active_borrows')
+
     def __init__(self, user_id, first_name, last_name, email, registration_date, total_borrows=0, active_borrows=0):
         self.user_id = user_id
         self.first_name = first_name
@@ -12,39 +24,118 @@ class User:
         self.total_borrows = total_borrows
         self.active_borrows = active_borrows
 
-class UserRepository:
-    def __init__(self, session):
+def user_from_row(row):
+    """User construit à partir d'une ligne de users_by_id"""
+    return User(
+        user_id=row.user_id,
+        first_name=row.first_name,
+        last_name=row.last_name,
+        email=row.email,
+        registration_date=row.registration_date,
+        total_borrows=getattr(row, 'total_borrows', 0),
+        active_borrows=getattr(row, 'active_borrows', 0)
+    )
+
+def normalize_email(email):
+    """Clé de users_by_email : l'adresse sans espaces ni majuscules"""
+    return (email or '').strip().lower()
+
+class UserRepository(LazyStatements):
+    def __init__(self, session, cache=None, counters=None, flight=None):
         self.session = session
-        # ✅ Préparation des requêtes au démarrage pour la performance
+        # Cache optionnel (models.cache.LRUCache) des profils par user_id
+        self.cache = cache
+        # Regroupement des lectures identiques en vol (models.flight.SingleFlight)
+        self.flight = flight
+        # Compteurs de la table statistics (CounterAggregator, écriture différée)
+        self.counters = counters
+        # Requêtes déclarées ici, préparées à leur première utilisation
         self._prepare_queries()
 
     def _prepare_queries(self):
-        """Préparation des statements pour la sécurité et la vitesse"""
+        """Déclaration des statements (préparés à la demande, partagés par session)"""
         # Insertion
-        self.prep_insert_user = self.session.prepare("""
+        self._declare(prep_insert_user="""
             INSERT INTO users_by_id (user_id, email, first_name, last_name, registration_date)
             VALUES (?, ?, ?, ?, ?)
         """)
         
         # Lecture unitaire
-        self.prep_get_user = self.session.prepare("""
-            SELECT * FROM users_by_id WHERE user_id = ?
+        self._declare(prep_get_user=SELECT_USER_BY_ID)
+
+        # Unicité de l'email : la première inscription réserve l'adresse (LWT)
+        self._declare(prep_claim_email="""
+            INSERT INTO users_by_email (email, user_id) VALUES (?, ?) IF NOT EXISTS
+        """)
+        self._declare(prep_release_email="""
+            DELETE FROM users_by_email WHERE email = ? IF user_id = ?
+        """)
+        self._declare(prep_get_by_email="""
+            SELECT user_id FROM users_by_email WHERE email = ?
         """)
 
         # Lecture de tous les membres (Table demandée par Streamlit)
-        self.prep_get_all = self.session.prepare("""
+        self._declare(prep_get_all="""
             SELECT user_id, first_name, last_name, email, registration_date FROM users_by_id
         """)
 
+    def _coalesce(self, load, statement, params, store=None):
+        """load() partagé par les appels concurrents identiques (si un SingleFlight est fourni)"""
+        if self.flight is None:
+            result = load()
+            if store is not None:
+                store(result)
+            return result
+        return self.flight.run(flight_key(statement, params), load, store)
+
+    def _cache_user(self, u_id):
+        def store(user):
+            if user is not None and self.cache is not None:
+                self.cache.set(u_id, user)
+        return store
+
+    def _load_user(self, u_id):
+        row = self.session.execute(self.prep_get_user, [u_id]).one()
+        return user_from_row(row) if row else None
+
+    def forget_user(self, user_id, email=None):
+        """Après une écriture : les lectures en vol de ce membre ne sont plus partagées"""
+        if self.flight is None:
+            return
+        keys = [flight_key(self.prep_get_user, [user_id])]
+        if email is not None:
+            keys.append(flight_key(self.prep_get_by_email, [normalize_email(email)]))
+        self.flight.forget(*keys)
+
     def create_user(self, email, first_name, last_name):
-        """Inscrire un utilisateur avec un UUID automatique"""
+        """Inscrire un utilisateur avec un UUID automatique.
+
+        L'email est d'abord réservé dans users_by_email (INSERT IF NOT EXISTS) :
+        une adresse déjà utilisée est refusée sans parcourir les membres.
+        """
         user_id = uuid.uuid4()
         now = datetime.now()
-        
+        key = normalize_email(email)
+
         try:
-            self.session.execute(self.prep_insert_user, (
-                user_id, email, first_name, last_name, now
-            ))
+            claim = self.session.execute(self.prep_claim_email, (key, user_id))
+            if not claim.was_applied:
+                logger.error(f"❌ Email déjà utilisé : {email}")
+                return None
+            try:
+                self.session.execute(self.prep_insert_user, (
+                    user_id, email, first_name, last_name, now
+                ))
+            except Exception:
+                # Profil non créé : l'adresse redevient disponible
+                self.session.execute(self.prep_release_email, (key, user_id))
+                raise
+            # Une recherche par email lancée avant l'inscription ne doit pas répondre « inconnu »
+            self.forget_user(user_id, email)
+            if self.cache is not None:
+                self.cache.invalidate(user_id)
+            if self.counters is not None:
+                self.counters.increment(TOTAL_USERS)
             logger.success(f"✅ Utilisateur créé : {first_name} {last_name} ({user_id})")
             return user_id
         except Exception as e:
@@ -59,27 +150,47 @@ class UserRepository:
         try:
             # Conversion en UUID si l'ID vient de Streamlit sous forme de texte
             u_id = uuid.UUID(user_id) if isinstance(user_id, str) else user_id
+            if self.cache is not None:
+                cached = self.cache.get(u_id)
+                if cached is not MISSING:
+                    return cached
             
-            row = self.session.execute(self.prep_get_user, [u_id]).one()
-            if row:
-                return User(
-                    user_id=row.user_id, 
-                    first_name=row.first_name, 
-                    last_name=row.last_name,
-                    email=row.email, 
-                    registration_date=row.registration_date,
-                    total_borrows=getattr(row, 'total_borrows', 0), 
-                    active_borrows=getattr(row, 'active_borrows', 0)
-                )
-            return None
+            return self._coalesce(lambda: self._load_user(u_id), self.prep_get_user, [u_id],
+                                  store=self._cache_user(u_id))
         except Exception as e:
             logger.error(f"❌ Erreur récupération user {user_id}: {e}")
             return None
 
-    def get_all_users(self):
-        """Récupérer la liste complète pour l'affichage du Dashboard"""
+    def get_user_by_email(self, email):
+        """Membre associé à un email (deux lectures ponctuelles, sans parcours)"""
+        try:
+            key = normalize_email(email)
+            row = self._coalesce(lambda: self.session.execute(self.prep_get_by_email, [key]).one(),
+                                 self.prep_get_by_email, [key])
+            return self.get_user(row.user_id) if row else None
+        except Exception as e:
+            logger.error(f"❌ Erreur recherche par email {email}: {e}")
+            return None
+
+    def get_all_users(self, **options):
+        """Récupérer la liste complète (générateur, parcours parallèle de users_by_id).
+
+        Une erreur survenue après les premiers membres est transmise à l'appelant.
+        """
+        yielded = False
         try:
-            return self.session.execute(self.prep_get_all)
+            for row in TableScanner(self.session, 'users_by_id', '*', 'user_id', **options).scan():
+                yielded = True
+                yield row
         except Exception as e:
             logger.error(f"❌ Erreur récupération liste users: {e}")
-            return []
\ No newline at end of file
+            if yielded:
+                raise
+
+    def get_users_page(self, page_size=DEFAULT_PAGE_SIZE, cursor=None, columnar=False):
+        """Une page de la liste des membres (pagination par curseur)"""
+        try:
+            return fetch_page(self.session, self.prep_get_all, (), page_size, cursor, columnar)
+        except Exception as e:
+            logger.error(f"❌ Erreur lecture page membres: {e}")
+            return Page([], None)
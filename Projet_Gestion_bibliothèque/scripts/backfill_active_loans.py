@@ -0,0 +1,45 @@
+import sys
+import os
+import argparse
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.database import CassandraConnection
+from models.loader import BulkLoader
+from models.scan import add_scan_arguments, scanner_from_args
+from loguru import logger
+
+def read_active_borrows(scanner):
+    """Emprunts ACTIVE de borrows_by_user pas encore indexés (parcours parallèle)"""
+    for row in scanner.scan():
+        if row.status == 'ACTIVE' and row.loan_id is None:
+            yield row._asdict()
+
+def main():
+    parser = argparse.ArgumentParser(description="Construit active_loans à partir de l'historique borrows_by_user")
+    parser.add_argument('--page-size', type=int, default=1000, help='Lignes lues par page')
+    parser.add_argument('--concurrency', type=int, default=128, help='Nombre max d\'écritures en vol')
+    parser.add_argument('--report-every', type=int, default=10000, help='Fréquence du rapport de progression')
+    add_scan_arguments(parser)
+    args = parser.parse_args()
+
+    db = CassandraConnection()
+    session = db.connect()
+    try:
+        loader = BulkLoader(session, concurrency=args.concurrency, report_every=args.report_every)
+        scanner = scanner_from_args(session, args, 'borrows_by_user',
+                                    'user_id, borrow_date, isbn, book_title, status, loan_id', 'user_id')
+        report = loader.load_active_loans(read_active_borrows(scanner))
+        # Parcours allé au bout : une relance (même après échecs) repart de zéro
+        if scanner.checkpoint is not None:
+            scanner.checkpoint.clear()
+        if report.failed:
+            logger.error(f"❌ {report.failed} écritures en échec : relancer le rattrapage")
+            return 1
+        logger.success(f"🎉 {report.records} emprunts en cours indexés")
+        return 0
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,45 @@
+import sys
+import os
+import argparse
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.database import CassandraConnection
+from models.loader import BulkLoader
+from models.scan import add_scan_arguments, scanner_from_args
+from loguru import logger
+
+def read_users(scanner):
+    """Membres de users_by_id (parcours parallèle par plages de tokens)"""
+    for row in scanner.scan():
+        yield row._asdict()
+
+def main():
+    parser = argparse.ArgumentParser(description="Construit users_by_email à partir de users_by_id")
+    parser.add_argument('--page-size', type=int, default=1000, help='Lignes lues par page')
+    parser.add_argument('--concurrency', type=int, default=128, help='Nombre max d\'écritures en vol')
+    parser.add_argument('--report-every', type=int, default=10000, help='Fréquence du rapport de progression')
+    add_scan_arguments(parser)
+    args = parser.parse_args()
+
+    db = CassandraConnection()
+    session = db.connect()
+    try:
+        # INSERT IF NOT EXISTS : relancer le rattrapage est sans effet, et en cas
+        # de doublon existant la première adresse réservée est conservée
+        loader = BulkLoader(session, concurrency=args.concurrency, report_every=args.report_every)
+        scanner = scanner_from_args(session, args, 'users_by_id', 'user_id, email', 'user_id')
+        report = loader.load_user_emails(read_users(scanner))
+        # Parcours allé au bout : une relance (même après échecs) repart de zéro
+        if scanner.checkpoint is not None:
+            scanner.checkpoint.clear()
+        if report.failed:
+            logger.error(f"❌ {report.failed} écritures en échec : relancer le rattrapage")
+            return 1
+        logger.success(f"🎉 {report.records} emails indexés")
+        return 0
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    sys.exit(main())
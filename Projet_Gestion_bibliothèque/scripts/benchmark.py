@@ -1,40 +1,350 @@
+import sys
+import os
+import json
 import time
+import uuid
+import random
+import argparse
+import platform
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
 from config.database import CassandraConnection
-from models.book import BookRepository, Book
+from config.memory_session import MemoryConnection
+from config.services import LibraryServices
+from models.book import BookRepository
+from models.user import UserRepository
+from models.borrow import BorrowRepository, WRITE_PARALLEL
+from models.loader import BulkLoader
+from models.histogram import LatencyHistogram
+from models.cache import LRUCache
+from models.statements import warm_up, statements_for
+from models.scan import TableScanner
+from cassandra.query import SimpleStatement
 from loguru import logger
 
-def run_benchmark(count=1000):
-    db = CassandraConnection()
+BENCH_CATEGORY = "Benchmark"
+BENCH_NAMESPACE = uuid.UUID('6f1c2a52-8f0e-4c1e-9d8e-3b5a1f0c7e21')
+
+class BenchContext:
+    """Données partagées par les scénarios (repositories + jeu de test)"""
+
+    def __init__(self, session, books, users, cache=False):
+        book_cache = LRUCache(maxsize=books * 2) if cache else None
+        user_cache = LRUCache(maxsize=users * 2) if cache else None
+        self.book_repo = BookRepository(session, cache=book_cache)
+        self.user_repo = UserRepository(session, cache=user_cache)
+        self.borrow_repo = BorrowRepository(session, book_cache=book_cache)
+        self.borrow_repo_parallel = BorrowRepository(session, book_cache=book_cache, write_mode=WRITE_PARALLEL)
+        # Préparations faites avant la mesure : elles ne comptent pas dans la latence des scénarios
+        warm_up(self.book_repo, self.user_repo, self.borrow_repo, self.borrow_repo.stock,
+                self.borrow_repo_parallel, self.borrow_repo_parallel.stock)
+        self.isbns = [f"BENCH-{i}" for i in range(books)]
+        # UUID déterministes : un second lancement réutilise les mêmes membres
+        self.users = [(uuid.uuid5(BENCH_NAMESPACE, f"user-{i}"), f"Bench User{i}") for i in range(users)]
+
+    def seed(self, session):
+        """Insère le jeu de test via le chargeur asynchrone"""
+        loader = BulkLoader(session, report_every=max(len(self.isbns), 1))
+        loader.load_books({
+            'isbn': isbn, 'title': f"Livre de test {i}", 'author': "Robot Benchmark",
+            'category': BENCH_CATEGORY, 'publisher': "DataGen", 'publication_year': 2024,
+            'total_copies': 1000000
+        } for i, isbn in enumerate(self.isbns))
+        loader.load_users({
+            'user_id': str(user_id), 'email': f"bench{i}@example.com",
+            'first_name': "Bench", 'last_name': f"User{i}"
+        } for i, (user_id, _) in enumerate(self.users))
+
+# ================== SCÉNARIOS ==================
+# Chaque scénario reçoit (contexte, générateur aléatoire, n° de worker)
+# et retourne True si l'opération a réussi.
+
+def scenario_get_book(ctx, rng, worker):
+    return ctx.book_repo.get_book_by_isbn(rng.choice(ctx.isbns)) is not None
+
+def scenario_get_user(ctx, rng, worker):
+    return ctx.user_repo.get_user(rng.choice(ctx.users)[0]) is not None
+
+def _borrow_return(ctx, worker, isbn, repo=None):
+    repo = repo or ctx.borrow_repo
+    # Un membre par worker pour que les retours ne se croisent pas
+    user_id, user_name = ctx.users[worker % len(ctx.users)]
+    if not repo.borrow_book(user_id, user_name, isbn, "Benchmark"):
+        return False
+    return repo.return_by_isbn(user_id, isbn)
+
+def scenario_borrow_return(ctx, rng, worker):
+    return _borrow_return(ctx, worker, rng.choice(ctx.isbns))
+
+def scenario_borrow_return_parallel(ctx, rng, worker):
+    # Même opération, écritures dénormalisées en parallèle au lieu du batch logué
+    return _borrow_return(ctx, worker, rng.choice(ctx.isbns), ctx.borrow_repo_parallel)
+
+def scenario_borrow_return_hot(ctx, rng, worker):
+    # Tous les workers sur le même titre : mesure la contention du CAS de stock
+    return _borrow_return(ctx, worker, ctx.isbns[0])
+
+def scenario_books_by_category(ctx, rng, worker):
+    return len(list(ctx.book_repo.get_books_by_category(BENCH_CATEGORY))) > 0
+
+def scenario_user_borrows(ctx, rng, worker):
+    list(ctx.borrow_repo.get_user_borrows(rng.choice(ctx.users)[0]))
+    return True
+
+SCENARIOS = {
+    'get_book_by_isbn': scenario_get_book,
+    'get_user': scenario_get_user,
+    'borrow_return': scenario_borrow_return,
+    'borrow_return_parallel': scenario_borrow_return_parallel,
+    'borrow_return_hot': scenario_borrow_return_hot,
+    'books_by_category': scenario_books_by_category,
+    'user_borrows': scenario_user_borrows,
+}
+
+# ================== EXÉCUTION ==================
+
+def run_scenario(ctx, name, operation, ops, concurrency, seed):
+    """Exécute `ops` opérations réparties sur `concurrency` workers"""
+    per_worker = [ops // concurrency + (1 if w < ops % concurrency else 0) for w in range(concurrency)]
+
+    def worker(index):
+        rng = random.Random(seed * 1000 + index)
+        histogram = LatencyHistogram()
+        errors = 0
+        for _ in range(per_worker[index]):
+            start = time.perf_counter()
+            try:
+                ok = operation(ctx, rng, index)
+            except Exception as e:
+                logger.debug(f"{name}: {e}")
+                ok = False
+            histogram.record(time.perf_counter() - start)
+            if not ok:
+                errors += 1
+        return histogram, errors
+
+    logger.info(f"⏱️  {name} : {ops} opérations, concurrence {concurrency}")
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(worker, range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    histogram = LatencyHistogram()
+    errors = 0
+    for h, e in results:
+        histogram.merge(h)
+        errors += e
+
+    result = histogram.summary()
+    result.update({
+        'errors': errors,
+        'elapsed_s': round(elapsed, 3),
+        'throughput_ops': round(histogram.count / elapsed, 1) if elapsed else 0.0,
+    })
+    return result
+
+def measure_startup(connection_factory, isbn):
+    """Temps de démarrage d'un processus (CLI / dashboard) sur une connexion neuve.
+
+    first_command : connexion + préparation à la demande de la seule requête
+    utilisée + exécution. serial_prepare / parallel_prepare : préparation de
+    toutes les requêtes des repositories, une par une (ancien comportement)
+    ou en une vague parallèle (warm_up).
+    """
+    def timed(action):
+        services = LibraryServices(connection_factory)
+        try:
+            services.session
+            start = time.perf_counter()
+            action(services)
+            return services, (time.perf_counter() - start) * 1000
+        finally:
+            services.close()
+
+    services = LibraryServices(connection_factory)
+    try:
+        start = time.perf_counter()
+        services.book_repo.get_book_by_isbn(isbn)
+        first_command_ms = (time.perf_counter() - start) * 1000
+        result = {
+            'connect_ms': round(services.connect_seconds * 1000, 3),
+            'first_command_ms': round(first_command_ms, 3),
+            'first_command_statements': len(statements_for(services.session)),
+        }
+    finally:
+        services.close()
+
+    def prepare_serially(services):
+        components = [services.book_repo, services.user_repo, services.borrow_repo,
+                      services.reservation_repo, services.counters, services.borrow_repo.stock]
+        for component in components:
+            for name in component.declared_queries():
+                getattr(component, name)
+
+    _, result['serial_prepare_ms'] = timed(prepare_serially)
+    services, result['parallel_prepare_ms'] = timed(LibraryServices.warm_up)
+    result['statements'] = len(statements_for(services.session))
+    for key in ('serial_prepare_ms', 'parallel_prepare_ms'):
+        result[key] = round(result[key], 3)
+    return result
+
+def measure_scan(session, page_size=1000, concurrency=6):
+    """Lecture complète de books_by_id : SELECT paginé unique puis parcours par plages de tokens"""
+    start = time.perf_counter()
+    statement = SimpleStatement("SELECT isbn, title, author FROM books_by_id", fetch_size=page_size)
+    sequential_rows = sum(1 for _ in session.execute(statement))
+    sequential_ms = (time.perf_counter() - start) * 1000
+
+    scanner = TableScanner(session, 'books_by_id', 'isbn, title, author', 'isbn',
+                           concurrency=concurrency, page_size=page_size)
+    start = time.perf_counter()
+    parallel_rows = sum(1 for _ in scanner.scan())
+    parallel_ms = (time.perf_counter() - start) * 1000
+    return {
+        'rows': parallel_rows,
+        'sequential_rows': sequential_rows,
+        'sequential_ms': round(sequential_ms, 3),
+        'parallel_ms': round(parallel_ms, 3),
+        'ranges': scanner.stats()['ranges'],
+        'speedup': round(sequential_ms / parallel_ms, 2) if parallel_ms else None,
+    }
+
+def compare_with_baseline(results, baseline, tolerance):
+    """Liste les régressions (latence p95/p99 en hausse ou débit en baisse au-delà de la tolérance)"""
+    regressions = []
+    for name, current in results['scenarios'].items():
+        reference = baseline.get('scenarios', {}).get(name)
+        if not reference:
+            continue
+        for metric in ('p95_ms', 'p99_ms'):
+            if reference[metric] and current[metric] > reference[metric] * (1 + tolerance):
+                regressions.append(f"{name}.{metric}: {reference[metric]} -> {current[metric]}")
+        if reference['throughput_ops'] and current['throughput_ops'] < reference['throughput_ops'] * (1 - tolerance):
+            regressions.append(f"{name}.throughput_ops: {reference['throughput_ops']} -> {current['throughput_ops']}")
+    startup, reference = results.get('startup'), baseline.get('startup')
+    if startup and reference:
+        for metric in ('first_command_ms', 'parallel_prepare_ms'):
+            if reference[metric] and startup[metric] > reference[metric] * (1 + tolerance):
+                regressions.append(f"startup.{metric}: {reference[metric]} -> {startup[metric]}")
+    scan, reference = results.get('scan'), baseline.get('scan')
+    if scan and reference and reference['parallel_ms'] and scan['parallel_ms'] > reference['parallel_ms'] * (1 + tolerance):
+        regressions.append(f"scan.parallel_ms: {reference['parallel_ms']} -> {scan['parallel_ms']}")
+    return regressions
+
+def print_report(results):
+    print("\n" + "=" * 96)
+    print("📊 RÉSULTATS DU BENCHMARK")
+    print(f"{'Scénario':<24}{'ops':>8}{'err':>6}{'ops/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for name, r in results['scenarios'].items():
+        print(f"{name:<24}{r['count']:>8}{r['errors']:>6}{r['throughput_ops']:>10}"
+              f"{r['p50_ms']:>10}{r['p95_ms']:>10}{r['p99_ms']:>10}{r['max_ms']:>10}")
+    stock = results.get('stock_contention')
+    if stock:
+        print(f"Stock (CAS) : {stock['attempts']} tentatives, {stock['conflicts']} conflits, "
+              f"{stock['retries']} rejeux, {stock['exhausted']} abandons")
+    startup = results.get('startup')
+    if startup:
+        print(f"Démarrage : connexion {startup['connect_ms']} ms, première commande "
+              f"{startup['first_command_ms']} ms ({startup['first_command_statements']} requête(s) préparée(s)), "
+              f"{startup['statements']} requêtes : {startup['serial_prepare_ms']} ms en série, "
+              f"{startup['parallel_prepare_ms']} ms en parallèle")
+    scan = results.get('scan')
+    if scan:
+        print(f"Lecture complète ({scan['rows']} livres) : {scan['sequential_ms']} ms en un SELECT, "
+              f"{scan['parallel_ms']} ms sur {scan['ranges']} plages de tokens (x{scan['speedup']})")
+    if results.get('pending_repairs'):
+        print(f"Écritures parallèles à réparer : {results['pending_repairs']}")
+    print("=" * 96)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark des chemins critiques des repositories")
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS),
+                        help=f"Scénarios séparés par des virgules ({', '.join(SCENARIOS)})")
+    parser.add_argument('--ops', type=int, default=2000, help="Opérations par scénario")
+    parser.add_argument('--concurrency', type=int, default=16, help="Nombre de workers simultanés")
+    parser.add_argument('--books', type=int, default=1000, help="Taille du catalogue de test")
+    parser.add_argument('--users', type=int, default=100, help="Nombre de membres de test")
+    parser.add_argument('--skip-seed', action='store_true', help="Réutiliser un jeu de test déjà chargé")
+    parser.add_argument('--seed', type=int, default=42, help="Graine aléatoire (reproductibilité)")
+    parser.add_argument('--memory', action='store_true', help="Session en mémoire (sans cluster)")
+    parser.add_argument('--latency-ms', type=float, default=0.0,
+                        help="Aller-retour réseau simulé en mode --memory")
+    parser.add_argument('--cache', action='store_true', help="Activer le cache livres / membres")
+    parser.add_argument('--skip-startup', action='store_true',
+                        help="Ne pas mesurer le temps de démarrage (connexion + préparations)")
+    parser.add_argument('--skip-scan', action='store_true',
+                        help="Ne pas mesurer la lecture complète du catalogue (SELECT unique vs plages de tokens)")
+    parser.add_argument('--output', help="Fichier JSON de résultats")
+    parser.add_argument('--baseline', help="Fichier JSON de référence à comparer")
+    parser.add_argument('--tolerance', type=float, default=0.20, help="Dégradation tolérée (0.20 = 20%%)")
+    args = parser.parse_args()
+
+    names = [n.strip() for n in args.scenarios.split(',') if n.strip()]
+    unknown = [n for n in names if n not in SCENARIOS]
+    if unknown:
+        parser.error(f"Scénarios inconnus : {', '.join(unknown)}")
+
+    if args.memory:
+        connection_factory = lambda: MemoryConnection(latency=args.latency_ms / 1000.0)
+    else:
+        connection_factory = CassandraConnection
+    db = connection_factory()
     session = db.connect()
-    repo = BookRepository(session)
-    
-    logger.info(f"🚀 Lancement du benchmark : Insertion de {count} livres...")
-    start_time = time.time()
-    
-    for i in range(count):
-        book = Book(
-            isbn=f"BENCH-{i}",
-            title=f"Livre de test {i}",
-            author="Robot Benchmark",
-            category="Science",
-            publisher="DataGen",
-            publication_year=2024,
-            total_copies=10,
-            available_copies=10
-        )
-        repo.add_book(book)
-    
-    end_time = time.time()
-    duration = end_time - start_time
-    
-    print("\n" + "="*30)
-    print(f"📊 RÉSULTATS DU BENCHMARK")
-    print(f"Nombre d'insertions : {count}")
-    print(f"Temps total         : {duration:.2f} secondes")
-    print(f"Moyenne par livre   : {(duration/count)*1000:.2f} ms")
-    print("="*30)
-    
-    db.close()
+    try:
+        ctx = BenchContext(session, args.books, max(args.users, args.concurrency), cache=args.cache)
+        if not args.skip_seed:
+            ctx.seed(session)
+
+        results = {
+            'meta': {
+                'timestamp': datetime.now().isoformat(timespec='seconds'),
+                'host': platform.node(),
+                'backend': 'memory' if args.memory else 'cassandra',
+                'latency_ms': args.latency_ms,
+                'cache': args.cache,
+                'ops': args.ops,
+                'concurrency': args.concurrency,
+                'books': args.books,
+                'users': len(ctx.users),
+            },
+            'scenarios': {},
+        }
+        for name in names:
+            results['scenarios'][name] = run_scenario(ctx, name, SCENARIOS[name],
+                                                      args.ops, args.concurrency, args.seed)
+        # Les deux modes d'écriture partagent la même table de stock : on cumule
+        stock = ctx.borrow_repo.stock.stats()
+        for name, value in ctx.borrow_repo_parallel.stock.stats().items():
+            stock[name] += value
+        stock['conflict_ratio'] = round(stock['conflicts'] / stock['attempts'], 3) if stock['attempts'] else 0.0
+        results['stock_contention'] = stock
+        results['pending_repairs'] = len(ctx.borrow_repo_parallel.journal)
+        if not args.skip_startup:
+            results['startup'] = measure_startup(connection_factory, ctx.isbns[0])
+        if not args.skip_scan:
+            results['scan'] = measure_scan(session)
+        print_report(results)
+
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump(results, f, indent=2)
+            logger.success(f"✅ Résultats écrits dans {args.output}")
+
+        if args.baseline:
+            with open(args.baseline, 'r', encoding='utf-8') as f:
+                baseline = json.load(f)
+            regressions = compare_with_baseline(results, baseline, args.tolerance)
+            if regressions:
+                for line in regressions:
+                    logger.error(f"❌ Régression : {line}")
+                return 1
+            logger.success("✅ Aucune régression par rapport à la référence")
+        return 0
+    finally:
+        db.close()
 
 if __name__ == "__main__":
-    run_benchmark(500) # Le test debutera par 500 afin de vérifier
\ No newline at end of file
+    sys.exit(main())
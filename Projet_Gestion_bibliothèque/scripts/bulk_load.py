@@ -0,0 +1,42 @@
+import sys
+import os
+import argparse
+import itertools
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.database import CassandraConnection
+from models.loader import BulkLoader, read_records
+from loguru import logger
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Chargement massif de livres, d'utilisateurs ou d'emprunts (CSV / JSONL)")
+    parser.add_argument('kind', choices=['books', 'users', 'borrows'], help='Type de données à charger')
+    parser.add_argument('paths', nargs='+', metavar='path',
+                        help="Fichier(s) .csv ou .jsonl ('-' pour stdin en JSONL), chargés à la suite")
+    parser.add_argument('--concurrency', type=int, default=128, help='Nombre max de requêtes en vol')
+    parser.add_argument('--retries', type=int, default=3, help='Rejeux par écriture en échec')
+    parser.add_argument('--report-every', type=int, default=10000, help='Fréquence du rapport de progression')
+    args = parser.parse_args()
+
+    db = CassandraConnection()
+    session = db.connect()
+    try:
+        loader = BulkLoader(session, concurrency=args.concurrency,
+                            max_retries=args.retries, report_every=args.report_every)
+        records = itertools.chain.from_iterable(read_records(path) for path in args.paths)
+        if args.kind == 'books':
+            report = loader.load_books(records)
+        elif args.kind == 'borrows':
+            report = loader.load_borrows(records)
+        else:
+            report = loader.load_users(records)
+
+        logger.info(f"📊 {report.records / report.elapsed if report.elapsed else 0:,.0f} lignes/s")
+        return 1 if report.failed else 0
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,92 +1,48 @@
 import sys
 import os
+import argparse
+from datetime import datetime
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-
-from faker import Faker
-from uuid import uuid4
-from random import randint, choice
-from models.book import BookRepository, Book
-from models.user import UserRepository
-from config.database import CassandraConnection
+from models.generator import DatasetGenerator
 from loguru import logger
 
-fake = Faker('fr_FR')
-
-def generate_books(book_repo, count=100):
-    """Générer des livres aléatoires"""
-    categories = ['Science Fiction', 'Fantasy', 'Thriller', 'Romance',
-                  'Histoire', 'Science', 'Biographie', 'Philosophie']
-
-    publishers = ['Gallimard', 'Flammarion', 'Hachette', 'Albin Michel', 'Seuil']
-
-    logger.info(f"🎲 Génération de {count} livres...")
-
-    for i in range(count):
-        isbn = f"978-{randint(0,9)}-{randint(100000,999999)}-{randint(10,99)}-{randint(0,9)}"
-
-        book = Book(
-            isbn=isbn,
-            title=fake.sentence(nb_words=4)[:-1],  # Titre aléatoire
-            author=fake.name(),
-            category=choice(categories),
-            publisher=choice(publishers),
-            publication_year=randint(1950, 2024),
-            total_copies=randint(1, 10),
-            available_copies=randint(0, 10),
-            description=fake.text(max_nb_chars=200)
-        )
-
-        book_repo.add_book(book)
-
-        if (i + 1) % 10 == 0:
-            logger.info(f"  ✅ {i+1}/{count} livres créés")
-
-    logger.success(f"✅ {count} livres générés!")
-
-def generate_users(user_repo, count=50):
-    """Générer des utilisateurs aléatoires"""
-    logger.info(f"👥 Génération de {count} utilisateurs...")
-
-    user_ids = []
-
-    for i in range(count):
-        email = fake.email()
-        first_name = fake.first_name()
-        last_name = fake.last_name()
-        phone = fake.phone_number()
-        address = fake.address().replace('\n', ', ')
-
-        user_id = user_repo.create_user(
-            email=email,
-            first_name=first_name,
-            last_name=last_name,
-            phone=phone,
-            address=address
-        )
-
-        user_ids.append(user_id)
-
-        if (i + 1) % 10 == 0:
-            logger.info(f"  ✅ {i+1}/{count} utilisateurs créés")
-
-    logger.success(f"✅ {count} utilisateurs générés!")
-    return user_ids
+def main():
+    parser = argparse.ArgumentParser(
+        description="Peuplement de la base : livres, membres et historique d'emprunts synthétiques")
+    parser.add_argument('--books', type=int, default=100, help='Nombre de livres')
+    parser.add_argument('--users', type=int, default=50, help='Nombre de membres')
+    parser.add_argument('--loans-per-year', type=float, default=4.0,
+                        help="Emprunts par membre et par an depuis son inscription (moyenne)")
+    parser.add_argument('--years', type=float, default=3, help="Profondeur de l'historique (années)")
+    parser.add_argument('--loan-days', type=int, default=21, help="Durée d'un prêt : plus récent, il est en cours")
+    parser.add_argument('--zipf', type=float, default=1.1, help='Exposant de popularité des titres (loi de Zipf)')
+    parser.add_argument('--until', default=None, help="Date de fin de l'historique (ISO, défaut : aujourd'hui)")
+    parser.add_argument('--seed', type=int, default=42, help='Graine : même graine, même jeu de données')
+    parser.add_argument('--shard-size', type=int, default=10000, help='Livres ou membres par lot')
+    parser.add_argument('--pool-size', type=int, default=5000, help='Valeurs Faker tirées par réserve')
+    parser.add_argument('--processes', type=int, default=None, help='Processus de génération (défaut : nb de CPU)')
+    parser.add_argument('--output', default=None,
+                        help="Répertoire de fichiers JSONL pour scripts/bulk_load.py (défaut : écriture sur le cluster)")
+    parser.add_argument('--concurrency', type=int, default=128, help='Requêtes en vol par processus (cluster)')
+    args = parser.parse_args()
+
+    generator = DatasetGenerator(
+        books=args.books, users=args.users, loans_per_year=args.loans_per_year, years=args.years,
+        loan_days=args.loan_days, zipf=args.zipf, seed=args.seed, shard_size=args.shard_size,
+        pool_size=args.pool_size, until=datetime.fromisoformat(args.until) if args.until else None,
+        processes=args.processes, output=args.output, concurrency=args.concurrency)
+    report = generator.run()
+
+    logger.info(f"📊 {(report.books + report.users + report.loans) / report.elapsed if report.elapsed else 0:,.0f} "
+                f"enregistrements/s")
+    if args.output:
+        logger.info(f"🔧 Chargement : python -m scripts.bulk_load users {args.output}/users-*.jsonl "
+                    f"(puis borrows et books)")
+    else:
+        logger.success("🎉 Base de données peuplée!")
+    return 0
 
 if __name__ == "__main__":
-    db = CassandraConnection()
-    session = db.connect()
-
-    
-    session.set_keyspace('library_system')
-
-    book_repo = BookRepository(session)
-    user_repo = UserRepository(session)
-
-    # Générer des données
-    generate_books(book_repo, count=100)
-    user_ids = generate_users(user_repo, count=50)
-
-    logger.success("🎉 Base de données peuplée!")
-    db.close()
\ No newline at end of file
+    sys.exit(main())
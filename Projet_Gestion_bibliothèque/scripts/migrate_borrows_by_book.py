@@ -0,0 +1,45 @@
+import sys
+import os
+import argparse
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.database import CassandraConnection
+from models.loader import BulkLoader
+from models.scan import add_scan_arguments, scanner_from_args
+from loguru import logger
+
+def read_old_rows(scanner):
+    """Parcourt borrows_by_book par plages de tokens (mémoire bornée quelle que soit la taille)"""
+    for row in scanner.scan():
+        yield row._asdict()
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Copie borrows_by_book vers borrows_by_book_monthly (partitions par ISBN et par mois)")
+    parser.add_argument('--page-size', type=int, default=1000, help='Lignes lues par page')
+    parser.add_argument('--concurrency', type=int, default=128, help='Nombre max d\'écritures en vol')
+    parser.add_argument('--report-every', type=int, default=10000, help='Fréquence du rapport de progression')
+    add_scan_arguments(parser)
+    args = parser.parse_args()
+
+    db = CassandraConnection()
+    session = db.connect()
+    try:
+        # Les écritures sont idempotentes : la migration peut être relancée sans doublon
+        loader = BulkLoader(session, concurrency=args.concurrency, report_every=args.report_every)
+        scanner = scanner_from_args(session, args, 'borrows_by_book', 'isbn, borrow_date, user_id, user_name', 'isbn')
+        report = loader.load_book_borrows(read_old_rows(scanner))
+        # Parcours allé au bout : une relance (même après échecs) repart de zéro
+        if scanner.checkpoint is not None:
+            scanner.checkpoint.clear()
+        if report.failed:
+            logger.error(f"❌ {report.failed} lignes non copiées : relancer la migration")
+            return 1
+        logger.success(f"🎉 Migration terminée : {report.records} emprunts copiés")
+        return 0
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    sys.exit(main())
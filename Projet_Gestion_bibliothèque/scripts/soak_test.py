@@ -0,0 +1,98 @@
+import sys
+import os
+import json
+import argparse
+import platform
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.database import CassandraConnection
+from config.memory_session import MemoryConnection
+from models.borrow import WRITE_BATCH, WRITE_PARALLEL
+from models.soak import SoakTest, parse_mix, OPERATIONS
+from loguru import logger
+
+def print_report(report):
+    print("\n" + "=" * 96)
+    print(f"📊 ESSAI D'ENDURANCE {report.run_id} ({report.patrons} membres, {report.elapsed} s)")
+    print(f"{'Opération':<12}{'ops':>8}{'échecs':>8}{'refus':>8}{'ops/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for name in OPERATIONS:
+        r = report.operations[name]
+        rate = round(r['count'] / report.elapsed, 1) if report.elapsed else 0.0
+        print(f"{name:<12}{r['count']:>8}{r['failed']:>8}{r['refused']:>8}{rate:>10}"
+              f"{r['p50_ms']:>10}{r['p95_ms']:>10}{r['p99_ms']:>10}{r['max_ms']:>10}")
+    rates = [w['throughput_ops'] for w in report.timeline if w['count']]
+    if rates:
+        print(f"Débit par fenêtre : min {min(rates)}, max {max(rates)} ops/s ({len(rates)} fenêtres)")
+    stock = report.stock
+    print(f"Stock (CAS) : {stock['attempts']} tentatives, {stock['conflicts']} conflits, "
+          f"{stock['retries']} rejeux, {stock['exhausted']} abandons")
+    if report.pending_repairs:
+        print(f"Écritures parallèles à réparer : {report.pending_repairs}")
+    inv = report.invariants
+    print(f"Invariants : {inv.books} livres, {inv.active_loans} prêts en cours, {inv.borrows} emprunts, "
+          f"{len(inv.violations)} violation(s)")
+    print("=" * 96)
+
+def main():
+    parser = argparse.ArgumentParser(description="Essai d'endurance : membres simultanés puis contrôle des invariants")
+    parser.add_argument('--duration', type=float, default=60.0, help="Durée de l'essai (secondes)")
+    parser.add_argument('--patrons', type=int, default=32, help="Nombre de membres simultanés")
+    parser.add_argument('--mix', default="search=50,borrow=20,return=20,history=10",
+                        help=f"Poids des opérations ({', '.join(OPERATIONS)})")
+    parser.add_argument('--books', type=int, default=500, help="Taille du catalogue de l'essai")
+    parser.add_argument('--copies', type=int, default=3, help="Exemplaires par livre")
+    parser.add_argument('--zipf', type=float, default=1.1, help="Exposant de popularité des ISBN")
+    parser.add_argument('--max-loans', type=int, default=5, help="Emprunts simultanés maximum par membre")
+    parser.add_argument('--think-ms', type=float, default=0.0, help="Pause moyenne entre deux opérations d'un membre")
+    parser.add_argument('--interval', type=float, default=5.0, help="Fenêtre de mesure du débit (secondes)")
+    parser.add_argument('--write-mode', choices=[WRITE_BATCH, WRITE_PARALLEL], default=WRITE_BATCH,
+                        help="Écritures d'un emprunt : batch logué ou requêtes parallèles")
+    parser.add_argument('--seed', type=int, default=42, help="Graine aléatoire (reproductibilité)")
+    parser.add_argument('--memory', action='store_true', help="Session en mémoire (sans cluster)")
+    parser.add_argument('--latency-ms', type=float, default=0.0,
+                        help="Aller-retour réseau simulé en mode --memory")
+    parser.add_argument('--output', help="Fichier JSON de résultats")
+    args = parser.parse_args()
+
+    try:
+        mix = parse_mix(args.mix)
+    except ValueError as e:
+        parser.error(str(e))
+
+    db = MemoryConnection(latency=args.latency_ms / 1000.0) if args.memory else CassandraConnection()
+    session = db.connect()
+    try:
+        soak = SoakTest(session, patrons=args.patrons, duration=args.duration, mix=mix, books=args.books,
+                        copies=args.copies, zipf=args.zipf, max_loans=args.max_loans,
+                        interval=args.interval, think=args.think_ms / 1000.0, seed=args.seed,
+                        write_mode=args.write_mode)
+        soak.seed_data()
+        report = soak.run()
+        print_report(report)
+
+        if args.output:
+            results = report._asdict()
+            results['invariants'] = report.invariants._asdict()
+            results['invariants']['violations'] = [v._asdict() for v in report.invariants.violations]
+            results['meta'] = {
+                'timestamp': datetime.now().isoformat(timespec='seconds'),
+                'host': platform.node(),
+                'backend': 'memory' if args.memory else 'cassandra',
+                'latency_ms': args.latency_ms,
+                'mix': mix,
+                'books': args.books,
+                'copies': args.copies,
+                'zipf': args.zipf,
+                'write_mode': args.write_mode,
+            }
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump(results, f, indent=2)
+            logger.success(f"✅ Résultats écrits dans {args.output}")
+        return 1 if report.invariants.violations else 0
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,18 @@
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from config.database import CassandraConnection
+from config.memory_session import MemoryConnection
+
+# LIBRARY_TEST_BACKEND=cassandra pour exécuter les tests sur le cluster Docker
+BACKEND = os.environ.get('LIBRARY_TEST_BACKEND', 'memory')
+
+@pytest.fixture
+def session():
+    db = CassandraConnection() if BACKEND == 'cassandra' else MemoryConnection()
+    sess = db.connect()
+    yield sess
+    db.close()
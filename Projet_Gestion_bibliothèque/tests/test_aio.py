@@ -0,0 +1,90 @@
+import sys
+import os
+import time
+import asyncio
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.memory_session import MemoryConnection
+from models.book import Book, BookRepository
+from models.user import UserRepository
+from models.borrow import BorrowRepository, WRITE_PARALLEL
+from models.aio import (AsyncBookRepository, AsyncUserRepository, AsyncBorrowRepository,
+                        fetch_all, prepare)
+
+def test_concurrent_borrows_never_oversell(session):
+    books = AsyncBookRepository(BookRepository(session))
+    users = AsyncUserRepository(UserRepository(session))
+    borrows = AsyncBorrowRepository(BorrowRepository(session, write_mode=WRITE_PARALLEL))
+
+    async def scenario():
+        await prepare(books, users, borrows)
+        await books.add_book(Book("AIO-1", "Asynchrone", "Auteur", "Async", total_copies=5))
+        members = await asyncio.gather(*(users.create_user(f"aio{i}@example.com", "Aio", f"M{i}")
+                                         for i in range(12)))
+        results = await asyncio.gather(*(borrows.borrow(member, "AIO-1") for member in members))
+        book = await books.get_book_by_isbn("AIO-1")
+        loans = await borrows.get_active_loans(members[results.index(True)])
+        return results, book, loans
+
+    results, book, loans = asyncio.run(scenario())
+    assert results.count(True) == 5
+    assert book.available_copies == 0
+    assert [loan.isbn for loan in loans] == ["AIO-1"]
+
+def test_return_and_paging(session):
+    repo = BookRepository(session)
+    for i in range(7):
+        repo.add_book(Book(f"AIOP-{i}", f"Titre {i}", "Auteur", "Pages", total_copies=1))
+    user_id = UserRepository(session).create_user("aio-return@example.com", "Aio", "Retour")
+    borrows = AsyncBorrowRepository(BorrowRepository(session))
+
+    async def scenario():
+        statement = repo.prep_get_by_cat
+        statement.fetch_size = 3
+        rows = await fetch_all(session, statement, ["Pages"])
+        borrowed = await borrows.borrow(user_id, "AIOP-2")
+        returned = await borrows.return_book(user_id, "AIOP-2")
+        twice = await borrows.return_book(user_id, "AIOP-2")
+        history = await borrows.get_user_borrows(user_id)
+        return rows, borrowed, returned, twice, history
+
+    rows, borrowed, returned, twice, history = asyncio.run(scenario())
+    assert [row.isbn for row in rows] == [f"AIOP-{i}" for i in range(7)]
+    assert (borrowed, returned, twice) == (True, True, False)
+    assert [row.status for row in history] == ['RETURNED']
+    assert repo.get_book_by_isbn("AIOP-2").available_copies == 1
+
+def test_concurrent_returns_of_one_loan_release_one_copy():
+    session = MemoryConnection(latency=0.01).connect()
+    repo = BookRepository(session)
+    repo.add_book(Book("AIOR-1", "Exemplaire unique", "Auteur", "Async", total_copies=1))
+    borrows = AsyncBorrowRepository(BorrowRepository(session))
+    user_id = UserRepository(session).create_user("aio-twice@example.com", "Aio", "Double")
+
+    async def scenario():
+        await borrows.borrow(user_id, "AIOR-1")
+        return await asyncio.gather(borrows.return_book(user_id, "AIOR-1"),
+                                    borrows.return_book(user_id, "AIOR-1"))
+
+    assert sorted(asyncio.run(scenario())) == [False, True]
+    assert repo.get_book_by_isbn("AIOR-1").available_copies == 1
+
+def test_lookups_overlap_on_one_event_loop():
+    db = MemoryConnection(latency=0.02)
+    session = db.connect()
+    repo = BookRepository(session)
+    repo.add_book(Book("AIOL-1", "Latence", "Auteur", "Async"))
+    books = AsyncBookRepository(repo)
+
+    async def scenario():
+        await prepare(books)
+        start = time.perf_counter()
+        rows = await asyncio.gather(*(books.get_book_by_isbn("AIOL-1") for _ in range(50)))
+        return rows, time.perf_counter() - start
+
+    rows, elapsed = asyncio.run(scenario())
+    db.close()
+    assert all(row.title == "Latence" for row in rows)
+    # 50 lectures de 20 ms en vol ensemble, pas l'une après l'autre
+    assert elapsed < 0.5
@@ -0,0 +1,40 @@
+import sys
+import os
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from uuid import uuid4
+from models.cache import LRUCache, MISSING
+from models.book import BookRepository, Book
+from models.user import UserRepository
+from models.borrow import BorrowRepository
+
+def test_lru_eviction_and_ttl():
+    cache = LRUCache(maxsize=2, ttl=0.05)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')          # 'a' devient le plus récent
+    cache.set('c', 3)       # 'b' est évincé
+    assert cache.get('b') is MISSING
+    assert cache.get('a') == 1
+    time.sleep(0.06)
+    assert cache.get('a') is MISSING
+    stats = cache.stats()
+    assert stats['evictions'] == 1 and stats['hits'] == 2 and stats['misses'] == 2
+
+def test_borrow_updates_cached_stock(session):
+    cache = LRUCache()
+    books = BookRepository(session, cache=cache)
+    users = UserRepository(session, cache=LRUCache())
+    borrows = BorrowRepository(session, book_cache=cache)
+    books.add_book(Book("CACHE-1", "Titre", "Auteur", "Test", total_copies=2))
+    user_id = users.create_user(f"cache-{uuid4().hex[:8]}@example.com", "Cache", "Test")
+
+    assert books.get_book_by_isbn("CACHE-1").available_copies == 2
+    assert users.get_user(user_id) is users.get_user(user_id)
+    assert borrows.borrow_book(user_id, "Cache Test", "CACHE-1", "Titre")
+    # Servi depuis le cache, déjà à jour
+    hits = cache.stats()['hits']
+    assert books.get_book_by_isbn("CACHE-1").available_copies == 1
+    assert cache.stats()['hits'] == hits + 1
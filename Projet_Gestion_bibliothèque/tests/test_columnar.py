@@ -0,0 +1,40 @@
+import sys
+import os
+import uuid
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.book import Book, BookRepository
+from models.user import User, UserRepository
+from models.columnar import ColumnBatch, uuid_strings
+
+def test_columnar_page_matches_row_page(session):
+    users = UserRepository(session)
+    for i in range(12):
+        users.create_user(f"col-{uuid.uuid4().hex[:8]}@example.com", "Col", f"User{i}")
+
+    rows = users.get_users_page(page_size=5)
+    columns = users.get_users_page(page_size=5, columnar=True)
+    assert isinstance(columns.rows, ColumnBatch)
+    assert len(columns.rows) == len(rows.rows) == 5
+    assert columns.cursor is not None
+    assert columns.rows['user_id'] == [row.user_id for row in rows.rows]
+
+    frame = columns.rows.to_frame()
+    assert frame['user_id'].tolist() == [str(row.user_id) for row in rows.rows]
+    assert str(frame['registration_date'].dtype).startswith('datetime64')
+
+def test_category_listing_in_columns(session):
+    books = BookRepository(session)
+    for i in range(3):
+        books.add_book(Book(f"COL-{i}", f"Titre {i}", "Auteur", "Colonnes", total_copies=2))
+    batch = books.get_books_by_category("Colonnes", columnar=True)
+    assert batch['isbn'] == ["COL-0", "COL-1", "COL-2"]
+    assert len(books.get_books_by_category("Vide", columnar=True)) == 0
+
+def test_uuid_strings_and_slots():
+    values = [uuid.uuid4(), None, uuid.uuid4()]
+    assert list(uuid_strings(values)) == [str(values[0]), None, str(values[2])]
+    user = User(uuid.uuid4(), "A", "B", "a@b.c", None)
+    assert not hasattr(user, '__dict__')
+    assert not hasattr(Book("X", "T", "A", "C"), '__dict__')
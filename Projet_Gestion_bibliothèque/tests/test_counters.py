@@ -0,0 +1,42 @@
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from uuid import uuid4
+from models.book import BookRepository, Book
+from models.user import UserRepository
+from models.borrow import BorrowRepository
+from models.counters import CounterAggregator
+
+def test_counters_are_coalesced_and_flushed_in_batches(session):
+    counters = CounterAggregator(session, flush_interval=60, flush_events=1000)
+    for _ in range(10):
+        counters.increment('total_borrows')
+    counters.increment('active_loans', 3)
+
+    # Rien n'est écrit avant le flush, mais la lecture inclut les variations en attente
+    assert session.table('statistics') == []
+    assert counters.read()['total_borrows'] == 10
+
+    assert counters.flush() == 2
+    assert counters.read(('total_borrows', 'active_loans')) == {'total_borrows': 10, 'active_loans': 3}
+    assert counters.stats()['flushes'] == 1
+    counters.close()
+
+def test_repositories_record_statistics(session):
+    counters = CounterAggregator(session, flush_interval=0.01)
+    books = BookRepository(session, counters=counters)
+    users = UserRepository(session, counters=counters)
+    borrows = BorrowRepository(session, counters=counters)
+    books.add_book(Book("STAT-1", "Titre", "Auteur", "Test", total_copies=2))
+    user_id = users.create_user(f"stats-{uuid4().hex[:8]}@example.com", "Stat", "Lecteur")
+
+    assert borrows.borrow_book(user_id, "Stat Lecteur", "STAT-1", "Titre")
+    report = borrows.borrow_many([(user_id, "STAT-1")])
+    assert borrows.return_book(user_id, "STAT-1", report[0].borrow_date)
+    counters.close()
+
+    rows = {row['metric_name']: row['value'] for row in session.table('statistics')}
+    assert rows == {'total_books': 1, 'total_users': 1, 'total_borrows': 2,
+                    'active_loans': 1, 'total_returns': 1}
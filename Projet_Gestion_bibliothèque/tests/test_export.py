@@ -0,0 +1,95 @@
+import sys
+import os
+import csv
+import json
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from models.book import Book, BookRepository
+from models.user import UserRepository
+from models.borrow import BorrowRepository
+from models import export
+from models.export import TableExporter
+
+def add_books(session, count):
+    repo = BookRepository(session)
+    for i in range(count):
+        repo.add_book(Book(f"EXP-{i}", f"Titre, \"{i}\"", "Auteur", "Export", total_copies=2))
+
+def read_isbns(path):
+    with open(path, encoding='utf-8', newline='') as f:
+        return [row['isbn'] for row in csv.DictReader(f)]
+
+def test_export_formats(session, tmp_path):
+    add_books(session, 25)
+    user_id = UserRepository(session).create_user("export@example.com", "Ex", "Port")
+    BorrowRepository(session).borrow_book(user_id, "Ex Port", "EXP-3", "Titre 3")
+
+    report = TableExporter(session, 'books', str(tmp_path / "books.csv"), chunk_size=10).run()
+    isbns = read_isbns(tmp_path / "books.csv")
+    assert report.rows == len(isbns)
+    assert {f"EXP-{i}" for i in range(25)} <= set(isbns)
+    assert not os.path.exists(tmp_path / "books.csv.checkpoint")
+
+    TableExporter(session, 'book-borrows', str(tmp_path / "loans.jsonl")).run()
+    with open(tmp_path / "loans.jsonl", encoding='utf-8') as f:
+        loans = [json.loads(line) for line in f]
+    assert [(l['isbn'], l['user_id']) for l in loans if l['isbn'] == "EXP-3"] == [("EXP-3", str(user_id))]
+
+    pd = pytest.importorskip("pandas")
+    pytest.importorskip("pyarrow")
+    TableExporter(session, 'books', str(tmp_path / "books.parquet"), chunk_size=10).run()
+    frame = pd.read_parquet(tmp_path / "books.parquet")
+    assert sorted(frame['isbn']) == sorted(isbns)
+
+def test_interrupted_export_resumes_without_duplicates(session, tmp_path, monkeypatch):
+    add_books(session, 40)
+    path = str(tmp_path / "books.csv")
+    commit = export.CsvWriter.commit
+    calls = []
+
+    def failing_commit(self):
+        calls.append(1)
+        if len(calls) == 3:
+            # Lignes écrites mais jamais validées
+            self.write(None, [["PARTIEL"]])
+            raise KeyboardInterrupt
+        return commit(self)
+
+    monkeypatch.setattr(export.CsvWriter, 'commit', failing_commit)
+    with pytest.raises(KeyboardInterrupt):
+        TableExporter(session, 'books', path, chunk_size=5, splits=8, page_size=5).run()
+    assert os.path.exists(f"{path}.checkpoint")
+
+    monkeypatch.setattr(export.CsvWriter, 'commit', commit)
+    report = TableExporter(session, 'books', path, chunk_size=5, splits=8, page_size=5).run()
+    isbns = read_isbns(path)
+    assert report.resumed
+    assert "PARTIEL" not in isbns
+    assert len(isbns) == len(set(isbns)) == report.rows
+    assert {f"EXP-{i}" for i in range(40)} <= set(isbns)
+
+def test_empty_table_exports_a_csv_header(session, tmp_path):
+    path = tmp_path / "borrows.csv"
+    report = TableExporter(session, 'borrows', str(path)).run()
+    assert report.rows == 0
+    with open(path, encoding='utf-8', newline='') as f:
+        assert {'user_id', 'borrow_date', 'isbn', 'status'} <= set(next(csv.reader(f)))
+
+def test_parquet_parts_share_one_schema_with_a_sparse_column(session, tmp_path):
+    pd = pytest.importorskip("pandas")
+    pytest.importorskip("pyarrow")
+    repo = BookRepository(session)
+    for i in range(40):
+        # Description présente sur un livre sur vingt : absente de la plupart des lots
+        repo.add_book(Book(f"PQ-{i}", f"Titre {i}", "Auteur", "Parquet", total_copies=1,
+                           description="Résumé" if i % 20 == 0 else None))
+
+    path = tmp_path / "books.parquet"
+    report = TableExporter(session, 'books', str(path), chunk_size=5).run()
+    assert report.chunks > 2
+    frame = pd.read_parquet(path)
+    assert len(frame) == report.rows == 40
+    assert sorted(frame.loc[frame['description'].notna(), 'isbn']) == ["PQ-0", "PQ-20"]
+    assert frame['publication_year'].isna().all()
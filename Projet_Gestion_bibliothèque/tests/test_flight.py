@@ -0,0 +1,161 @@
+import sys
+import os
+import asyncio
+import threading
+from uuid import uuid4
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from config.memory_session import MemoryConnection
+from models.book import Book, BookRepository
+from models.borrow import BorrowRepository
+from models.cache import LRUCache
+from models.flight import SingleFlight
+from models.aio import AsyncBookRepository
+
+@pytest.fixture
+def slow_session():
+    # Latence simulée : les lectures concurrentes se chevauchent réellement
+    db = MemoryConnection(latency=0.05)
+    yield db.connect()
+    db.close()
+
+def test_concurrent_threads_share_one_read(slow_session):
+    flight = SingleFlight()
+    repo = BookRepository(slow_session, flight=flight)
+    repo.add_book(Book("SF-1", "Best-seller", "Auteur", "Nouveautés", total_copies=3))
+    repo.warm_up()
+
+    barrier = threading.Barrier(20)
+    results = []
+
+    def kiosk():
+        barrier.wait()
+        results.append(repo.get_book_by_isbn("SF-1"))
+
+    threads = [threading.Thread(target=kiosk) for _ in range(20)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    stats = flight.stats()
+    assert [row.title for row in results] == ["Best-seller"] * 20
+    assert stats['requests'] == 20
+    assert stats['executed'] < 5
+    assert stats['collapsed'] == 20 - stats['executed']
+    assert stats['in_flight'] == 0
+
+    # Rien n'est conservé après la réponse : la lecture suivante voit le nouveau stock
+    slow_session.execute("UPDATE books_by_id SET available_copies = 1 WHERE isbn = 'SF-1'")
+    assert repo.get_book_by_isbn("SF-1").available_copies == 1
+
+class PausedRead:
+    """Session dont la prochaine lecture d'un ISBN rend la main après l'écriture du test"""
+
+    def __init__(self, session):
+        self.session = session
+        self.read, self.resume = threading.Event(), threading.Event()
+
+    def execute(self, query, params=None, **kwargs):
+        result = self.session.execute(query, params, **kwargs)
+        if params and params[0] in ("SF-3", "SF-4") and not self.read.is_set():
+            self.read.set()
+            # Borné : une lecture qui attendrait ce vol ferait échouer le test au lieu de le bloquer
+            self.resume.wait(2)
+        return result
+
+    def __getattr__(self, name):
+        return getattr(self.session, name)
+
+def test_writes_forget_reads_started_before_them(session):
+    paused = PausedRead(session)
+    flight, cache = SingleFlight(), LRUCache()
+    books = BookRepository(paused, cache=cache, flight=flight)
+    borrows = BorrowRepository(paused, book_cache=cache, flight=flight)
+    books.warm_up()
+    borrows.warm_up()
+    session.execute("INSERT INTO books_by_id (isbn, title, total_copies, available_copies) "
+                    "VALUES ('SF-3', 'Titre', 3, 3)")
+
+    def read_before_write(isbn):
+        paused.read.clear()
+        paused.resume.clear()
+        reader = threading.Thread(target=books.get_book_by_isbn, args=(isbn,))
+        reader.start()
+        paused.read.wait()
+        return reader
+
+    # Stock lu (3) avant l'emprunt, réponse rendue après
+    reader = read_before_write("SF-3")
+    assert borrows.borrow_book(uuid4(), "Lecteur", "SF-3", "Titre")
+    assert books.get_book_by_isbn("SF-3").available_copies == 2
+    paused.resume.set()
+    reader.join()
+    # L'ancienne lecture n'a pas remis le stock périmé en cache
+    assert cache.get("SF-3").available_copies == 2
+
+    # ISBN lu inconnu avant l'ajout : la lecture suivante voit le livre
+    reader = read_before_write("SF-4")
+    books.add_book(Book("SF-4", "Nouveau", "Auteur", "Nouveautés"))
+    assert books.get_book_by_isbn("SF-4").title == "Nouveau"
+    paused.resume.set()
+    reader.join()
+    assert flight.stats()['forgotten'] == 2
+
+def test_async_callers_join_a_thread_read(slow_session):
+    flight = SingleFlight()
+    repo = BookRepository(slow_session, flight=flight)
+    repo.add_book(Book("SF-2", "Titre", "Auteur", "Nouveautés"))
+    repo.warm_up()
+    books = AsyncBookRepository(repo)
+
+    async def scenario():
+        lead = asyncio.create_task(asyncio.to_thread(repo.get_books_by_category, "Nouveautés"))
+        while not flight.stats()['in_flight']:
+            await asyncio.sleep(0.001)
+        rows = await asyncio.gather(*(books.get_books_by_category("Nouveautés") for _ in range(10)))
+        return await lead, rows
+
+    lead, rows = asyncio.run(scenario())
+    assert [r.isbn for r in lead] == ["SF-2"]
+    assert all([r.isbn for r in result] == ["SF-2"] for result in rows)
+    assert flight.stats()['executed'] == 1
+    assert flight.stats()['collapsed'] == 10
+
+def test_errors_reach_every_waiter_and_release_the_key():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def failing():
+        calls.append(1)
+        started.set()
+        release.wait()
+        raise RuntimeError("nœud indisponible")
+
+    errors = []
+
+    def call():
+        try:
+            flight.run(('k',), failing)
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    leader = threading.Thread(target=call)
+    leader.start()
+    started.wait()
+    followers = [threading.Thread(target=call) for _ in range(3)]
+    for t in followers:
+        t.start()
+    while flight.stats()['requests'] < 4:
+        pass
+    release.set()
+    for t in [leader] + followers:
+        t.join()
+
+    assert errors == ["nœud indisponible"] * 4
+    assert len(calls) == 1
+    assert flight.stats()['errors'] == 1
+    assert flight.run(('k',), lambda: 'ok') == 'ok'
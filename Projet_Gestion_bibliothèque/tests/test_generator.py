@@ -0,0 +1,53 @@
+import sys
+import os
+import glob
+from collections import Counter
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.generator import DatasetGenerator
+from models.loader import BulkLoader, read_records
+
+UNTIL = datetime(2026, 1, 1)
+
+def generate(directory, processes):
+    return DatasetGenerator(books=300, users=60, loans_per_year=6, shard_size=25, pool_size=200,
+                            until=UNTIL, processes=processes, output=str(directory)).run()
+
+def records(directory, kind):
+    for path in sorted(glob.glob(os.path.join(directory, f"{kind}-*.jsonl"))):
+        yield from read_records(path)
+
+def test_same_seed_same_dataset_whatever_the_process_count(tmp_path):
+    single = generate(tmp_path / "single", 1)
+    pooled = generate(tmp_path / "pooled", 2)
+    assert single[:5] == pooled[:5]
+    for path in glob.glob(str(tmp_path / "single" / "*.jsonl")):
+        with open(path, 'rb') as a, open(path.replace("single", "pooled"), 'rb') as b:
+            assert a.read() == b.read()
+
+def test_history_and_stock_are_consistent(session, tmp_path):
+    report = generate(tmp_path, 1)
+    loans = list(records(tmp_path, 'borrows'))
+    assert len(loans) == report.loans
+    assert len({(l['user_id'], l['borrow_date']) for l in loans}) == len(loans)
+
+    # Popularité de Zipf : le titre le plus emprunté dépasse largement la médiane
+    counts = sorted(Counter(l['isbn'] for l in loans).values(), reverse=True)
+    assert counts[0] > 5 * counts[len(counts) // 2]
+
+    loader = BulkLoader(session, report_every=10**9)
+    assert not loader.load_users(records(tmp_path, 'users')).failed
+    assert not loader.load_borrows(loans).failed
+    assert not loader.load_books(records(tmp_path, 'books')).failed
+
+    active = Counter(l['isbn'] for l in loans if l['status'] == 'ACTIVE')
+    assert sum(active.values()) == report.active
+    for isbn, borrowed in active.items():
+        book = session.execute("SELECT total_copies, available_copies FROM books_by_id WHERE isbn = %s",
+                               (isbn,)).one()
+        assert book.available_copies == book.total_copies - borrowed >= 0
+    user_id = loans[0]['user_id']
+    history = session.execute("SELECT isbn FROM borrows_by_user WHERE user_id = %s", (user_id,)).all()
+    assert len(history) == sum(1 for l in loans if l['user_id'] == user_id)
@@ -0,0 +1,70 @@
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.book import BookRepository, Book
+from models.flight import SingleFlight
+from models.instrumentation import QueryMetrics, _Series, serve_metrics
+
+def test_metrics_per_prepared_statement_and_host(session):
+    books = BookRepository(session)
+    metrics = QueryMetrics().install(session).register(books)
+    books.add_book(Book("MET-1", "Titre", "Auteur", "Test"))
+    for _ in range(3):
+        books.get_book_by_isbn("MET-1")
+    try:
+        session.execute("SELECT * FROM table_inconnue")
+    except Exception:
+        pass
+
+    statements = {row['statement']: row for row in metrics.snapshot()['statements']}
+    assert statements['BookRepository.prep_get_by_isbn']['count'] == 3
+    assert statements['BATCH']['count'] == 1
+    assert statements['SELECT * FROM table_inconnue']['errors'] == 1
+    assert sum(row['count'] for row in metrics.snapshot()['hosts']) == 5
+
+    text = metrics.prometheus()
+    assert 'library_cql_statement_requests_total{statement="BookRepository.prep_get_by_isbn"} 3' in text
+    assert 'library_cql_statement_duration_seconds_count{statement="BookRepository.prep_get_by_isbn"} 3' in text
+    assert 'error="InvalidRequest"' in text
+
+    metrics.uninstall()
+    books.get_book_by_isbn("MET-1")
+    assert metrics.snapshot()['statements'][0]['count'] == 3
+
+def test_exported_buckets_count_each_latency_under_its_bound():
+    metrics = QueryMetrics()
+    series = metrics._statements['probe'] = _Series()
+    # 0,99 ms et 1 ms : dans le bucket logarithmique qui chevauche la borne 1 ms
+    for seconds in (0.00099, 0.001, 0.0011, 0.02, 30.0):
+        series.count += 1
+        series.observe(seconds)
+
+    text = metrics.prometheus()
+    assert 'library_cql_statement_duration_seconds_bucket{statement="probe",le="0.001"} 2' in text
+    assert 'library_cql_statement_duration_seconds_bucket{statement="probe",le="0.0025"} 3' in text
+    assert 'library_cql_statement_duration_seconds_bucket{statement="probe",le="10.0"} 4' in text
+    assert 'library_cql_statement_duration_seconds_bucket{statement="probe",le="+Inf"} 5' in text
+
+def test_cli_reads_the_live_application_endpoint(session):
+    from click.testing import CliRunner
+    from cli.main import cli
+    books = BookRepository(session, flight=SingleFlight())
+    metrics = QueryMetrics(flight=books.flight).install(session).register(books)
+    books.add_book(Book("MET-2", "Titre", "Auteur", "Test"))
+    books.get_book_by_isbn("MET-2")
+    server = serve_metrics(metrics, 0, host='127.0.0.1')
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+        result = CliRunner().invoke(cli, ['metrics', '--url', url])
+        assert result.exit_code == 0, result.output
+        assert 'BookRepository.prep_get_by_isbn' in result.output
+        assert 'Lectures regroupées : 0 sur 1' in result.output
+    finally:
+        server.shutdown()
+        metrics.uninstall()
+
+    result = CliRunner().invoke(cli, ['metrics', '--url', url])
+    assert result.exit_code == 1
+    assert 'Métriques indisponibles' in result.output
@@ -0,0 +1,55 @@
+import sys
+import os
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from uuid import uuid4
+from datetime import datetime, timedelta
+from cassandra import InvalidRequest
+from cassandra.query import SimpleStatement
+from config.memory_session import MemorySession
+
+def test_clustering_order_and_limit():
+    session = MemorySession()
+    user_id = uuid4()
+    insert = session.prepare(
+        "INSERT INTO borrows_by_user (user_id, borrow_date, isbn, book_title, status) VALUES (?, ?, ?, ?, 'ACTIVE')")
+    start = datetime(2024, 1, 1)
+    for day in range(5):
+        session.execute(insert, (user_id, start + timedelta(days=day), f"ISBN-{day}", "Titre"))
+
+    rows = session.execute("SELECT isbn FROM borrows_by_user WHERE user_id = %s LIMIT 2", (user_id,)).all()
+    # borrow_date DESC : les emprunts les plus récents d'abord
+    assert [r.isbn for r in rows] == ["ISBN-4", "ISBN-3"]
+
+def test_paging_state_resumes_scan():
+    session = MemorySession()
+    insert = session.prepare("INSERT INTO books_by_author (author, isbn, title) VALUES (?, ?, ?)")
+    for i in range(25):
+        session.execute(insert, (f"Auteur {i}", f"ISBN-{i}", "Titre"))
+
+    first = session.execute(SimpleStatement("SELECT isbn FROM books_by_author", fetch_size=10))
+    assert len(first.current_rows) == 10 and first.has_more_pages
+    rest = session.execute(SimpleStatement("SELECT isbn FROM books_by_author", fetch_size=10),
+                           paging_state=first.paging_state)
+    assert len(list(rest)) == 15
+
+def test_latency_injection_overlaps_async_requests():
+    session = MemorySession(latency=0.02)
+    query = session.prepare("SELECT isbn FROM books_by_id WHERE isbn = ?")
+    start = time.perf_counter()
+    futures = [session.execute_async(query, [f"ISBN-{i}"]) for i in range(20)]
+    for future in futures:
+        future.result()
+    # 20 requêtes en parallèle : bien moins que 20 x 20 ms
+    assert time.perf_counter() - start < 0.2
+
+def test_null_partition_key_is_rejected_like_the_cluster():
+    session = MemorySession()
+    query = session.prepare("SELECT isbn FROM books_by_id WHERE isbn = ?")
+    with pytest.raises(InvalidRequest):
+        session.execute(query, [None])
+    with pytest.raises(InvalidRequest):
+        session.execute("SELECT isbn FROM books_by_id WHERE isbn IN %s", ([None, "X"],))
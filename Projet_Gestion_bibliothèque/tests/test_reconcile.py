@@ -0,0 +1,60 @@
+import sys
+import os
+import json
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.book import Book, BookRepository
+from models.reconcile import Reconciler
+
+def add_books(session, prefix, count):
+    repo = BookRepository(session)
+    for i in range(count):
+        repo.add_book(Book(f"{prefix}-{i}", f"Titre {i}", "Auteur Dérive", f"Cat-{prefix}", total_copies=3))
+    return repo
+
+def test_drift_is_reported_then_repaired(session, tmp_path):
+    add_books(session, "DRIFT", 5)
+    # Emprunt : seul books_by_id est mis à jour ; ligne d'auteur perdue
+    session.execute("UPDATE books_by_id SET available_copies = 1 WHERE isbn = 'DRIFT-2'")
+    session.execute("DELETE FROM books_by_author WHERE author = 'Auteur Dérive' AND isbn = 'DRIFT-4'")
+
+    reconciler = Reconciler(session, batch_size=2)
+    report_path = str(tmp_path / "drift.jsonl")
+    reconciler.run(report_path=report_path)
+    with open(report_path, encoding='utf-8') as f:
+        drifts = [json.loads(line) for line in f]
+    found = {(d['isbn'], d['table'], d['kind']) for d in drifts if d['isbn'].startswith("DRIFT-")}
+    assert found == {('DRIFT-2', 'books_by_category', 'stale'), ('DRIFT-4', 'books_by_author', 'missing')}
+
+    reconciler.run(repair=True)
+    reconciler.run(report_path=report_path)
+    with open(report_path, encoding='utf-8') as f:
+        assert not [line for line in f if '"DRIFT-' in line]
+    row = session.execute("SELECT available_copies FROM books_by_category "
+                          "WHERE category = 'Cat-DRIFT' AND isbn = 'DRIFT-2'").one()
+    assert row.available_copies == 1
+
+def test_incremental_run_skips_unchanged_books(session):
+    add_books(session, "INCR", 4)
+    watermark = datetime.now()
+    session.execute("UPDATE books_by_id SET available_copies = 0 WHERE isbn = 'INCR-1'")
+
+    report = Reconciler(session).run(since=watermark)
+    assert report.checked == 1
+    assert report.by_table == {'books_by_category.stale': 1}
+
+def test_repair_never_overwrites_a_newer_write(session):
+    add_books(session, "RACE", 1)
+    session.execute("UPDATE books_by_id SET available_copies = 2 WHERE isbn = 'RACE-0'")
+    reconciler = Reconciler(session)
+    books = list(reconciler._source().scan())
+    drifts = reconciler.check_batch(books)
+    # Réécriture de la ligne (nouvel ajout) entre le contrôle et la réparation
+    session.execute("INSERT INTO books_by_category (category, isbn, title, author, available_copies) "
+                    "VALUES ('Cat-RACE', 'RACE-0', 'Titre 0', 'Auteur Dérive', 5)")
+    reconciler.repair(books, drifts)
+    row = session.execute("SELECT available_copies FROM books_by_category "
+                          "WHERE category = 'Cat-RACE' AND isbn = 'RACE-0'").one()
+    assert row.available_copies == 5
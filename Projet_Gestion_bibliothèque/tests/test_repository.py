@@ -4,21 +4,14 @@ import os
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-import pytest
-from config.database import CassandraConnection
 from models.user import UserRepository
-from uuid import UUID
-
-@pytest.fixture(scope="module")
-def session():
-    db = CassandraConnection()
-    sess = db.connect()
-    yield sess
-    db.close()
+from models.book import BookRepository, Book
+from models.borrow import BorrowRepository
+from uuid import UUID, uuid4
 
 def test_user_creation_and_retrieval(session):
     repo = UserRepository(session)
-    email = "test@example.com"
+    email = f"test-{uuid4().hex[:8]}@example.com"
     
     # 1. Test création
     user_id = repo.create_user(email, "Test", "User")
@@ -27,4 +20,311 @@ def test_user_creation_and_retrieval(session):
     # 2. Test récupération
     user = repo.get_user(user_id)
     assert user is not None
-    assert user.email == email
\ No newline at end of file
+    assert user.email == email
+
+def test_email_is_unique_and_searchable(session):
+    repo = UserRepository(session)
+    email = f"Unique-{uuid4().hex[:8]}@Example.com"
+
+    user_id = repo.create_user(email, "Première", "Inscription")
+    assert user_id is not None
+    # Même adresse, casse et espaces différents : refusée sans parcours
+    assert repo.create_user(f"  {email.upper()} ", "Seconde", "Inscription") is None
+
+    user = repo.get_user_by_email(email.lower())
+    assert user.user_id == user_id
+    assert repo.get_user_by_email("inconnu@example.com") is None
+
+def test_bulk_import_skips_an_email_already_claimed(session):
+    from models.loader import BulkLoader
+    repo = UserRepository(session)
+    email = f"pris-{uuid4().hex[:8]}@example.com"
+    owner = repo.create_user(email, "Déjà", "Inscrit")
+    intruder, newcomer = uuid4(), uuid4()
+
+    records = [{'user_id': str(intruder), 'email': email.upper(), 'first_name': "Doublon", 'last_name': "Import"},
+               {'user_id': str(newcomer), 'email': f"new-{newcomer.hex[:8]}@example.com",
+                'first_name': "Nouveau", 'last_name': "Import"}]
+    report = BulkLoader(session).load_users(records)
+
+    assert (report.records, report.rejected) == (1, 1)
+    assert repo.get_user(intruder) is None
+    assert repo.get_user(newcomer) is not None
+    assert repo.get_user_by_email(email).user_id == owner
+    # Rechargement du même fichier : le membre importé garde son adresse, le doublon reste refusé
+    assert BulkLoader(session).load_users(records).rejected == 1
+    assert repo.get_user(newcomer) is not None
+
+def test_bulk_load_skips_malformed_records_and_keeps_going(session):
+    from models.loader import BulkLoader
+    loader = BulkLoader(session)
+    report = loader.load_books([
+        {'isbn': "BAD-1", 'title': "Stock illisible", 'total_copies': "beaucoup"},
+        {'isbn': "OK-1", 'title': "Bien formé", 'author': "Auteur", 'category': "Import", 'total_copies': 2},
+    ])
+    assert (report.records, report.rejected) == (1, 1)
+    assert BookRepository(session).get_book_by_isbn("OK-1").available_copies == 2
+    assert BookRepository(session).get_book_by_isbn("BAD-1") is None
+
+    report = loader.load_users([{'user_id': "pas-un-uuid", 'email': "x@example.com"},
+                                {'email': "y@example.com", 'registration_date': "hier"}])
+    assert (report.records, report.rejected) == (0, 2)
+    # Requêtes déclarées dans le registre de la session, partagées avec les repositories
+    assert loader.prep_insert_by_id is BookRepository(session).prep_insert_by_id
+
+def test_bulk_load_rejects_unreadable_jsonl_lines(session, tmp_path):
+    from models.loader import BulkLoader, InvalidLine, read_records
+    path = tmp_path / "books.jsonl"
+    path.write_text('{"isbn": "JL-1", "title": "Avant", "author": "A", "category": "Import"}\n'
+                    '{"isbn": "JL-2", "title": \n'
+                    '"juste une chaîne"\n'
+                    '["JL-3"]\n'
+                    '{"isbn": "JL-4", "title": "Après", "author": "A", "category": "Import"}\n',
+                    encoding='utf-8')
+
+    report = BulkLoader(session).load_books(read_records(str(path)))
+    assert (report.records, report.rejected, report.failed) == (2, 3, 0)
+    books = BookRepository(session)
+    assert books.get_book_by_isbn("JL-1") is not None and books.get_book_by_isbn("JL-4") is not None
+    assert [r.line for r in read_records(str(path)) if isinstance(r, InvalidLine)] == [2]
+
+def test_borrow_and_return_updates_stock(session):
+    books = BookRepository(session)
+    users = UserRepository(session)
+    borrows = BorrowRepository(session)
+    books.add_book(Book("TEST-ISBN-1", "Titre Test", "Auteur Test", "Test", total_copies=1))
+    user_id = users.create_user(f"borrower-{uuid4().hex[:8]}@example.com", "Lecteur", "Test")
+
+    assert borrows.borrow_book(user_id, "Lecteur Test", "TEST-ISBN-1", "Titre Test")
+    assert books.get_book_by_isbn("TEST-ISBN-1").available_copies == 0
+    # Plus de stock : le second emprunt est refusé
+    assert not borrows.borrow_book(user_id, "Lecteur Test", "TEST-ISBN-1", "Titre Test")
+
+    loan = borrows.get_user_borrows(user_id).one()
+    assert loan.status == 'ACTIVE'
+    assert borrows.return_book(user_id, "TEST-ISBN-1", loan.borrow_date)
+    assert books.get_book_by_isbn("TEST-ISBN-1").available_copies == 1
+    assert borrows.get_user_borrows(user_id).one().status == 'RETURNED'
+
+def test_catalogue_paging_with_cursor(session):
+    books = BookRepository(session)
+    for i in range(12):
+        books.add_book(Book(f"PAGE-{i}", f"Titre {i}", "Auteur", "Pagination"))
+
+    seen, cursor, pages = [], None, 0
+    while True:
+        page = books.get_books_page(page_size=5, cursor=cursor)
+        seen.extend(row.isbn for row in page.rows)
+        pages += 1
+        cursor = page.cursor
+        if cursor is None:
+            break
+    assert pages == 3
+    assert sorted(seen) == sorted(f"PAGE-{i}" for i in range(12))
+
+def test_active_loans_allow_return_by_isbn(session):
+    from models.borrow import new_loan
+
+    books = BookRepository(session)
+    borrows = BorrowRepository(session)
+    books.add_book(Book("ACT-1", "Premier", "Auteur", "Test", total_copies=2))
+    books.add_book(Book("ACT-2", "Second", "Auteur", "Test", total_copies=1))
+    user_id = uuid4()
+
+    # Horloge monotone : pas deux emprunts avec la même clé (user_id, borrow_date)
+    dates = [new_loan(user_id)[1] for _ in range(100)]
+    assert len(set(dates)) == 100
+
+    for isbn, title in (("ACT-1", "Premier"), ("ACT-1", "Premier"), ("ACT-2", "Second")):
+        assert borrows.borrow_book(user_id, "Lecteur", isbn, title)
+    assert sorted(loan.isbn for loan in borrows.get_active_loans(user_id)) == ["ACT-1", "ACT-1", "ACT-2"]
+
+    assert borrows.return_by_isbn(user_id, "ACT-1")
+    assert borrows.return_by_isbn(str(user_id), "ACT-2")
+    assert not borrows.return_by_isbn(user_id, "ACT-2")
+    assert [loan.isbn for loan in borrows.get_active_loans(user_id)] == ["ACT-1"]
+    assert sorted(row.status for row in borrows.get_user_borrows(user_id)) == ["ACTIVE", "RETURNED", "RETURNED"]
+    assert books.get_book_by_isbn("ACT-1").available_copies == 1
+    assert books.get_book_by_isbn("ACT-2").available_copies == 1
+
+def test_concurrent_borrows_never_oversell():
+    from concurrent.futures import ThreadPoolExecutor
+    from config.memory_session import MemorySession
+
+    # Latence simulée : les lectures et écritures des guichets s'entrelacent
+    session = MemorySession(latency=0.001)
+    books = BookRepository(session)
+    borrows = BorrowRepository(session)
+    books.add_book(Book("HOT-1", "Best-seller", "Auteur", "Test", total_copies=5))
+
+    def checkout(i):
+        return borrows.borrow_book(uuid4(), f"Lecteur {i}", "HOT-1", "Best-seller")
+
+    with ThreadPoolExecutor(max_workers=20) as pool:
+        results = list(pool.map(checkout, range(20)))
+
+    assert sum(results) == 5
+    assert books.get_book_by_isbn("HOT-1").available_copies == 0
+    assert borrows.stock.stats()['conflicts'] > 0
+
+def test_concurrent_returns_of_one_loan_release_one_copy():
+    from concurrent.futures import ThreadPoolExecutor
+    from config.memory_session import MemorySession
+
+    # Les deux guichets lisent la même ligne active avant que l'un la supprime
+    session = MemorySession(latency=0.01)
+    books = BookRepository(session)
+    borrows = BorrowRepository(session)
+    books.add_book(Book("RET-1", "Exemplaire unique", "Auteur", "Test", total_copies=1))
+    user_id = uuid4()
+    assert borrows.borrow_book(user_id, "Lecteur", "RET-1", "Exemplaire unique")
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        results = list(pool.map(lambda _: borrows.return_book(user_id, "RET-1"), range(2)))
+    assert sorted(results) == [False, True]
+    assert books.get_book_by_isbn("RET-1").available_copies == 1
+
+    assert borrows.borrow_book(user_id, "Lecteur", "RET-1", "Exemplaire unique")
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        reports = list(pool.map(lambda _: borrows.return_many([(user_id, "RET-1")]), range(2)))
+    assert sorted(report[0].ok for report in reports) == [False, True]
+    assert books.get_book_by_isbn("RET-1").available_copies == 1
+
+def test_parallel_writes_journal_and_repair_missing_table(session, monkeypatch):
+    from concurrent.futures import Future
+    from models.borrow import WRITE_PARALLEL
+
+    books = BookRepository(session)
+    borrows = BorrowRepository(session, write_mode=WRITE_PARALLEL)
+    books.add_book(Book("PAR-1", "Titre", "Auteur", "Test", total_copies=2))
+
+    # borrows_by_book_monthly indisponible : seule l'écriture par utilisateur passe
+    broken = {'on': True}
+    execute, execute_async = session.execute, session.execute_async
+
+    def failing(query):
+        error = Future()
+        error.set_exception(RuntimeError("WriteTimeout"))
+        return error
+
+    monkeypatch.setattr(session, 'execute_async', lambda query, *a, **k:
+        failing(query) if broken['on'] and query is borrows.prep_insert_book else execute_async(query, *a, **k))
+    monkeypatch.setattr(session, 'execute', lambda query, *a, **k:
+        failing(query).result() if broken['on'] and query is borrows.prep_insert_book else execute(query, *a, **k))
+
+    user_id = uuid4()
+    assert borrows.borrow_book(user_id, "Lecteur", "PAR-1", "Titre")
+    assert len(borrows.journal) == 1
+    assert len(session.table('borrows_by_book_monthly')) == 0
+
+    broken['on'] = False
+    assert borrows.repair_pending() == (1, 0)
+    assert len(borrows.journal) == 0
+    assert [row.user_id for row in borrows.get_book_borrows("PAR-1")] == [user_id]
+    assert books.get_book_by_isbn("PAR-1").available_copies == 1
+
+def test_borrow_many_and_return_many_report_per_item(session):
+    books = BookRepository(session)
+    users = UserRepository(session)
+    borrows = BorrowRepository(session)
+    books.add_book(Book("BULK-1", "Deux exemplaires", "Auteur", "Test", total_copies=2))
+    books.add_book(Book("BULK-2", "Un exemplaire", "Auteur", "Test", total_copies=1))
+    alice = users.create_user(f"alice-{uuid4().hex[:8]}@example.com", "Alice", "A")
+    bob = users.create_user(f"bob-{uuid4().hex[:8]}@example.com", "Bob", "B")
+
+    report = borrows.borrow_many([
+        (alice, "BULK-1"), (bob, "BULK-1"), (alice, "BULK-1"),
+        (alice, "BULK-2"), (bob, "INCONNU"), ("pas-un-uuid", "BULK-2"),
+    ])
+    assert [r.ok for r in report] == [True, True, False, True, False, False]
+    assert report[2].error == "Stock insuffisant"
+    assert report[4].error == "Livre inconnu"
+
+    # Clé manquante (colonne vide du fichier) : seule la ligne est rejetée, pas le lot
+    invalid = borrows.borrow_many([(None, "BULK-2"), (alice, None), (alice, "BULK-9")])
+    assert [r.error for r in invalid] == ["Entrée invalide : user_id manquant",
+                                         "Entrée invalide : isbn manquant", "Livre inconnu"]
+    assert [r.error for r in borrows.return_many([(bob, None)])] == ["Entrée invalide : isbn manquant"]
+    # Deux emprunts d'Alice dans le même lot : deux lignes distinctes
+    assert len(list(borrows.get_user_borrows(alice))) == 2
+    assert books.get_book_by_isbn("BULK-1").available_copies == 0
+
+    loans = [(r.user_id, r.isbn, r.borrow_date) for r in report if r.ok]
+    assert all(r.ok for r in borrows.return_many(loans))
+    # Réimporter le même fichier ne remet pas d'exemplaires en stock
+    assert [r.error for r in borrows.return_many(loans)] == ["Aucun emprunt en cours"] * 3
+    assert books.get_book_by_isbn("BULK-1").available_copies == 2
+    assert books.get_book_by_isbn("BULK-2").available_copies == 1
+
+class RoundTrips:
+    """Compte les requêtes d'une session et leurs allers-retours successifs.
+
+    Une requête envoyée après la fin d'une requête de la vague n appartient à
+    la vague n + 1 : les requêtes pipelinées partagent un même aller-retour.
+    """
+
+    def __init__(self, session):
+        self.requests = 0
+        self.waves = 0
+        self._in_flight = []
+        self._execute_async = session.execute_async
+        session.execute_async = self.execute_async
+
+    def _settle(self, wait=False):
+        for wave, future in list(self._in_flight):
+            if wait:
+                future._event.wait()
+            if future._event.is_set():
+                self._in_flight.remove((wave, future))
+                self.waves = max(self.waves, wave)
+
+    def execute_async(self, *args, **kwargs):
+        self._settle()
+        future = self._execute_async(*args, **kwargs)
+        self.requests += 1
+        self._in_flight.append((self.waves + 1, future))
+        return future
+
+    def count(self):
+        self._settle(wait=True)
+        return self.waves
+
+def test_borrow_many_takes_a_handful_of_round_trips():
+    from config.memory_session import MemorySession
+    from models.loader import BulkLoader
+
+    # Latence simulée : les requêtes d'une même vague partent avant la fin de la première
+    session = MemorySession(latency=0.02)
+    BulkLoader(session).load_books({'isbn': f"RT-{i}", 'title': f"Livre {i}", 'author': "A",
+                                    'category': "Test", 'total_copies': 10} for i in range(50))
+    users = [uuid4() for _ in range(100)]
+    BulkLoader(session).load_users({'user_id': str(u), 'email': f"{u}@example.com",
+                                    'first_name': "L", 'last_name': "T"} for u in users)
+    borrows = BorrowRepository(session)
+
+    trips = RoundTrips(session)
+    report = borrows.borrow_many([(users[i % 100], f"RT-{i % 50}") for i in range(500)])
+    assert sum(r.ok for r in report) == 500
+    # 50 livres + 100 membres lus, un CAS par titre, une écriture par emprunt
+    assert trips.requests <= 50 + 100 + 50 + 500
+    assert trips.count() <= 10
+
+def test_book_borrows_read_newest_first_across_month_buckets(session):
+    from datetime import datetime
+    from models.borrow import month_buckets
+    from models.loader import BulkLoader
+
+    assert month_buckets(datetime(2023, 11, 5), datetime(2024, 2, 1)) == [202402, 202401, 202312, 202311]
+
+    # Ancienne table non partitionnée -> buckets mensuels (comme la migration)
+    old = [{'isbn': "HIST-1", 'borrow_date': datetime(2024, month, 10), 'user_id': uuid4(),
+            'user_name': f"Lecteur {month}"} for month in range(1, 13)]
+    report = BulkLoader(session).load_book_borrows(old)
+    assert report.records == 12 and report.failed == 0
+    assert len({row['bucket'] for row in session.table('borrows_by_book_monthly')}) == 12
+
+    borrows = BorrowRepository(session)
+    rows = borrows.get_book_borrows("HIST-1", since=datetime(2024, 3, 1), until=datetime(2024, 12, 31), limit=4)
+    assert [row.user_name for row in rows] == ["Lecteur 12", "Lecteur 11", "Lecteur 10", "Lecteur 9"]
+    rows = borrows.get_book_borrows("HIST-1", since=datetime(2024, 3, 1), until=datetime(2024, 12, 31), limit=100)
+    assert [row.borrow_date.month for row in rows] == list(range(12, 2, -1))
@@ -0,0 +1,85 @@
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datetime import datetime
+from uuid import uuid4
+from models.book import BookRepository, Book
+from models.borrow import BorrowRepository
+from models.reservation import ReservationRepository
+
+def test_queue_order_position_and_cancel(session):
+    queue = ReservationRepository(session)
+    alice, bob, carol = uuid4(), uuid4(), uuid4()
+    at = datetime(2026, 3, 1, 10, 0, 0)
+
+    assert queue.reserve(alice, "Alice", "Q-1", at)
+    # Même milliseconde : Bob passe juste derrière Alice au lieu de l'écraser
+    assert queue.reserve(bob, "Bob", "Q-1", at)
+    assert queue.reserve(carol, "Carol", "Q-1")
+    assert queue.reserve(alice, "Alice", "Q-1") is None
+
+    assert queue.head("Q-1").user_id == alice
+    assert [queue.position(u, "Q-1") for u in (alice, bob, carol)] == [1, 2, 3]
+
+    assert queue.cancel(alice, "Q-1")
+    assert queue.position(alice, "Q-1") is None
+    assert queue.position(carol, "Q-1") == 2
+    assert queue.pop("Q-1").user_id == bob
+    assert [r.user_id for r in queue.get_queue("Q-1")] == [carol]
+
+def test_cancel_loses_to_a_pop_serving_the_same_reservation(session):
+    queue = ReservationRepository(session)
+    dora = uuid4()
+    date = queue.reserve(dora, "Dora", "Q-3")
+
+    # pop() concurrent : entrée retirée de la file, réservation pas encore libérée
+    assert session.execute(queue.prep_pop, ("Q-3", date)).was_applied
+    assert not queue.cancel(dora, "Q-3")
+    # La libération reste à pop(), qui vient de servir le membre
+    assert session.execute(queue.prep_get_claim, (dora, "Q-3")).one() is not None
+
+def test_return_goes_to_next_holder_instead_of_stock(session):
+    books = BookRepository(session)
+    queue = ReservationRepository(session)
+    borrows = BorrowRepository(session, reservations=queue)
+    books.add_book(Book("Q-2", "Titre Réservé", "Auteur", "Test", total_copies=1))
+    reader, holder = uuid4(), uuid4()
+
+    assert borrows.borrow_book(reader, "Premier Lecteur", "Q-2", "Titre Réservé")
+    assert not borrows.borrow_book(holder, "Réservataire", "Q-2", "Titre Réservé")
+    assert queue.reserve(holder, "Réservataire", "Q-2")
+
+    assert borrows.return_by_isbn(reader, "Q-2")
+    # L'exemplaire est prêté au réservataire : le stock reste à zéro
+    assert books.get_book_by_isbn("Q-2").available_copies == 0
+    assert [l.isbn for l in borrows.get_active_loans(holder)] == ["Q-2"]
+    assert queue.head("Q-2") is None
+
+    # File vide : le retour suivant remet l'exemplaire en stock
+    assert borrows.return_many([(holder, "Q-2")])[0].ok
+    assert books.get_book_by_isbn("Q-2").available_copies == 1
+
+def test_cli_refuses_to_reserve_a_title_on_the_shelf(monkeypatch):
+    from click.testing import CliRunner
+    from cli import main
+    from config.memory_session import MemoryConnection
+    from config.services import LibraryServices
+
+    services = LibraryServices(MemoryConnection)
+    monkeypatch.setattr(main, 'services', services)
+    services.book_repo.add_book(Book("Q-CLI", "Titre", "Auteur", "Test", total_copies=1))
+    user_id = services.user_repo.create_user("cli.reservation@example.com", "Cli", "Lecteur")
+    reserve = ['reservations', 'add', '--user-id', str(user_id), '--isbn', "Q-CLI"]
+
+    result = CliRunner().invoke(main.cli, reserve)
+    assert result.exit_code == 0, result.output
+    assert "disponible" in result.output
+    assert services.reservation_repo.position(user_id, "Q-CLI") is None
+
+    assert services.borrow_repo.borrow_book(uuid4(), "Lecteur", "Q-CLI", "Titre")
+    result = CliRunner().invoke(main.cli, reserve)
+    assert "position 1" in result.output
+    assert services.reservation_repo.position(user_id, "Q-CLI") == 1
+    services.close()
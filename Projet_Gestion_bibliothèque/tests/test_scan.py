@@ -0,0 +1,70 @@
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from models.book import BookRepository
+from models.loader import BulkLoader
+from models.scan import TableScanner, ScanCheckpoint, split_ring, MIN_TOKEN, MAX_TOKEN
+
+def load_catalog(session, count):
+    BulkLoader(session, report_every=count).load_books({
+        'isbn': f"SCAN-{i}", 'title': f"Livre {i}", 'author': "Auteur Scan",
+        'category': "Scan", 'total_copies': 1
+    } for i in range(count))
+    return {f"SCAN-{i}" for i in range(count)}
+
+def test_ring_split_covers_every_token_once(session):
+    ranges = split_ring(session, splits=10)
+    assert ranges[0].start == MIN_TOKEN and ranges[-1].end == MAX_TOKEN
+    assert all(a.end == b.start for a, b in zip(ranges, ranges[1:]))
+
+def test_parallel_scan_returns_each_row_once(session):
+    isbns = load_catalog(session, 300)
+    scanner = TableScanner(session, 'books_by_id', 'isbn', 'isbn', splits=12, concurrency=4, page_size=20)
+    rows = [row.isbn for row in scanner.scan()]
+    assert len(rows) == len(set(rows))
+    assert isbns <= set(rows)
+    assert scanner.stats()['ranges'] == 12
+    assert isbns <= {book.isbn for book in BookRepository(session).get_all_books(splits=3)}
+
+def test_interrupted_scan_resumes_from_checkpoint(session, tmp_path):
+    isbns = load_catalog(session, 300)
+    path = str(tmp_path / "scan.json")
+
+    def scanner():
+        return TableScanner(session, 'books_by_id', 'isbn', 'isbn', splits=8, concurrency=2,
+                            page_size=10, checkpoint=ScanCheckpoint(path))
+
+    first = []
+    for row in scanner().scan():
+        first.append(row.isbn)
+        if len(first) == 150:
+            break
+    _, total = ScanCheckpoint(path).progress()
+    assert total == 8
+
+    # Reprise : les pages validées ne sont pas relues, rien n'est perdu
+    second = [row.isbn for row in scanner().scan()]
+    assert isbns <= set(first) | set(second)
+    assert len(second) < len(isbns)
+
+def test_catalogue_read_failing_midway_is_not_silently_truncated(session, monkeypatch):
+    load_catalog(session, 20)
+
+    def broken_scan(self):
+        yield from list(session.execute("SELECT * FROM books_by_id"))[:5]
+        raise RuntimeError("plage de tokens indisponible")
+
+    monkeypatch.setattr(TableScanner, 'scan', broken_scan)
+    with pytest.raises(RuntimeError):
+        list(BookRepository(session).get_all_books())
+
+    def failing_scan(self):
+        raise RuntimeError("nœud indisponible")
+        yield
+
+    # Aucune ligne encore lue : catalogue vide, comme les autres lectures en échec
+    monkeypatch.setattr(TableScanner, 'scan', failing_scan)
+    assert list(BookRepository(session).get_all_books()) == []
@@ -0,0 +1,67 @@
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.book import BookRepository, Book
+from models.search import SearchIndex, fold
+
+def test_fold_removes_accents_and_case():
+    assert fold("L'Étranger — Ça") == "l'etranger — ca"
+
+def test_search_ranks_prefix_and_accent_insensitive_matches(session):
+    books = BookRepository(session)
+    books.add_book(Book("S-1", "La Métamorphose", "Franz Kafka", "Roman"))
+    books.add_book(Book("S-2", "Le Procès", "Franz Kafka", "Roman"))
+    books.add_book(Book("S-3", "Métaphysique des tubes", "Amélie Nothomb", "Roman"))
+
+    # Index construit par parcours de books_by_id à la première recherche
+    assert [h.isbn for h in books.search("metamorphose")] == ["S-1"]
+    # Préfixe : « méta » trouve deux titres ; tous les mots doivent correspondre
+    assert {h.isbn for h in books.search("MÉTA")} == {"S-1", "S-3"}
+    assert [h.isbn for h in books.search("meta kafka")] == ["S-1"]
+    # Mot du titre (poids 2) devant un mot d'auteur (poids 1)
+    books.add_book(Book("S-4", "Kafka sur le rivage", "Haruki Murakami", "Roman"))
+    assert books.search("kafka")[0].isbn == "S-4"
+    assert books.search("introuvable") == []
+
+def test_index_updates_and_snapshot_round_trip(tmp_path):
+    index = SearchIndex()
+    index.add("X-1", "Germinal", "Émile Zola")
+    index.add("X-1", "Nana", "Émile Zola")
+    assert index.search("germinal") == []
+    assert [h.isbn for h in index.search("emile")] == ["X-1"]
+
+    path = str(tmp_path / "index.json")
+    index.save(path)
+    restored = SearchIndex.load(path)
+    assert restored.search("nan")[0].title == "Nana"
+    assert restored.stats()['terms'] == index.stats()['terms']
+    assert SearchIndex.load(str(tmp_path / "absent.json")) is None
+
+def test_snapshot_follows_books_added_after_it(session, tmp_path, monkeypatch):
+    from models.loader import BulkLoader
+    path = str(tmp_path / "index.json")
+    monkeypatch.setenv('LIBRARY_SEARCH_INDEX', path)
+    books = BookRepository(session)
+    books.add_book(Book("SN-1", "Germinal", "Émile Zola", "Roman"))
+    assert [h.isbn for h in books.search("germinal")] == ["SN-1"]
+
+    # Index chargé : l'ajout est sauvegardé à la fermeture, l'instantané reste valide
+    books.add_book(Book("SN-2", "Nana", "Émile Zola", "Roman"))
+    assert books.search_index.flush()
+    assert [h.isbn for h in SearchIndex.open(session, path).search("nana")] == ["SN-2"]
+
+    # Ajout sans index en mémoire (autre processus, tableau de bord) : instantané périmé
+    BookRepository(session).add_book(Book("SN-3", "L'Assommoir", "Émile Zola", "Roman"))
+    assert SearchIndex.load(path) is None
+    assert [h.isbn for h in SearchIndex.open(session, path).search("assommoir")] == ["SN-3"]
+
+    BulkLoader(session).load_books([{'isbn': "SN-4", 'title': "La Bête humaine", 'author': "Émile Zola",
+                                     'category': "Roman"}])
+    assert [h.isbn for h in SearchIndex.open(session, path).search("bete")] == ["SN-4"]
+
+    # Un index dont l'instantané a changé entre-temps ne l'écrase pas
+    books.add_book(Book("SN-5", "Thérèse Raquin", "Émile Zola", "Roman"))
+    assert not books.search_index.flush()
+    assert [h.isbn for h in SearchIndex.open(session, path).search("raquin")] == ["SN-5"]
@@ -0,0 +1,44 @@
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from cassandra import ConsistencyLevel
+from cassandra.cluster import EXEC_PROFILE_DEFAULT
+from cassandra.policies import TokenAwarePolicy, DCAwareRoundRobinPolicy, ExponentialReconnectionPolicy
+from config.settings import CassandraSettings
+from config.database import CassandraConnection
+
+def test_settings_from_env():
+    settings = CassandraSettings.from_env(environ={
+        'CASSANDRA_HOSTS': 'node1, node2,node3',
+        'CASSANDRA_LOCAL_DC': 'datacenter1',
+        'CASSANDRA_PROTOCOL_VERSION': '4',
+        'CASSANDRA_COMPRESSION': 'NONE',
+        'CASSANDRA_REQUEST_TIMEOUT': '2.5',
+    })
+    assert settings.hosts == ['node1', 'node2', 'node3']
+    assert settings.protocol_version == 4
+    assert settings.driver_compression() is False
+    assert settings.request_timeout == 2.5
+    assert settings.keyspace == 'library_system'
+
+def test_cluster_routes_to_replicas_of_local_dc():
+    settings = CassandraSettings(hosts=['10.0.0.1'], local_dc='datacenter1', request_timeout=3.0,
+                                 consistency='LOCAL_QUORUM')
+    cluster = CassandraConnection(settings=settings).build_cluster()
+    profile = cluster.profile_manager.profiles[EXEC_PROFILE_DEFAULT]
+    assert isinstance(profile.load_balancing_policy, TokenAwarePolicy)
+    assert isinstance(profile.load_balancing_policy._child_policy, DCAwareRoundRobinPolicy)
+    assert profile.load_balancing_policy._child_policy.local_dc == 'datacenter1'
+    assert profile.request_timeout == 3.0
+    assert profile.consistency_level == ConsistencyLevel.LOCAL_QUORUM
+    assert isinstance(cluster.reconnection_policy, ExponentialReconnectionPolicy)
+    assert cluster.contact_points == ['10.0.0.1']
+
+def test_unknown_consistency_lists_accepted_levels():
+    with pytest.raises(ValueError) as error:
+        CassandraSettings.from_env(environ={'CASSANDRA_CONSISTENCY': 'local-quorum'})
+    assert 'LOCAL-QUORUM' in str(error.value)
+    assert 'LOCAL_QUORUM' in str(error.value) and 'LOCAL_ONE' in str(error.value)
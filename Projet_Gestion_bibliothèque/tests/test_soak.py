@@ -0,0 +1,48 @@
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from datetime import datetime
+from models.soak import SoakTest, InvariantChecker, parse_mix, BORROW, RETURN, SEARCH
+
+def test_short_soak_keeps_invariants(session):
+    soak = SoakTest(session, patrons=6, duration=0.6, books=8, copies=2, zipf=1.2,
+                    mix=parse_mix("search=30,borrow=40,return=20,history=10"), interval=0.2, seed=7)
+    soak.seed_data()
+    report = soak.run()
+
+    assert report.invariants.violations == []
+    assert report.operations[BORROW]['count'] > 0
+    assert report.operations[RETURN]['count'] > 0
+    assert report.operations[SEARCH]['failed'] == 0
+    assert len(report.timeline) >= 2
+    assert report.stock['attempts'] >= report.operations[BORROW]['count'] - report.operations[BORROW]['failed']
+    assert report.invariants.borrows >= report.invariants.active_loans
+
+def test_checker_reports_each_broken_invariant(session):
+    soak = SoakTest(session, patrons=2, books=3, copies=2, run_id="broken")
+    soak.seed_data()
+    since = datetime.now()
+    user_id, name = soak.members[0]
+    for isbn in soak.isbns[:2]:
+        assert soak.borrow_repo.borrow_book(user_id, name, isbn, "Titre")
+
+    # Stock faussé, ligne de suivi par livre perdue
+    session.execute(f"UPDATE books_by_id SET available_copies = -1 WHERE isbn = '{soak.isbns[2]}'")
+    row = next(iter(session.execute(f"SELECT borrow_date, isbn FROM borrows_by_user WHERE user_id = {user_id}")))
+    bucket = row.borrow_date.year * 100 + row.borrow_date.month
+    session.execute("DELETE FROM borrows_by_book_monthly WHERE isbn = %s AND bucket = %s AND borrow_date = %s AND user_id = %s",
+                    (row.isbn, bucket, row.borrow_date, user_id))
+
+    report = InvariantChecker(session).check(soak.isbns, [u for u, _ in soak.members], since)
+    kinds = sorted(v.kind for v in report.violations)
+    assert kinds == ['missing_by_book', 'negative_stock', 'stock_mismatch']
+    assert report.active_loans == 2
+    assert report.borrows == 2
+
+def test_parse_mix_rejects_unknown_operation():
+    assert parse_mix("search=3,borrow") == {'search': 3.0, 'borrow': 1.0}
+    with pytest.raises(ValueError):
+        parse_mix("search=1,reserve=2")
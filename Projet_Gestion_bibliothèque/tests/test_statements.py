@@ -0,0 +1,49 @@
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.memory_session import MemoryConnection
+from config.services import LibraryServices
+from models.book import BookRepository
+from models.borrow import BorrowRepository
+from models.statements import statements_for, warm_up
+
+def counting_prepares(session):
+    prepared = []
+    original = session.prepare
+
+    def prepare(query, *args, **kwargs):
+        prepared.append(query)
+        return original(query, *args, **kwargs)
+    session.prepare = prepare
+    return prepared
+
+def test_statements_are_prepared_on_first_use_and_shared(session):
+    prepared = counting_prepares(session)
+    books = BookRepository(session)
+    borrows = BorrowRepository(session)
+    assert prepared == []
+
+    books.get_book_by_isbn("INCONNU")
+    assert len(prepared) == 1
+    # Même lecture books_by_id pour le stock et les emprunts : pas de seconde préparation
+    assert borrows.stock.prep_get_stock is books.prep_get_by_isbn
+    assert borrows.prep_get_book is books.prep_get_by_isbn
+    assert len(prepared) == 1
+    assert borrows.prep_insert_active.is_idempotent
+
+def test_warm_up_prepares_every_declared_statement_once(session):
+    prepared = counting_prepares(session)
+    books = BookRepository(session)
+    borrows = BorrowRepository(session)
+    warm_up(books, borrows, borrows.stock)
+    assert len(prepared) == len(set(prepared)) == len(statements_for(session))
+    assert 'prep_cas_stock' in vars(borrows.stock)
+
+def test_services_connect_only_when_a_repository_is_used():
+    services = LibraryServices(MemoryConnection)
+    assert not services.connected
+    assert services.book_repo.get_book_by_isbn("INCONNU") is None
+    assert services.connected
+    services.close()